@@ -0,0 +1,101 @@
+"""
+Laços numéricos dos indicadores técnicos, compilados com numba quando disponível.
+Recebem arrays float64 contíguos e escrevem os resultados em arrays pré-alocados.
+"""
+from utils._njit import njit
+
+
+@njit(cache=True, fastmath=True)
+def _rsi_loop(close, period, out):
+    """
+    Média dos ganhos e das perdas dos últimos `period` candles.
+    out[0] = ganho médio, out[1] = perda média.
+    """
+    n = close.shape[0]
+    gain = 0.0
+    loss = 0.0
+    for i in range(n - period, n):
+        delta = close[i] - close[i - 1]
+        if delta > 0:
+            gain += delta
+        else:
+            loss -= delta
+    out[0] = gain / period
+    out[1] = loss / period
+
+
+@njit(cache=True, fastmath=True)
+def _ema_loop(close, period, out):
+    """
+    EMA recursiva (equivalente a ewm(span=period, adjust=False)), um valor por candle.
+    """
+    alpha = 2.0 / (period + 1.0)
+    ema = close[0]
+    out[0] = ema
+    for i in range(1, close.shape[0]):
+        ema = alpha * close[i] + (1.0 - alpha) * ema
+        out[i] = ema
+
+
+@njit(cache=True, fastmath=True)
+def _macd_loop(close, fast, slow, signal, out):
+    """
+    Último valor do MACD em uma única passada.
+    out[0] = linha MACD, out[1] = linha de sinal, out[2] = histograma.
+    """
+    alpha_fast = 2.0 / (fast + 1.0)
+    alpha_slow = 2.0 / (slow + 1.0)
+    alpha_signal = 2.0 / (signal + 1.0)
+    ema_fast = close[0]
+    ema_slow = close[0]
+    macd = 0.0
+    signal_line = 0.0
+    for i in range(1, close.shape[0]):
+        ema_fast = alpha_fast * close[i] + (1.0 - alpha_fast) * ema_fast
+        ema_slow = alpha_slow * close[i] + (1.0 - alpha_slow) * ema_slow
+        macd = ema_fast - ema_slow
+        signal_line = alpha_signal * macd + (1.0 - alpha_signal) * signal_line
+    out[0] = macd
+    out[1] = signal_line
+    out[2] = macd - signal_line
+
+
+@njit(cache=True, fastmath=True)
+def _bb_loop(close, period, k, out):
+    """
+    Bandas de Bollinger da janela mais recente (desvio padrão amostral).
+    out[0] = banda inferior, out[1] = média, out[2] = banda superior.
+    """
+    n = close.shape[0]
+    total = 0.0
+    for i in range(n - period, n):
+        total += close[i]
+    mean = total / period
+    squares = 0.0
+    for i in range(n - period, n):
+        diff = close[i] - mean
+        squares += diff * diff
+    band = k * (squares / (period - 1)) ** 0.5
+    out[0] = mean - band
+    out[1] = mean
+    out[2] = mean + band
+
+
+@njit(cache=True, fastmath=True)
+def _atr_loop(high, low, close, period):
+    """
+    Média do True Range dos últimos `period` candles (o candle anterior fornece o fechamento).
+    """
+    n = close.shape[0]
+    total = 0.0
+    for i in range(n - period, n):
+        prev_close = close[i - 1]
+        tr = high[i] - low[i]
+        up = abs(high[i] - prev_close)
+        down = abs(low[i] - prev_close)
+        if up > tr:
+            tr = up
+        if down > tr:
+            tr = down
+        total += tr
+    return total / period
@@ -0,0 +1,187 @@
+"""
+RSI incremental (suavização de Wilder) mantido pelo stream de klines da Binance
+"""
+import threading
+import numpy as np
+from binance.client import Client
+
+from utils.helpers import log_info, log_error, log_warning
+from api.binance_client import ensure_binance_connection, get_klines, get_websocket_manager
+
+# Estado por par: {'period', 'open_time', 'close', 'avg_gain', 'avg_loss'}
+RSI_STATE = {}
+_rsi_state_lock = threading.Lock()
+
+# Uma única conexão multiplexada com os streams de kline de todos os pares acompanhados
+_kline_socket = {"name": None, "pairs": frozenset()}
+
+KLINE_INTERVAL = Client.KLINE_INTERVAL_1HOUR
+KLINE_INTERVAL_MS = 60 * 60 * 1000
+SEED_LOOKBACK = "10 days ago UTC"
+
+
+def rsi_from_averages(avg_gain, avg_loss):
+    """
+    Converte as médias de ganho/perda em RSI.
+    """
+    if avg_loss == 0:
+        return 100.0 if avg_gain > 0 else 50.0
+    rs = avg_gain / avg_loss
+    return 100 - (100 / (1 + rs))
+
+
+def _seed_state(coin_pair, period):
+    """
+    Calcula o estado inicial de Wilder a partir dos klines fechados via REST.
+    
+    Returns:
+        dict: Estado do par ou None se não houver dados suficientes
+    """
+    if not ensure_binance_connection():
+        return None
+    klines = get_klines(coin_pair, KLINE_INTERVAL, SEED_LOOKBACK)
+    # O último kline ainda está aberto; o stream só atualiza com candles fechados
+    klines = klines[:-1]
+    if len(klines) < period + 1:
+        log_warning(f"Dados insuficientes para iniciar o RSI incremental de {coin_pair}")
+        return None
+    
+    closes = np.asarray([k[4] for k in klines], dtype=np.float64)
+    delta = np.diff(closes)
+    gain = np.where(delta > 0, delta, 0.0)
+    loss = np.where(delta < 0, -delta, 0.0)
+    
+    avg_gain = gain[:period].mean()
+    avg_loss = loss[:period].mean()
+    for g, l in zip(gain[period:], loss[period:]):
+        avg_gain = (avg_gain * (period - 1) + g) / period
+        avg_loss = (avg_loss * (period - 1) + l) / period
+    
+    return {
+        'period': period,
+        'open_time': klines[-1][0],
+        'close': closes[-1],
+        'avg_gain': float(avg_gain),
+        'avg_loss': float(avg_loss)
+    }
+
+
+def _handle_kline_message(msg):
+    """
+    Callback do stream: atualiza o RSI do par em O(1) a cada candle fechado.
+    Mensagens do stream multiplexado chegam como {'stream': ..., 'data': evento}.
+    """
+    msg = msg.get('data', msg)
+    if msg.get('e') != 'kline':
+        if msg.get('e') == 'error':
+            log_error(f"Erro no stream de klines: {msg.get('m')}")
+        return
+    
+    kline = msg['k']
+    if not kline['x']:  # Candle ainda aberto
+        return
+    
+    coin_pair = msg['s']
+    with _rsi_state_lock:
+        state = RSI_STATE.get(coin_pair)
+        if state is None or kline['t'] <= state['open_time']:
+            return
+        if kline['t'] != state['open_time'] + KLINE_INTERVAL_MS:
+            # Candle perdido (ex: reconexão); descarta o estado para ser recalculado
+            log_warning(f"Lacuna no stream de klines de {coin_pair}; RSI incremental será recalculado")
+            del RSI_STATE[coin_pair]
+            return
+        
+        period = state['period']
+        close = float(kline['c'])
+        change = close - state['close']
+        state['avg_gain'] = (state['avg_gain'] * (period - 1) + max(change, 0.0)) / period
+        state['avg_loss'] = (state['avg_loss'] * (period - 1) + max(-change, 0.0)) / period
+        state['close'] = close
+        state['open_time'] = kline['t']
+
+
+def _stop_kline_socket():
+    """
+    Encerra a conexão multiplexada de klines, se houver.
+    """
+    stream_name = _kline_socket["name"]
+    _kline_socket["name"] = None
+    _kline_socket["pairs"] = frozenset()
+    if stream_name is None:
+        return
+    try:
+        get_websocket_manager().stop_socket(stream_name)
+    except Exception as e:
+        log_error(f"Erro ao encerrar stream {stream_name}: {e}")
+
+
+def start_rsi_stream(coin_pairs, period=14):
+    """
+    Acompanha pelo stream de klines exatamente os pares informados: pares que saíram
+    da lista perdem o estado de RSI, os novos são calculados via REST, e todos ficam em
+    uma única conexão multiplexada, recriada só quando o conjunto de pares muda.
+    Pares já acompanhados só são recalculados se o estado tiver sido descartado.
+    
+    Args:
+        coin_pairs (list): Lista de pares (ex: ['BTCUSDT', 'ETHUSDT'])
+        period (int): Período do RSI
+    """
+    pairs = frozenset(coin_pairs)
+    
+    with _rsi_state_lock:
+        for coin_pair in [p for p in RSI_STATE if p not in pairs]:
+            del RSI_STATE[coin_pair]
+    
+    for coin_pair in pairs:
+        try:
+            with _rsi_state_lock:
+                has_state = coin_pair in RSI_STATE
+            if not has_state:
+                state = _seed_state(coin_pair, period)
+                if state is None:
+                    continue
+                with _rsi_state_lock:
+                    RSI_STATE[coin_pair] = state
+        except Exception as e:
+            log_error(f"Erro ao iniciar RSI incremental para {coin_pair}: {e}")
+    
+    if pairs != _kline_socket["pairs"]:
+        _stop_kline_socket()
+        if pairs:
+            try:
+                streams = [f"{coin_pair.lower()}@kline_{KLINE_INTERVAL}" for coin_pair in sorted(pairs)]
+                _kline_socket["name"] = get_websocket_manager().start_multiplex_socket(
+                    callback=_handle_kline_message,
+                    streams=streams
+                )
+                _kline_socket["pairs"] = pairs
+            except Exception as e:
+                log_error(f"Erro ao iniciar o stream de klines: {e}")
+    
+    with _rsi_state_lock:
+        active = len(RSI_STATE)
+    log_info(f"RSI incremental ativo para {active} pares")
+
+
+def get_streamed_rsi(coin_pair, period=14):
+    """
+    Retorna o RSI mantido pelo stream, sem nenhuma chamada de rede.
+    
+    Returns:
+        float: RSI ou None se o par não estiver sendo acompanhado com esse período
+    """
+    with _rsi_state_lock:
+        state = RSI_STATE.get(coin_pair)
+        if state is None or state['period'] != period:
+            return None
+        return rsi_from_averages(state['avg_gain'], state['avg_loss'])
+
+
+def stop_rsi_stream():
+    """
+    Cancela a inscrição de klines e limpa o estado.
+    """
+    _stop_kline_socket()
+    with _rsi_state_lock:
+        RSI_STATE.clear()
@@ -3,15 +3,47 @@ Módulo para análise de sentimento de criptomoedas
 """
 import time
 import json
+import heapq
+import threading
 import openai
 
 from utils.helpers import log_info, log_error, extract_json_from_text
 from config import config
 from llm.client import query_local_llm_with_retry, is_llm_server_online
-from llm.prompts import create_sentiment_analysis_prompt
+from llm.prompts import create_sentiment_analysis_prompt, create_batch_sentiment_analysis_prompt
 
-# Cache para evitar múltiplas chamadas de API para o mesmo conteúdo
+# Cache para evitar múltiplas chamadas de API para o mesmo conteúdo.
+# Cada moeda guarda uma tupla (expira_em, resultado); o heap ordena as expirações
+# para que a limpeza só visite as entradas que de fato venceram.
 sentiment_cache = {}
+_sentiment_expiry_heap = []
+_sentiment_cache_lock = threading.Lock()
+
+
+def _get_cached_sentiment(coin):
+    """
+    Retorna o resultado em cache para a moeda, ou None se não existir ou tiver expirado.
+    Entradas expiradas são removidas na própria consulta.
+    """
+    with _sentiment_cache_lock:
+        entry = sentiment_cache.get(coin)
+        if entry is None:
+            return None
+        expiry, cached_result = entry
+        if time.time() >= expiry:
+            sentiment_cache.pop(coin, None)
+            return None
+        return cached_result
+
+
+def _store_sentiment(coin, result):
+    """
+    Guarda o resultado da análise no cache com expiração de SENTIMENT_CACHE_DURATION segundos.
+    """
+    expiry = time.time() + config.SENTIMENT_CACHE_DURATION
+    with _sentiment_cache_lock:
+        sentiment_cache[coin] = (expiry, result)
+        heapq.heappush(_sentiment_expiry_heap, (expiry, coin))
 
 
 def create_default_sentiment_result(coin, sentiment="neutro"):
@@ -124,15 +156,11 @@ def analyze_sentiment_with_llm(coin, text_data):
     Returns:
         dict: Resultados da análise de sentimento
     """
-    # Chave para cache
-    cache_key = f"{coin}_{int(time.time() / 3600)}"  # Chave baseada na moeda e na hora atual
-    
     # Verifica se já existe no cache e se ainda é válido
-    if cache_key in sentiment_cache:
-        cache_time, cached_result = sentiment_cache[cache_key]
-        if time.time() - cache_time < config.SENTIMENT_CACHE_DURATION:
-            log_info(f"Usando resultado de sentimento em cache para {coin}")
-            return cached_result
+    cached_result = _get_cached_sentiment(coin)
+    if cached_result is not None:
+        log_info(f"Usando resultado de sentimento em cache para {coin}")
+        return cached_result
     
     # Verifica se o servidor LLM está online
     use_local_llm = is_llm_server_online()
@@ -182,7 +210,7 @@ def analyze_sentiment_with_llm(coin, text_data):
             result = validate_sentiment_result(result)
             
             # Adiciona ao cache
-            sentiment_cache[cache_key] = (time.time(), result)
+            _store_sentiment(coin, result)
             
             return result
         except json.JSONDecodeError as e:
@@ -194,23 +222,119 @@ def analyze_sentiment_with_llm(coin, text_data):
         return create_default_sentiment_result(coin, "neutro")
 
 
-def clear_sentiment_cache(max_age=None):
+def _batch_result_by_coin(parsed):
     """
-    Limpa o cache de sentimento, removendo entradas antigas.
+    Normaliza a resposta da consulta em lote para um mapa símbolo -> resultado.
+    Aceita o objeto pedido no prompt ({"BTC": {...}}) e também uma lista
+    [{"coin": "BTC", ...}], formato que alguns modelos devolvem mesmo assim.
+    """
+    if isinstance(parsed, dict):
+        return parsed
+    if isinstance(parsed, list):
+        return {
+            str(item['coin']).upper(): item
+            for item in parsed
+            if isinstance(item, dict) and item.get('coin')
+        }
+    return None
+
+
+def analyze_sentiment_batch(coin_text_map):
+    """
+    Analisa o sentimento de várias moedas com uma única consulta ao LLM local.
+    Moedas em cache não são reenviadas; se o servidor local estiver offline ou a
+    consulta em lote falhar, recorre à análise individual (que trata o fallback).
     
     Args:
-        max_age (int, optional): Idade máxima em segundos. Se None, usa a duração padrão do cache.
+        coin_text_map (dict): Mapa símbolo -> dados coletados do Reddit, Twitter e notícias
+        
+    Returns:
+        dict: Mapa símbolo -> resultado da análise de sentimento
     """
-    if max_age is None:
-        max_age = config.SENTIMENT_CACHE_DURATION
+    results = {}
+    pending = {}
+    for coin, text_data in coin_text_map.items():
+        cached_result = _get_cached_sentiment(coin)
+        if cached_result is not None:
+            log_info(f"Usando resultado de sentimento em cache para {coin}")
+            results[coin] = cached_result
+        else:
+            pending[coin] = text_data
     
+    if not pending:
+        return results
+    
+    batch_result = None
+    if len(pending) > 1 and is_llm_server_online():
+        log_info(f"Analisando o sentimento de {len(pending)} moedas em uma única consulta ao LLM")
+        prompt = create_batch_sentiment_analysis_prompt(pending)
+        messages = [
+            {"role": "system", "content": "Você é um analista de mercado de criptomoedas. Sua tarefa é fornecer análise de sentimento objetiva baseada nos dados fornecidos."},
+            {"role": "user", "content": prompt}
+        ]
+        response_data = query_local_llm_with_retry(messages, temperature=0.2, max_tokens=8192)
+        
+        if response_data and 'choices' in response_data and len(response_data['choices']) > 0:
+            result_text = response_data['choices'][0]['message']['content'].strip()
+            batch_result = _batch_result_by_coin(extract_json_from_text(result_text))
+            if batch_result is None:
+                log_error("Não foi possível extrair JSON da resposta em lote do LLM")
+    
+    for coin, text_data in pending.items():
+        coin_result = batch_result.get(coin) if batch_result is not None else None
+        if isinstance(coin_result, dict):
+            coin_result = validate_sentiment_result(coin_result)
+            _store_sentiment(coin, coin_result)
+            results[coin] = coin_result
+        else:
+            # Moeda ausente da resposta em lote (ou lote indisponível): análise individual
+            results[coin] = analyze_sentiment_with_llm(coin, text_data)
+    
+    return results
+
+
+def sweep_expired():
+    """
+    Remove do cache de sentimento as entradas já expiradas.
+    Só percorre as entradas vencidas (via heap de expirações), não o cache inteiro.
+    
+    Returns:
+        int: Número de entradas removidas
+    """
     current_time = time.time()
-    old_keys = [k for k, (t, _) in sentiment_cache.items() if current_time - t > max_age]
+    removed = 0
     
-    for k in old_keys:
-        del sentiment_cache[k]
+    with _sentiment_cache_lock:
+        while _sentiment_expiry_heap and _sentiment_expiry_heap[0][0] <= current_time:
+            expiry, coin = heapq.heappop(_sentiment_expiry_heap)
+            entry = sentiment_cache.get(coin)
+            # A moeda pode ter sido reanalisada depois; só remove se for a mesma entrada
+            if entry is not None and entry[0] == expiry:
+                del sentiment_cache[coin]
+                removed += 1
+    
+    return removed
+
+
+def clear_sentiment_cache(max_age=None):
+    """
+    Limpa o cache de sentimento, removendo entradas antigas.
+    
+    Args:
+        max_age (int, optional): Idade máxima em segundos. Se None, remove apenas as entradas expiradas.
+    """
+    if max_age is None:
+        removed = sweep_expired()
+    else:
+        # Idade = agora - momento em que a entrada foi gravada (expiração - duração)
+        oldest_allowed = time.time() - max_age + config.SENTIMENT_CACHE_DURATION
+        with _sentiment_cache_lock:
+            old_keys = [k for k, (expiry, _) in sentiment_cache.items() if expiry < oldest_allowed]
+            for k in old_keys:
+                del sentiment_cache[k]
+        removed = len(old_keys)
     
-    log_info(f"Cache de sentimento limpo. Removidas {len(old_keys)} entradas antigas.")
+    log_info(f"Cache de sentimento limpo. Removidas {removed} entradas antigas.")
 
 
 def get_combined_sentiment_score(sentiment_result):
@@ -1,12 +1,37 @@
 """
 Funções para análise técnica de criptomoedas
 """
+import time
+from collections import namedtuple
+
 import pandas as pd
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from config import config
+from utils.helpers import log_info, log_error, memoize_per_minute, clear_minute_caches
+from api.binance_client import get_historical_data, get_closes_array
+from analysis.rsi_stream import get_streamed_rsi
+from analysis._njit_kernels import _rsi_loop, _ema_loop, _macd_loop, _bb_loop, _atr_loop
+
+# Compila (ou carrega do cache em disco) o kernel de ATR na importação, para que a
+# primeira compra não pague a compilação
+_atr_loop(np.ones(2), np.ones(2), np.ones(2), 1)
 
-from utils.helpers import log_info, log_error
-from api.binance_client import get_historical_data
+# SL/TP dinâmico por (par, SL base, TP base) -> (expira_em, (stop_loss, take_profit))
+_sltp_cache = {}
 
+# Resultado de calculate_bollinger_bands (acesso por atributo, sem dicionário por chamada)
+BollingerBands = namedtuple('BollingerBands', 'upper middle lower position current_price')
+
+
+def _close_values(data, column='close'):
+    """
+    Retorna os preços como np.ndarray float64, aceitando DataFrame ou array de fechamentos.
+    """
+    if isinstance(data, pd.DataFrame):
+        return np.ascontiguousarray(data[column].to_numpy(dtype=np.float64))
+    return np.ascontiguousarray(data, dtype=np.float64)
 
 
 def calculate_rsi(data, period=14, column='close'):
@@ -14,7 +39,7 @@ def calculate_rsi(data, period=14, column='close'):
     Calcula o RSI para os dados fornecidos.
     
     Args:
-        data: DataFrame com os dados históricos
+        data: DataFrame com os dados históricos ou np.ndarray de fechamentos
         period: Período para cálculo do RSI (padrão: 14)
         column: Nome da coluna com os preços (padrão: 'close')
         
@@ -26,49 +51,89 @@ def calculate_rsi(data, period=14, column='close'):
             log_error(f"Dados insuficientes para calcular RSI. Necessário: {period+1}, Disponível: {len(data)}")
             return None
             
-        # Calcular diferenças
-        delta = data[column].diff()
+        # Para o valor mais recente basta a média dos últimos `period` ganhos e perdas
+        averages = np.empty(2)
+        _rsi_loop(_close_values(data, column), period, averages)
+        avg_gain, avg_loss = averages
+        
+        # Calcular RS e RSI
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rs = avg_gain / avg_loss
+            rsi = 100 - (100 / (1 + rs))
+        
+        return rsi
+    except Exception as e:
+        log_error(f"Erro ao calcular RSI: {e}")
+        return None
+
+
+def calculate_rsi_series(data, period=14, column='close'):
+    """
+    Calcula a série completa de RSI (não apenas o último valor).
+    
+    Args:
+        data: DataFrame com os dados históricos ou np.ndarray de fechamentos
+        period: Período para cálculo do RSI (padrão: 14)
+        column: Nome da coluna com os preços (padrão: 'close')
+        
+    Returns:
+        np.ndarray: RSI de cada candle a partir do índice `period` ou None em caso de erro
+    """
+    try:
+        closes = _close_values(data, column)
+        if len(closes) < period + 1:
+            log_error(f"Dados insuficientes para calcular RSI. Necessário: {period+1}, Disponível: {len(closes)}")
+            return None
         
         # Separar ganhos e perdas
-        gain = delta.where(delta > 0, 0)
-        loss = -delta.where(delta < 0, 0)
+        delta = np.diff(closes)
+        gain = np.where(delta > 0, delta, 0.0)
+        loss = np.where(delta < 0, -delta, 0.0)
         
-        # Calcular média móvel de ganhos e perdas
-        avg_gain = gain.rolling(window=period).mean()
-        avg_loss = loss.rolling(window=period).mean()
+        # Média móvel de ganhos e perdas sobre janelas deslizantes (views, sem cópia)
+        avg_gain = sliding_window_view(gain, period).mean(axis=-1)
+        avg_loss = sliding_window_view(loss, period).mean(axis=-1)
         
         # Calcular RS e RSI
-        rs = avg_gain / avg_loss
-        rsi = 100 - (100 / (1 + rs))
-        
-        # Retornar o valor mais recente
-        return rsi.iloc[-1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rs = avg_gain / avg_loss
+            return 100 - (100 / (1 + rs))
     except Exception as e:
         log_error(f"Erro ao calcular RSI: {e}")
         return None
 
 
-def calculate_rsi_for_coin(coin_pair, period=14):
+@memoize_per_minute
+def calculate_rsi_for_coin(coin_pair, period=14, closes=None):
     """
     Calcula o RSI para um par de moedas específico.
     
     Args:
         coin_pair: Par de moedas (ex: 'BTCUSDT')
         period: Período para cálculo do RSI
+        closes: Fechamentos já obtidos (opcional; evita nova busca de histórico)
         
     Returns:
         float: Valor do RSI ou None em caso de erro
     """
     try:
-        # Obter dados históricos
-        df = get_historical_data(coin_pair)
-        
-        if df.empty:
+        # RSI mantido em memória pelo stream de klines, quando ativado
+        if config.USE_KLINE_STREAM_RSI:
+            rsi_value = get_streamed_rsi(coin_pair, period)
+            if rsi_value is not None:
+                log_info(f"RSI (stream) para {coin_pair}: {rsi_value:.2f}")
+                return rsi_value
+        
+        # Obter fechamentos históricos
+        if closes is None:
+            closes = get_closes_array(coin_pair)
+        
+        if closes.size == 0:
             log_error(f"Sem dados históricos para {coin_pair}")
             return None
             
         # Calcular RSI
-        rsi_value = calculate_rsi(df, period=period)
+        rsi_value = calculate_rsi(closes, period=period)
         
         if rsi_value is not None:
             log_info(f"RSI para {coin_pair}: {rsi_value:.2f}")
@@ -85,7 +150,7 @@ def calculate_sma(data, period=20, column='close'):
         if len(data) < period:
             log_error(f"Dados insuficientes para calcular SMA{period}.")
             return None
-        return data[column].rolling(window=period).mean().iloc[-1]
+        return _close_values(data, column)[-period:].mean()
     except Exception as e:
         log_error(f"Erro ao calcular SMA: {e}")
         return None
@@ -97,7 +162,10 @@ def calculate_ema(data, period=20, column='close'):
         if len(data) < period:
             log_error(f"Dados insuficientes para calcular EMA{period}.")
             return None
-        return data[column].ewm(span=period, adjust=False).mean().iloc[-1]
+        closes = _close_values(data, column)
+        ema = np.empty_like(closes)
+        _ema_loop(closes, period, ema)
+        return ema[-1]
     except Exception as e:
         log_error(f"Erro ao calcular EMA: {e}")
         return None
@@ -109,35 +177,36 @@ def calculate_macd(data, slow=26, fast=12, signal=9, column='close'):
         if len(data) < slow + signal:
             log_error("Dados insuficientes para calcular MACD.")
             return None, None, None
-        ema_fast = data[column].ewm(span=fast, adjust=False).mean()
-        ema_slow = data[column].ewm(span=slow, adjust=False).mean()
-        macd_line = ema_fast - ema_slow
-        signal_line = macd_line.ewm(span=signal, adjust=False).mean()
-        histogram = macd_line - signal_line
-        return macd_line.iloc[-1], signal_line.iloc[-1], histogram.iloc[-1]
+        macd = np.empty(3)
+        _macd_loop(_close_values(data, column), fast, slow, signal, macd)
+        return macd[0], macd[1], macd[2]
     except Exception as e:
         log_error(f"Erro ao calcular MACD: {e}")
         return None, None, None
 
 
-def calculate_ma_for_coin(coin_pair, period=20, ma_type='sma'):
+@memoize_per_minute
+def calculate_ma_for_coin(coin_pair, period=20, ma_type='sma', closes=None):
     """Calcula média móvel simples ou exponencial para um par"""
-    df = get_historical_data(coin_pair)
-    if df.empty:
+    if closes is None:
+        closes = get_closes_array(coin_pair)
+    if closes.size == 0:
         log_error(f"Sem dados históricos para {coin_pair}")
         return None
     if ma_type == 'ema':
-        return calculate_ema(df, period)
-    return calculate_sma(df, period)
+        return calculate_ema(closes, period)
+    return calculate_sma(closes, period)
 
 
-def calculate_macd_for_coin(coin_pair, slow=26, fast=12, signal=9):
+@memoize_per_minute
+def calculate_macd_for_coin(coin_pair, slow=26, fast=12, signal=9, closes=None):
     """Calcula o MACD para um par de moedas"""
-    df = get_historical_data(coin_pair)
-    if df.empty:
+    if closes is None:
+        closes = get_closes_array(coin_pair)
+    if closes.size == 0:
         log_error(f"Sem dados históricos para {coin_pair}")
         return None, None, None
-    return calculate_macd(df, slow, fast, signal)
+    return calculate_macd(closes, slow, fast, signal)
 
 
 def calculate_volatility(data, window=23, column='close'):
@@ -145,7 +214,7 @@ def calculate_volatility(data, window=23, column='close'):
     Calcula a volatilidade como desvio padrão dos retornos percentuais.
     
     Args:
-        data: DataFrame com os dados históricos
+        data: DataFrame com os dados históricos ou np.ndarray de fechamentos
         window: Janela para cálculo da volatilidade (padrão: 24 períodos)
         column: Nome da coluna com os preços (padrão: 'close')
         
@@ -157,14 +226,12 @@ def calculate_volatility(data, window=23, column='close'):
             log_error(f"Dados insuficientes para calcular volatilidade. Necessário: {window+1}, Disponível: {len(data)}")
             return None
             
-        # Calcular retornos percentuais
-        returns = data[column].pct_change()
-        
-        # Pegar os retornos mais recentes dentro da janela
-        recent_returns = returns.iloc[-window:]
+        # Calcular retornos percentuais apenas da janela mais recente
+        closes = _close_values(data, column)[-(window + 1):]
+        recent_returns = np.diff(closes) / closes[:-1]
         
-        # Calcular desvio padrão
-        volatility = recent_returns.std()
+        # Calcular desvio padrão (amostral, como no pandas)
+        volatility = recent_returns.std(ddof=1)
         
         return volatility
     except Exception as e:
@@ -172,27 +239,29 @@ def calculate_volatility(data, window=23, column='close'):
         return None
 
 
-def calculate_volatility_for_coin(coin_pair, window=23):
+def calculate_volatility_for_coin(coin_pair, window=23, closes=None):
     """
     Calcula a volatilidade para um par de moedas específico.
     
     Args:
         coin_pair: Par de moedas (ex: 'BTCUSDT')
         window: Janela para cálculo da volatilidade
+        closes: Fechamentos já obtidos (opcional; evita nova busca de histórico)
         
     Returns:
         float: Valor da volatilidade ou None em caso de erro
     """
     try:
-        # Obter dados históricos
-        df = get_historical_data(coin_pair)
+        # Obter fechamentos históricos
+        if closes is None:
+            closes = get_closes_array(coin_pair)
         
-        if df.empty:
+        if closes.size == 0:
             log_error(f"Sem dados históricos para {coin_pair}")
             return None
             
         # Calcular volatilidade
-        volatility = calculate_volatility(df, window=window)
+        volatility = calculate_volatility(closes, window=window)
         
         if volatility is not None:
             log_info(f"Volatilidade para {coin_pair}: {volatility:.4f} ({volatility*100:.2f}%)")
@@ -203,11 +272,127 @@ def calculate_volatility_for_coin(coin_pair, window=23):
         return None
 
 
+def _bollinger_position(closes, period=20, std_dev=2):
+    """
+    Posição do último fechamento dentro das Bandas de Bollinger (0 = banda inferior,
+    1 = banda superior), calculada só com a janela mais recente.
+    """
+    if len(closes) < period:
+        return None
+    bands = np.empty(3)
+    _bb_loop(closes, period, std_dev, bands)
+    lower, _, upper = bands
+    if upper == lower:
+        return None
+    return (closes[-1] - lower) / (upper - lower)
+
+
+def calculate_bollinger_position(coin_pair, period=20, std_dev=2, closes=None):
+    """
+    Posição do preço atual do par dentro das Bandas de Bollinger (0 = inferior, 1 = superior).
+    
+    Returns:
+        float: Posição relativa ou None se não houver dados suficientes
+    """
+    if closes is None:
+        closes = get_closes_array(coin_pair)
+    if len(closes) == 0:
+        log_error(f"Sem dados históricos para {coin_pair}")
+        return None
+    return _bollinger_position(_close_values(closes), period, std_dev)
+
+
+def calculate_momentum(coin_pair, period=10, closes=None):
+    """
+    Momentum do par como variação percentual do fechamento em `period` candles.
+    
+    Returns:
+        float: Variação (ex: 0.05 = +5%) ou None se não houver dados suficientes
+    """
+    if closes is None:
+        closes = get_closes_array(coin_pair)
+    if len(closes) <= period or closes[-1 - period] == 0:
+        return None
+    return closes[-1] / closes[-1 - period] - 1
+
+
+def compute_indicators_bulk(closes):
+    """
+    Calcula todos os indicadores baseados em fechamento a partir de um único array,
+    sem novas requisições à Binance.
+    
+    Args:
+        closes (np.ndarray): Fechamentos em ordem cronológica
+        
+    Returns:
+        dict: rsi, volatility, sma_50, sma_200, macd, macd_signal, macd_histogram e
+            bb_position (valores None quando não calculáveis)
+    """
+    closes = _close_values(closes)
+    macd_line, macd_signal, macd_histogram = calculate_macd(closes)
+    
+    return {
+        'rsi': calculate_rsi(closes),
+        'volatility': calculate_volatility(closes),
+        'sma_50': calculate_sma(closes, 50),
+        'sma_200': calculate_sma(closes, 200),
+        'macd': macd_line,
+        'macd_signal': macd_signal,
+        'macd_histogram': macd_histogram,
+        'bb_position': _bollinger_position(closes)
+    }
+
+
+@memoize_per_minute
+def compute_tech_bundle(coin_pair):
+    """
+    Calcula RSI, volatilidade, SMA50, SMA200, MACD e posição nas Bandas de Bollinger
+    de um par com uma única busca de histórico, reaproveitando o mesmo array de fechamentos.
+    
+    Args:
+        coin_pair: Par de moedas (ex: 'BTCUSDT')
+        
+    Returns:
+        dict: Indicadores (valores None quando não calculáveis) ou None se não houver dados
+    """
+    try:
+        closes = get_closes_array(coin_pair)
+        if closes.size == 0:
+            log_error(f"Sem dados históricos para {coin_pair}")
+            return None
+        
+        indicators = compute_indicators_bulk(closes)
+        if config.USE_KLINE_STREAM_RSI:
+            streamed_rsi = get_streamed_rsi(coin_pair)
+            if streamed_rsi is not None:
+                indicators['rsi'] = streamed_rsi
+        
+        return indicators
+    except Exception as e:
+        log_error(f"Erro ao calcular indicadores para {coin_pair}: {e}")
+        return None
+
+
+def clear_indicator_caches():
+    """
+    Descarta os indicadores memoizados por minuto (RSI, médias, MACD, pacote
+    técnico e análise de volume). Chamada ao fim da filtragem técnica do ciclo.
+    """
+    clear_minute_caches()
+
+
 def dynamic_stop_loss_take_profit(coin_pair, base_stop_loss=0.05, base_take_profit=0.10):
     """
     Ajusta stop_loss e take_profit dinamicamente usando ATR.
     VERSÃO MELHORADA.
+    O resultado é reaproveitado por config.SLTP_CACHE_TTL segundos (o ATR muda devagar).
     """
+    key = (coin_pair, base_stop_loss, base_take_profit)
+    now = time.monotonic()
+    hit = _sltp_cache.get(key)
+    if hit and hit[0] > now:
+        return hit[1]
+    
     # Usa ATR para stop loss mais inteligente
     stop_loss = dynamic_stop_loss_atr_based(coin_pair, atr_multiplier=2.0)
     
@@ -221,6 +406,7 @@ def dynamic_stop_loss_take_profit(coin_pair, base_stop_loss=0.05, base_take_prof
     log_info(f"Stop Loss: {stop_loss*100:.2f}%")
     log_info(f"Take Profit: {take_profit*100:.2f}% (Risk:Reward = 1:2)")
     
+    _sltp_cache[key] = (now + config.SLTP_CACHE_TTL, (stop_loss, take_profit))
     return stop_loss, take_profit
 
 def check_higher_timeframe_trend(coin_pair, timeframe='4h'):
@@ -275,25 +461,24 @@ def check_higher_timeframe_trend(coin_pair, timeframe='4h'):
 def calculate_bollinger_bands(data, period=20, std_dev=2):
     """
     Calcula Bandas de Bollinger.
+    
+    Returns:
+        BollingerBands: upper, middle, lower, position e current_price, ou None se faltarem dados
     """
-    sma = data['close'].rolling(window=period).mean()
-    std = data['close'].rolling(window=period).std()
+    closes = _close_values(data)
+    if len(closes) < period:
+        return None
     
-    upper_band = sma + (std * std_dev)
-    lower_band = sma - (std * std_dev)
+    bands = np.empty(3)
+    _bb_loop(closes, period, std_dev, bands)
+    lower_band, sma, upper_band = bands
     
-    current_price = data['close'].iloc[-1]
+    current_price = closes[-1]
     
     # Posição relativa (0 = banda inferior, 1 = banda superior)
-    position = (current_price - lower_band.iloc[-1]) / (upper_band.iloc[-1] - lower_band.iloc[-1])
+    position = (current_price - lower_band) / (upper_band - lower_band)
     
-    return {
-        'upper': upper_band.iloc[-1],
-        'middle': sma.iloc[-1],
-        'lower': lower_band.iloc[-1],
-        'position': position,
-        'current_price': current_price
-    }
+    return BollingerBands(upper_band, sma, lower_band, position, current_price)
 
 
 def detect_support_resistance(data, window=20):
@@ -362,20 +547,23 @@ def smart_exit_conditions(coin_pair, entry_price, current_price, time_held):
         if pnl > 0.015:  # 1.5% de lucro rápido
             return "QUICK_PROFIT"
     
+    # Um único histórico para todos os indicadores de saída
+    closes = get_closes_array(coin_pair)
+    
     # Saída por reversão de indicadores
-    rsi = calculate_rsi_for_coin(coin_pair)
+    rsi = calculate_rsi_for_coin(coin_pair, closes=closes)
     if rsi and rsi > 70 and pnl > 0:
         return "RSI_OVERBOUGHT"
     
     # Saída por perda de momentum
-    macd_line, signal_line, _ = calculate_macd_for_coin(coin_pair)
+    macd_line, signal_line, _ = calculate_macd_for_coin(coin_pair, closes=closes)
     if macd_line and signal_line:
         if macd_line < signal_line and pnl > 0.005:
             return "MOMENTUM_LOSS"
     
     # Saída por quebra de suporte
-    bb_data = calculate_bollinger_bands(get_historical_data(coin_pair))
-    if bb_data and current_price < bb_data['middle'] and pnl < -0.02:
+    bb_data = calculate_bollinger_bands(closes) if closes.size else None
+    if bb_data and current_price < bb_data.middle and pnl < -0.02:
         return "SUPPORT_BREAK"
     
     return None
@@ -390,26 +578,16 @@ def calculate_atr(data, period=14):
             log_error(f"Dados insuficientes para ATR. Necessário: {period+1}, Disponível: {len(data)}")
             return None
         
-        high = data['high']
-        low = data['low']
-        close = data['close']
+        high = _close_values(data, 'high')
+        low = _close_values(data, 'low')
+        close = _close_values(data, 'close')
         
         # True Range é o maior de:
         # 1. High - Low
         # 2. abs(High - Close anterior)
         # 3. abs(Low - Close anterior)
-        tr1 = high - low
-        tr2 = abs(high - close.shift())
-        tr3 = abs(low - close.shift())
-        
-        # Pega o máximo dos três
-        frames = [tr1, tr2, tr3]
-        tr = pd.concat(frames, axis=1).max(axis=1)
-        
-        # ATR é a média móvel do True Range
-        atr = tr.rolling(window=period).mean()
-        
-        return atr.iloc[-1]
+        # ATR é a média do True Range dos últimos `period` candles
+        return _atr_loop(high, low, close, period)
         
     except Exception as e:
         log_error(f"Erro ao calcular ATR: {e}")
@@ -467,11 +645,14 @@ def check_technical_indicators(coin_pair):
     Returns:
         dict: Dicionário com os indicadores técnicos
     """
+    # Um único histórico para RSI e volatilidade
+    closes = get_closes_array(coin_pair)
+    
     # Calcular RSI
-    rsi = calculate_rsi_for_coin(coin_pair)
+    rsi = calculate_rsi_for_coin(coin_pair, closes=closes)
     
     # Calcular volatilidade
-    volatility = calculate_volatility_for_coin(coin_pair)
+    volatility = calculate_volatility_for_coin(coin_pair, closes=closes)
     
     # Calcular stop loss e take profit dinâmicos
     stop_loss, take_profit = dynamic_stop_loss_take_profit(coin_pair)
@@ -8,14 +8,57 @@ import numpy as np
 import time
 import math 
 import json
+import threading
+from functools import lru_cache
+from requests.adapters import HTTPAdapter
 
 from config import config
-from utils.helpers import log_info, log_error, log_trade, log_warning, _determine_precision_from_string # Adicionado log_warning e _determine_precision_from_string
+from utils.helpers import log_info, log_error, log_trade, log_warning, memoize_per_minute, base_asset_from_pair, _determine_precision_from_string, precompute_precisions # Adicionado log_warning e _determine_precision_from_string
 
 # Variáveis globais
 client = None
 last_sold_coin = None
 last_trade_time = 0
+websocket_manager = None
+_websocket_manager_lock = threading.Lock()
+
+# Cache de klines: (par, intervalo, lookback) -> (expira_em, klines)
+KLINES_CACHE_MAXSIZE = 256
+_klines_cache = {}
+_klines_cache_lock = threading.Lock()
+
+# Tickers 24h de todos os pares, obtidos em uma única requisição.
+# Após uma falha, a requisição só é repetida depois de TICKERS_24H_RETRY segundos
+TICKERS_24H_TTL = 60
+TICKERS_24H_RETRY = 10
+_tickers_24h = {"t": 0.0, "retry_at": 0.0, "data": {}}
+_tickers_24h_lock = threading.Lock()  # garante uma única requisição em andamento
+
+# Preço de todos os pares (/api/v3/ticker/price), para avaliar a carteira com uma requisição
+ALL_PRICES_TTL = 5
+_all_prices_cache = {"t": 0.0, "data": {}}
+_all_prices_lock = threading.Lock()
+
+# Universo de moedas negociáveis: {"t": obtido_em, "coins": lista}
+COINS_CACHE_TTL = 3600
+_coins_cache = {"t": 0.0, "coins": None}
+
+# Volumes diários já fechados: (par, intervalo, dias) -> (expira_em, volumes)
+DAILY_VOLUMES_TTL = 3600
+_daily_volumes_cache = {}
+_daily_volumes_lock = threading.Lock()
+
+# Filtros de negociação de todos os pares, de uma única consulta a exchangeInfo: par -> filtros
+EXCHANGE_FILTERS = {}
+EXCHANGE_BASE_ASSETS = {}  # par -> ativo base (ex: 'BTCUSDT' -> 'BTC'), da mesma consulta
+EXCHANGE_PRECISIONS = {}  # par -> casas decimais do stepSize, calculadas uma vez no carregamento
+_exchange_filters_lock = threading.Lock()
+
+# Último preço consultado por símbolo: símbolo -> (preço, obtido_em monotônico)
+_PRICE_CACHE = {}
+
+# Último array de fechamentos por thread: ((par, minuto), array)
+_closes_tls = threading.local()
 
 
 def initialize_client():
@@ -24,6 +67,11 @@ def initialize_client():
     """
     global client
     client = Client(config.BINANCEAPIKEY, config.BINANCESECRETKEY)
+    # O Client já reaproveita conexões pela sua requests.Session, mas o pool padrão
+    # (10 conexões) é menor que o número de threads da filtragem; conexões excedentes
+    # seriam descartadas e refeitas (novo handshake TLS) a cada requisição
+    pool_size = max(config.FILTER_WORKERS, 8)
+    client.session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=pool_size))
     # Testar conexão
     try:
         client.ping()
@@ -37,6 +85,33 @@ def get_client():
     return client
 
 
+def get_websocket_manager():
+    """
+    Retorna o gerenciador de WebSockets da Binance, criando e iniciando na primeira chamada.
+    Todos os streams do bot compartilham o mesmo gerenciador (uma única thread/event loop).
+    """
+    global websocket_manager
+    with _websocket_manager_lock:
+        if websocket_manager is None:
+            from binance import ThreadedWebsocketManager
+            websocket_manager = ThreadedWebsocketManager(
+                api_key=config.BINANCEAPIKEY,
+                api_secret=config.BINANCESECRETKEY
+            )
+            websocket_manager.start()
+            log_info("Gerenciador de WebSockets da Binance iniciado.")
+        return websocket_manager
+
+
+def stop_websocket_manager():
+    """Encerra o gerenciador de WebSockets, se estiver ativo."""
+    global websocket_manager
+    with _websocket_manager_lock:
+        if websocket_manager is not None:
+            websocket_manager.stop()
+            websocket_manager = None
+
+
 def ensure_binance_connection():
     """Garante que o cliente Binance está conectado. Tenta reconectar se necessário."""
     global client
@@ -62,46 +137,55 @@ def get_all_binance_coins():
     """
     Retorna uma lista de todas as moedas disponíveis na Binance que possuem par com USDT
     e têm volume suficiente para trading.
+    A lista muda raramente, então é reaproveitada por COINS_CACHE_TTL segundos
+    (a lista padrão usada em caso de erro não é guardada).
     """
+    cached_coins = _coins_cache["coins"]
+    if cached_coins and time.time() - _coins_cache["t"] < COINS_CACHE_TTL:
+        return list(cached_coins)
+    
     if not ensure_binance_connection():
         # Retorna lista padrão se não conseguir conectar
         default_coins = ['BTC', 'ETH', 'BNB', 'SOL', 'XRP', 'ADA', 'DOGE', 'SHIB', 'DOT', 'AVAX']
         return default_coins
     try:
         # Obter informações de preço para todos os pares
-        tickers = client.get_ticker()
+        tickers = get_all_tickers_24h().values()
+        if not tickers:
+            raise RuntimeError("nenhum ticker 24h disponível")
         
         # Filtrar apenas pares com USDT e com volume significativo
         usdt_pairs = []
         for ticker in tickers:
             symbol = ticker['symbol']
-            base_symbol = symbol.replace('USDT', '')
-            if base_symbol in config.EXCLUDED_SYMBOLS:
+            if not symbol.endswith('USDT'):
+                continue
+            coin = symbol[:-4]
+            if coin in config.EXCLUDED_SYMBOLS:
                 continue
             if any(suffix in symbol for suffix in config.EXCLUDED_SUFFIXES):
                 continue
-            if symbol.endswith('USDT'):
-                try:
-                    volume_24h = float(ticker['quoteVolume'])  # Volume em USDT
-                    if volume_24h > config.MIN_VOLUME_FILTER:
-                        coin = symbol.replace('USDT', '')
-                        usdt_pairs.append(coin)
-                except ValueError:
-                    log_warning(f"Não foi possível converter quoteVolume para float para o ticker: {ticker['symbol']}")
-                    continue
+            try:
+                volume_24h = float(ticker['quoteVolume'])  # Volume em USDT
+                if volume_24h > config.MIN_VOLUME_FILTER:
+                    usdt_pairs.append(coin)
+            except ValueError:
+                log_warning(f"Não foi possível converter quoteVolume para float para o ticker: {ticker['symbol']}")
+                continue
         
         log_info(f"Total de moedas negociáveis (pares USDT com volume > {config.MIN_VOLUME_FILTER}) na Binance: {len(usdt_pairs)}")
         if config.PREFERRED_COINS:
-            prioritized = []
-            for coin in config.PREFERRED_COINS:
-                if coin in usdt_pairs:
-                    prioritized.append(coin)
-            others = [c for c in usdt_pairs if c not in prioritized]
+            available = set(usdt_pairs)
+            prioritized = [coin for coin in config.PREFERRED_COINS if coin in available]
+            prioritized_set = set(prioritized)
+            others = [c for c in usdt_pairs if c not in prioritized_set]
             usdt_pairs = prioritized + others
             log_info(f"Priorizando {len(prioritized)} moedas da whitelist")
-            return usdt_pairs
         if not usdt_pairs:
             log_warning("Nenhuma moeda encontrada que satisfaça os critérios de filtro. Verifique MIN_VOLUME_FILTER.")
+        else:
+            _coins_cache["coins"] = tuple(usdt_pairs)
+            _coins_cache["t"] = time.time()
         return usdt_pairs
     except Exception as e:
         log_error(f"Erro ao obter moedas da Binance: {e}")
@@ -136,6 +220,42 @@ def get_all_balances():
         log_error(f"Erro ao obter todos os saldos: {e}")
         return {}
 
+def get_klines(coin_pair, interval=Client.KLINE_INTERVAL_1HOUR, lookback="3 days ago UTC"):
+    """
+    Obtém os klines brutos de um par, reaproveitando respostas recentes.
+    Cada combinação (par, intervalo, lookback) fica em cache por KLINES_CACHE_TTL segundos,
+    então os vários indicadores de um mesmo ciclo compartilham uma única requisição.
+    Erros não são cacheados; a conexão só é verificada quando é preciso consultar a API.
+    
+    Returns:
+        list: Lista de klines (não modificar; é compartilhada pelo cache)
+    """
+    key = (coin_pair, interval, lookback)
+    now = time.time()
+    
+    with _klines_cache_lock:
+        entry = _klines_cache.get(key)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+    
+    if not ensure_binance_connection():
+        raise ConnectionError("sem conexão com a Binance")
+    klines = client.get_historical_klines(coin_pair, interval, lookback)
+    
+    if klines:
+        with _klines_cache_lock:
+            if len(_klines_cache) >= KLINES_CACHE_MAXSIZE:
+                # Remove as entradas expiradas; se não bastar, a mais antiga
+                for old_key in [k for k, (expiry, _) in _klines_cache.items() if expiry <= now]:
+                    del _klines_cache[old_key]
+                if len(_klines_cache) >= KLINES_CACHE_MAXSIZE:
+                    del _klines_cache[next(iter(_klines_cache))]
+            _klines_cache.pop(key, None)  # Reinsere no fim da ordem de inserção
+            _klines_cache[key] = (now + config.KLINES_CACHE_TTL, klines)
+    
+    return klines
+
+
 def get_historical_data(coin_pair, interval=Client.KLINE_INTERVAL_1HOUR, lookback="3 days ago UTC"): # Lookback aumentado
     """
     Obtém dados históricos para um par de moedas.
@@ -148,10 +268,8 @@ def get_historical_data(coin_pair, interval=Client.KLINE_INTERVAL_1HOUR, lookbac
     Returns:
         pd.DataFrame: DataFrame com dados históricos
     """
-    if not ensure_binance_connection():
-        return pd.DataFrame()
     try:
-        klines = client.get_historical_klines(coin_pair, interval, lookback)
+        klines = get_klines(coin_pair, interval, lookback)
         
         if not klines:
             log_warning(f"Não foram retornados dados históricos (klines) para {coin_pair} com intervalo {interval} e lookback {lookback}.")
@@ -186,30 +304,128 @@ def get_historical_data(coin_pair, interval=Client.KLINE_INTERVAL_1HOUR, lookbac
         return pd.DataFrame()
 
 
+def get_historical_closes(coin_pair, interval=Client.KLINE_INTERVAL_1HOUR, lookback="3 days ago UTC"):
+    """
+    Obtém apenas os preços de fechamento históricos de um par, sem montar um DataFrame.
+    Usado pelos indicadores que só precisam do fechamento (RSI, médias, MACD, volatilidade).
+    
+    Args:
+        coin_pair (str): Par de moedas (ex: 'BTCUSDT')
+        interval (str): Intervalo de tempo (default: 1 hora)
+        lookback (str): Período para olhar para trás (default: 3 dias)
+    
+    Returns:
+        np.ndarray: Array float64 com os fechamentos (vazio em caso de erro)
+    """
+    try:
+        klines = get_klines(coin_pair, interval, lookback)
+        
+        if not klines:
+            log_warning(f"Não foram retornados dados históricos (klines) para {coin_pair} com intervalo {interval} e lookback {lookback}.")
+            return np.empty(0, dtype=np.float64)
+        
+        # Conversão vetorizada das strings de fechamento (um único cast em C)
+        return np.asarray([k[4] for k in klines], dtype=np.float64)
+    except Exception as e:
+        log_error(f"Erro ao obter fechamentos históricos para {coin_pair}: {e}")
+        return np.empty(0, dtype=np.float64)
+
+
+def get_closes_array(coin_pair):
+    """
+    Fechamentos do par (intervalo e lookback padrão) como array float64 contíguo,
+    reaproveitado por todos os indicadores calculados na mesma thread e no mesmo minuto.
+    O array é compartilhado: quem o recebe não deve modificá-lo.
+    
+    Args:
+        coin_pair (str): Par de moedas (ex: 'BTCUSDT')
+    
+    Returns:
+        np.ndarray: Array float64 com os fechamentos (vazio em caso de erro)
+    """
+    key = (coin_pair, int(time.time() // 60))
+    cached = getattr(_closes_tls, 'closes', None)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    
+    closes = np.ascontiguousarray(get_historical_closes(coin_pair), dtype=np.float64)
+    # Falhas (array vazio) não ficam guardadas, para que a próxima chamada tente de novo
+    if closes.size:
+        _closes_tls.closes = (key, closes)
+    return closes
+
+
 def get_trade_rules(coin_pair):
     """
     Retorna as regras relacionadas a LOT_SIZE (quantidade mínima, stepSize como string)
     e NOTIONAL (valor mínimo da ordem) para o par de moedas.
+    As regras de cada par são consultadas uma única vez por execução.
     """
-    if not ensure_binance_connection():
-        return None, None
     try:
-        info = client.get_symbol_info(coin_pair)
+        return _get_trade_rules_cached(coin_pair)
     except Exception as e:
         log_error(f"Erro ao obter informações do símbolo {coin_pair}: {e}")
         return None, None
 
+
+@lru_cache(maxsize=256)
+def _get_symbol_filters(coin_pair):
+    """
+    Filtros de negociação do par. Na primeira chamada carrega os filtros de todos os
+    pares com uma única consulta a exchangeInfo; pares ausentes são consultados um a um.
+    """
+    with _exchange_filters_lock:
+        if not EXCHANGE_FILTERS:
+            if not ensure_binance_connection():
+                raise ConnectionError("sem conexão com a Binance")
+            exchange_info = client.get_exchange_info()
+            for symbol_info in exchange_info.get('symbols', []):
+                EXCHANGE_FILTERS[symbol_info['symbol']] = symbol_info.get('filters', [])
+                EXCHANGE_BASE_ASSETS[symbol_info['symbol']] = symbol_info.get('baseAsset')
+            EXCHANGE_PRECISIONS.update(precompute_precisions(EXCHANGE_FILTERS))
+        filters = EXCHANGE_FILTERS.get(coin_pair)
+    
+    if filters is None:
+        info = client.get_symbol_info(coin_pair)
+        filters = info.get('filters', []) if info else []
+    return filters
+
+
+def get_base_asset(coin_pair):
+    """
+    Ativo base do par segundo o exchangeInfo em cache (mesma consulta dos filtros).
+    Se o par não estiver lá, corta a moeda de cotação do nome.
+    """
+    try:
+        _get_symbol_filters(coin_pair)
+    except Exception as e:
+        log_warning(f"Não foi possível carregar exchangeInfo para {coin_pair}: {e}")
+    return EXCHANGE_BASE_ASSETS.get(coin_pair) or base_asset_from_pair(coin_pair)
+
+
+def _get_trade_rules_cached(coin_pair):
+    """
+    Consulta e interpreta as regras do par. Falhas levantam exceção e, por isso,
+    não ficam no cache.
+    """
+    if not ensure_binance_connection():
+        raise ConnectionError("sem conexão com a Binance")
+    filters = _get_symbol_filters(coin_pair)
+
     lot_size_rules = {}
     min_notional = None
 
-    if info and "filters" in info:
-        for f in info['filters']:
+    if filters:
+        for f in filters:
             if f['filterType'] == 'LOT_SIZE':
                 lot_size_rules = {
                     'minQty': float(f['minQty']),
                     'maxQty': float(f['maxQty']),
-                    'stepSize': f['stepSize']  # Manter como string para precisão
+                    'stepSize': f['stepSize'],  # Manter como string para precisão
+                    'precision': EXCHANGE_PRECISIONS.get(coin_pair)
                 }
+                if lot_size_rules['precision'] is None:
+                    lot_size_rules['precision'] = _determine_precision_from_string(f['stepSize'])
             if f['filterType'] == 'NOTIONAL': # Algumas APIs usam NOTIONAL, outras MIN_NOTIONAL
                  min_notional = float(f.get('minNotional', f.get('notional', 0))) # Prioriza minNotional
             elif f['filterType'] == 'MIN_NOTIONAL': # Garantir que MIN_NOTIONAL seja coberto
@@ -225,14 +441,18 @@ def get_trade_rules(coin_pair):
     return lot_size_rules, min_notional
 
 
-def _adjust_quantity_to_step_size(quantity, step_size_str):
-    """Ajusta a quantidade PARA BAIXO para o múltiplo mais próximo do step_size e formata com a precisão correta."""
+def _adjust_quantity_to_step_size(quantity, step_size_str, precision=None):
+    """
+    Ajusta a quantidade PARA BAIXO para o múltiplo mais próximo do step_size e formata com a precisão correta.
+    `precision` é o número de casas já calculado a partir do stepSize; se omitido, é derivado da string.
+    """
     step_size = float(step_size_str)
     if step_size == 0: 
         log_warning("Step size é 0, retornando quantidade original.")
         return quantity
 
-    precision = _determine_precision_from_string(step_size_str)
+    if precision is None:
+        precision = _determine_precision_from_string(step_size_str)
     
     # Arredonda a quantidade PARA BAIXO para o múltiplo mais próximo do step_size
     # Ex: quantity=10.123, step_size=0.01 -> floor(1012.3)*0.01 = 1012*0.01 = 10.12
@@ -244,17 +464,69 @@ def _adjust_quantity_to_step_size(quantity, step_size_str):
 
 
 def get_current_price(symbol):
-    """Obtém o preço atual de um símbolo"""
+    """
+    Obtém o preço atual de um símbolo.
+    O preço é reaproveitado por config.PRICE_CACHE_TTL segundos, então várias consultas
+    no mesmo ciclo fazem uma única chamada à API.
+    """
+    now = time.monotonic()
+    hit = _PRICE_CACHE.get(symbol)
+    if hit and now - hit[1] < config.PRICE_CACHE_TTL:
+        return hit[0]
     if not ensure_binance_connection():
         return None
     try:
         ticker = client.get_symbol_ticker(symbol=symbol)
-        return float(ticker['price'])
+        price = float(ticker['price'])
+        _PRICE_CACHE[symbol] = (price, now)
+        return price
     except Exception as e:
         log_error(f"Erro ao obter preço atual para {symbol}: {e}")
         return None
 
 
+def get_price_map():
+    """
+    Obtém o preço atual de todos os símbolos em uma única chamada.
+    
+    Returns:
+        dict: Dicionário {símbolo: preço} (vazio em caso de erro)
+    """
+    if not ensure_binance_connection():
+        return {}
+    try:
+        return {ticker['symbol']: float(ticker['price']) for ticker in client.get_all_tickers()}
+    except Exception as e:
+        log_error(f"Erro ao obter preços de todos os símbolos: {e}")
+        return {}
+
+
+def get_all_prices_cached():
+    """
+    Preço de todos os pares em uma única requisição, reaproveitado por ALL_PRICES_TTL segundos.
+    
+    Returns:
+        dict: {símbolo: preço} (vazio em caso de erro)
+    """
+    with _all_prices_lock:
+        now = time.monotonic()
+        if _all_prices_cache["data"] and now - _all_prices_cache["t"] < ALL_PRICES_TTL:
+            return _all_prices_cache["data"]
+        prices = get_price_map()
+        if prices:
+            _all_prices_cache["data"] = prices
+            _all_prices_cache["t"] = now
+        return prices
+
+
+def _asset_price_usdt(asset, prices):
+    """Preço em USDT do ativo pela tabela de preços, consultando o par só se faltar nela."""
+    price = prices.get(f"{asset}USDT")
+    if price is None and not prices:
+        price = get_current_price(f"{asset}USDT")
+    return price
+
+
 def get_account_balance():
     """Retorna o saldo da conta em todas as moedas"""
     if not ensure_binance_connection():
@@ -281,18 +553,60 @@ def get_balance(coin):
         return 0.0
 
 
+def get_balances_snapshot():
+    """
+    Saldos livres (free) de todos os ativos com uma única consulta à conta.
+    Use quando vários saldos são lidos no mesmo momento, em vez de chamar get_balance para cada um.
+    
+    Returns:
+        dict: {ativo: saldo livre} (vazio em caso de erro)
+    """
+    if not ensure_binance_connection():
+        return {}
+    try:
+        account = client.get_account()
+        return {b['asset']: float(b['free']) for b in account['balances']}
+    except Exception as e:
+        log_error(f"Erro ao obter saldos da conta: {e}")
+        return {}
+
+
+def estimate_portfolio_value(balances):
+    """
+    Valor da carteira em USDT a partir de saldos já obtidos, sem consultar a conta de novo
+    nem montar o relatório detalhado de get_portfolio_value.
+    
+    Args:
+        balances (dict): {ativo: quantidade}, ex: o retorno de get_balances_snapshot
+        
+    Returns:
+        float: Valor estimado em USDT (ativos sem preço não entram na soma)
+    """
+    total_value_usdt = balances.get('USDT', 0.0)
+    held = [(asset, amount) for asset, amount in balances.items()
+            if asset != 'USDT' and amount > 0.00000001] # Tolerância para poeira
+    prices = get_all_prices_cached() if held else {}
+    for asset, amount in held:
+        price = _asset_price_usdt(asset, prices)
+        if price:
+            total_value_usdt += amount * price
+    return total_value_usdt
+
+
 def get_portfolio_value():
     """
     Calcula e retorna o valor total da carteira em USDT.
     Considera todas as moedas disponíveis e também o saldo em USDT.
+    Usa uma consulta à conta e uma tabela com o preço de todos os pares.
     """
     total_value_usdt = 0.0
     assets = get_account_balance() # Usa a função robustecida
+    prices = get_all_prices_cached()
     
     log_info("\n=== PORTFOLIO ATUAL DETALHADO ===")
     
-    # Adiciona USDT primeiro
-    usdt_balance = get_balance('USDT')
+    # Adiciona USDT primeiro (saldo livre, da mesma consulta à conta)
+    usdt_balance = next((float(a['free']) for a in assets if a['asset'] == 'USDT'), 0.0)
     if usdt_balance > 0:
         log_info(f"USDT: {usdt_balance:.2f} USDT")
         total_value_usdt += usdt_balance
@@ -309,8 +623,7 @@ def get_portfolio_value():
             continue
             
         # Para outras moedas, converte para USDT
-        pair_symbol = f"{symbol}USDT"
-        current_price = get_current_price(pair_symbol)
+        current_price = _asset_price_usdt(symbol, prices)
         
         if current_price is not None and current_price > 0:
             asset_value_usdt = total_amount * current_price
@@ -373,7 +686,7 @@ def buy_coin(coin_pair, available_usdt_to_spend):
     step_size_str = lot_size_rules.get('stepSize', "1") # Default para "1" se não encontrado
     min_qty_val = lot_size_rules.get('minQty', 0.0)
 
-    coin_quantity_adjusted = _adjust_quantity_to_step_size(target_quantity, step_size_str)
+    coin_quantity_adjusted = _adjust_quantity_to_step_size(target_quantity, step_size_str, lot_size_rules.get('precision'))
 
     if coin_quantity_adjusted < min_qty_val:
         log_error(f"Quantidade calculada {coin_quantity_adjusted:.8f} está abaixo da mínima permitida {min_qty_val:.8f} para {coin_pair} após ajuste de stepSize. Saldo USDT: {available_usdt_to_spend:.2f}, Preço: {current_price:.6f}")
@@ -416,10 +729,11 @@ def buy_coin(coin_pair, available_usdt_to_spend):
         return None
 
 
-def sell_coin(coin_pair, quantity_to_sell):
+def sell_coin(coin_pair, quantity_to_sell, current_price=None):
     """
     Executa ordem de venda (market) para 'coin_pair' na quantidade informada,
     respeitando LOT_SIZE e MIN_NOTIONAL.
+    Se current_price for informado, evita uma nova consulta de preço.
     """
     global last_sold_coin, last_trade_time
 
@@ -428,7 +742,8 @@ def sell_coin(coin_pair, quantity_to_sell):
 
     log_info(f"\nTentando vender {quantity_to_sell:.8f} de {coin_pair}.")
     
-    current_price = get_current_price(coin_pair)
+    if current_price is None:
+        current_price = get_current_price(coin_pair)
     if current_price is None or current_price <= 0:
         log_error(f"Preço inválido ou zero para {coin_pair}. Abortando venda.")
         return None
@@ -443,7 +758,7 @@ def sell_coin(coin_pair, quantity_to_sell):
     min_qty_val = lot_size_rules.get('minQty', 0.0)
 
     # Ajusta a quantidade PARA BAIXO para o stepSize. Se a quantidade já for um múltiplo, não muda.
-    coin_quantity_adjusted = _adjust_quantity_to_step_size(quantity_to_sell, step_size_str)
+    coin_quantity_adjusted = _adjust_quantity_to_step_size(quantity_to_sell, step_size_str, lot_size_rules.get('precision'))
 
     if coin_quantity_adjusted < min_qty_val:
         log_warning(f"Quantidade ajustada para venda {coin_quantity_adjusted:.8f} de {coin_pair} é menor que a quantidade mínima ({min_qty_val:.8f}). Verificando se a quantidade original {quantity_to_sell:.8f} é suficiente para o mínimo nocional.")
@@ -507,6 +822,9 @@ def sell_all_coins():
         log_info("Nenhum saldo encontrado na conta para verificar/vender.")
         return 0.0
 
+    # Uma única consulta com os preços de todos os pares, em vez de uma por moeda
+    prices = get_price_map()
+
     log_info("\nVerificando moedas para vender (sell_all_coins)...")
     for balance_item in account_balances:
         coin_symbol = balance_item['asset']
@@ -519,7 +837,7 @@ def sell_all_coins():
         
         try:
             # Verifica se o par existe e tem preço
-            current_price = get_current_price(trading_pair)
+            current_price = prices.get(trading_pair)
             if current_price is None or current_price <= 0:
                 log_info(f"Pulando {coin_symbol}: não foi possível obter preço válido para {trading_pair}.")
                 continue
@@ -538,7 +856,7 @@ def sell_all_coins():
                 continue
                 
             log_info(f"Tentando vender {coin_free_balance:.8f} de {coin_symbol} (par {trading_pair})...")
-            sell_order_response = sell_coin(trading_pair, coin_free_balance) # sell_coin já lida com stepSize e logs
+            sell_order_response = sell_coin(trading_pair, coin_free_balance, current_price) # sell_coin já lida com stepSize e logs
             
             if sell_order_response and 'fills' in sell_order_response and sell_order_response['fills']:
                 sold_any = True
@@ -571,6 +889,54 @@ def sell_all_coins():
 
 # Adicionar estas funções em api/binance_client.py
 
+def get_all_tickers_24h():
+    """
+    Obtém os tickers 24h de todos os pares com uma única requisição (/api/v3/ticker/24hr
+    sem símbolo), reaproveitando o resultado por TICKERS_24H_TTL segundos.
+    
+    Só uma thread faz a requisição por vez; enquanto isso, as demais recebem o último
+    resultado (ou, se ainda não houver nenhum, esperam por ele).
+    
+    Returns:
+        dict: Mapa símbolo -> ticker (o último obtido com sucesso, ou vazio)
+    """
+    data = _tickers_24h["data"]
+    if _tickers_24h_fresh():
+        return data
+    
+    if not _tickers_24h_lock.acquire(blocking=not data):
+        return data
+    try:
+        # Outra thread pode ter atualizado (ou falhado) enquanto esta esperava
+        if _tickers_24h_fresh():
+            return _tickers_24h["data"]
+        
+        try:
+            if not ensure_binance_connection():
+                raise ConnectionError("sem conexão com a Binance")
+            tickers = client.get_ticker()
+            _tickers_24h["data"] = {ticker['symbol']: ticker for ticker in tickers}
+            _tickers_24h["t"] = time.time()
+        except Exception as e:
+            log_error(f"Erro ao obter tickers 24h: {e}")
+            _tickers_24h["retry_at"] = time.time() + TICKERS_24H_RETRY
+        
+        return _tickers_24h["data"]
+    finally:
+        _tickers_24h_lock.release()
+
+
+def _tickers_24h_fresh():
+    """
+    Indica se os tickers 24h em cache podem ser usados sem nova requisição: ainda dentro
+    do TTL ou dentro da pausa após uma falha.
+    """
+    now = time.time()
+    if now < _tickers_24h["retry_at"]:
+        return True
+    return bool(_tickers_24h["data"]) and now - _tickers_24h["t"] < TICKERS_24H_TTL
+
+
 def get_24h_ticker(symbol):
     """
     Obtém dados de ticker das últimas 24h incluindo volume.
@@ -582,7 +948,10 @@ def get_24h_ticker(symbol):
         dict: Dados do ticker ou None em caso de erro
     """
     try:
-        ticker = client.get_ticker(symbol=symbol)
+        ticker = get_all_tickers_24h().get(symbol)
+        if ticker is None:
+            # Par fora da lista em cache: consulta individual
+            ticker = client.get_ticker(symbol=symbol)
         return ticker
     except Exception as e:
         log_error(f"Erro ao obter ticker 24h para {symbol}: {e}")
@@ -612,6 +981,35 @@ def get_24h_volume(symbol):
         return None
 
 
+def _get_completed_volumes(symbol, interval, days):
+    """
+    Volumes em quote asset dos candles já fechados dos últimos `days` períodos.
+    Os volumes diários só mudam quando um candle fecha, então o resultado é
+    reaproveitado por DAILY_VOLUMES_TTL segundos.
+    
+    Returns:
+        list: Volumes em ordem cronológica (vazia se não houver dados)
+    """
+    key = (symbol, interval, days)
+    now = time.time()
+    
+    with _daily_volumes_lock:
+        entry = _daily_volumes_cache.get(key)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+    
+    klines = client.get_historical_klines(symbol, interval, f"{days + 1} days ago UTC")
+    
+    # Extrai volumes (índice 7 é o volume em quote asset), sem o candle atual incompleto
+    volumes = [float(k[7]) for k in klines[:-1]] if klines else []
+    
+    if volumes:
+        with _daily_volumes_lock:
+            _daily_volumes_cache[key] = (now + DAILY_VOLUMES_TTL, volumes)
+    
+    return volumes
+
+
 def get_average_volume(symbol, days=7, interval='1d'):
     """
     Calcula o volume médio dos últimos X dias.
@@ -625,19 +1023,14 @@ def get_average_volume(symbol, days=7, interval='1d'):
         float: Volume médio em USDT ou None em caso de erro
     """
     try:
-        # Busca dados históricos
-        klines = client.get_historical_klines(
-            symbol, 
-            interval,
-            f"{days + 1} days ago UTC"
-        )
+        # Busca ao menos 7 períodos, para que as médias de 3 e 7 dias usem a mesma consulta
+        volumes = _get_completed_volumes(symbol, interval, max(days, 7))
         
-        if not klines:
+        if not volumes:
             log_error(f"Sem dados históricos de volume para {symbol}")
             return None
         
-        # Extrai volumes (índice 7 é o volume em quote asset)
-        volumes = [float(k[7]) for k in klines[:-1]]  # Remove o dia atual incompleto
+        volumes = volumes[-days:]
         
         if volumes:
             avg_volume = sum(volumes) / len(volumes)
@@ -684,6 +1077,7 @@ def get_volume_ratio(symbol, days=7):
         return None
 
 
+@memoize_per_minute
 def get_volume_analysis(symbol):
     """
     Análise completa de volume para um símbolo.
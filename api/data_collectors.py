@@ -1,63 +1,122 @@
 """
 Coletores de dados de fontes externas (Reddit, Twitter, News APIs)
 """
-import praw
-import tweepy
 import requests
+from requests.adapters import HTTPAdapter
 from requests.exceptions import RequestException
-from prawcore.exceptions import PrawcoreException
 from datetime import datetime
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import json
 
 from config import config
 from utils.helpers import log_info, log_error
 
-# Inicialização da API do Reddit
-reddit = praw.Reddit(
-    client_id=config.REDDIT_CLIENT_ID,
-    client_secret=config.REDDIT_CLIENT_SECRET,
-    user_agent=config.REDDIT_USER_AGENT
-)
+# Nomes completos das moedas, usados para melhorar as buscas no Reddit e na News API
+COIN_FULL_NAMES = {
+    'BTC': 'Bitcoin',
+    'ETH': 'Ethereum',
+    'SOL': 'Solana',
+    'ADA': 'Cardano',
+    'DOT': 'Polkadot',
+    'AVAX': 'Avalanche',
+    'DOGE': 'Dogecoin',
+    'SHIB': 'Shiba Inu',
+    'XRP': 'Ripple',
+    'BNB': 'Binance Coin'
+}
+
+# Sessão HTTP compartilhada para a News API (reaproveita conexões TCP/TLS entre moedas)
+NEWS_API_URL = "https://newsapi.org/v2/everything"
+_news_session = requests.Session()
+_news_session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=20))
+
+
+@lru_cache(maxsize=1)
+def _reddit():
+    """
+    Cria (uma única vez) o cliente da API do Reddit.
+    O praw só é importado aqui para não pesar na inicialização do bot.
+    """
+    import praw
+    return praw.Reddit(
+        client_id=config.REDDIT_CLIENT_ID,
+        client_secret=config.REDDIT_CLIENT_SECRET,
+        user_agent=config.REDDIT_USER_AGENT
+    )
+
 
 # Twitter API - Comentado até configurar
-# twitter_auth = tweepy.OAuth1UserHandler(
-#     config.TWITTER_API_KEY, config.TWITTER_API_SECRET,
-#     config.TWITTER_ACCESS_TOKEN, config.TWITTER_ACCESS_SECRET
-# )
-# twitter_api = tweepy.API(twitter_auth)
+# @lru_cache(maxsize=1)
+# def _twitter_api():
+#     import tweepy
+#     twitter_auth = tweepy.OAuth1UserHandler(
+#         config.TWITTER_API_KEY, config.TWITTER_API_SECRET,
+#         config.TWITTER_ACCESS_TOKEN, config.TWITTER_ACCESS_SECRET
+#     )
+#     return tweepy.API(twitter_auth)
 
 
-def init_collectors():
+def _check_reddit():
     """
-    Inicializa os coletores de dados e verifica se estão funcionando
+    Verifica a conexão com a API do Reddit.
+    
+    Returns:
+        tuple: (nome, ok, mensagem)
     """
-    # Verificar conexão com Reddit
+    from prawcore.exceptions import PrawcoreException
+
     try:
-        subreddit = reddit.subreddit("CryptoCurrency")
-        _ = subreddit.subscribers
-        log_info(f"Reddit API inicializada com sucesso. Subscribers: {subreddit.subscribers}")
+        subreddit = _reddit().subreddit("CryptoCurrency")
+        subscribers = subreddit.subscribers
+        return "Reddit", True, f"Reddit API inicializada com sucesso. Subscribers: {subscribers}"
     except PrawcoreException as e:
-        log_error(f"Falha ao conectar ao Reddit: {e}")
+        return "Reddit", False, f"Falha ao conectar ao Reddit: {e}"
     except Exception as e:
-        log_error(f"Erro ao inicializar Reddit API: {e}")
+        return "Reddit", False, f"Erro ao inicializar Reddit API: {e}"
+
+
+def _check_news_api():
+    """
+    Verifica se a News API está respondendo.
     
-    # Verificar News API
+    Returns:
+        tuple: (nome, ok, mensagem)
+    """
     try:
         url = f"https://newsapi.org/v2/everything?q=crypto&pageSize=1&apiKey={config.NEWS_API_KEY}"
         response = requests.get(url, timeout=10)
         if response.status_code == 200:
-            log_info("News API inicializada com sucesso")
-        else:
-            log_error(f"Falha ao inicializar News API. Status code: {response.status_code}")
+            return "News API", True, "News API inicializada com sucesso"
+        return "News API", False, f"Falha ao inicializar News API. Status code: {response.status_code}"
     except RequestException as e:
-        log_error(f"Erro ao verificar News API: {e}")
+        return "News API", False, f"Erro ao verificar News API: {e}"
+
+
+# Verificar Twitter API
+# def _check_twitter():
+#     try:
+#         twitter_user = _twitter_api().verify_credentials()
+#         return "Twitter", True, f"Twitter API inicializada. Usuário: {twitter_user.screen_name}"
+#     except Exception as e:
+#         return "Twitter", False, f"Falha ao inicializar Twitter API: {e}"
+
+
+def init_collectors():
+    """
+    Inicializa os coletores de dados e verifica se estão funcionando.
+    As verificações são independentes e rodam em paralelo.
+    """
+    checks = [_check_reddit, _check_news_api]
     
-    # Verificar Twitter API
-    # try:
-    #     twitter_user = twitter_api.verify_credentials()
-    #     log_info(f"Twitter API inicializada. Usuário: {twitter_user.screen_name}")
-    # except Exception as e:
-    #     log_error(f"Falha ao inicializar Twitter API: {e}")
+    with ThreadPoolExecutor(max_workers=len(checks)) as executor:
+        futures = [executor.submit(check) for check in checks]
+        for future in as_completed(futures):
+            name, ok, message = future.result()
+            if ok:
+                log_info(message)
+            else:
+                log_error(message)
 
 
 def get_reddit_data(coin, limit=20):
@@ -71,7 +130,11 @@ def get_reddit_data(coin, limit=20):
     Returns:
         list: Lista de dicionários com informações dos posts
     """
+    from prawcore.exceptions import PrawcoreException
+
     try:
+        reddit = _reddit()
+
         # Lista de subreddits relevantes
         subreddits = [
             'CryptoCurrency', 
@@ -90,21 +153,8 @@ def get_reddit_data(coin, limit=20):
                 search_queries = [coin]
                 
                 # Se o nome for curto, adicione nomes completos
-                if len(coin) <= 4:
-                    common_names = {
-                        'BTC': 'Bitcoin',
-                        'ETH': 'Ethereum',
-                        'SOL': 'Solana',
-                        'ADA': 'Cardano',
-                        'DOT': 'Polkadot',
-                        'AVAX': 'Avalanche',
-                        'DOGE': 'Dogecoin',
-                        'SHIB': 'Shiba Inu',
-                        'XRP': 'Ripple',
-                        'BNB': 'Binance Coin'
-                    }
-                    if coin in common_names:
-                        search_queries.append(common_names[coin])
+                if len(coin) <= 4 and coin in COIN_FULL_NAMES:
+                    search_queries.append(COIN_FULL_NAMES[coin])
                 
                 for query in search_queries:
                     try:
@@ -175,7 +225,7 @@ def get_twitter_data(coin, count=30):
     #     search_term = extended_terms.get(coin, coin)
     #     search_term = f"{search_term} crypto"
     #     
-    #     tweets = twitter_api.search_tweets(
+    #     tweets = _twitter_api().search_tweets(
     #         q=search_term,
     #         count=count,
     #         lang='en',
@@ -213,22 +263,17 @@ def get_crypto_news(coin, limit=5):
     """
     try:
         # Mapeia símbolos para nomes completos para melhorar a busca
-        coin_names = {
-            'BTC': 'Bitcoin',
-            'ETH': 'Ethereum',
-            'SOL': 'Solana',
-            'DOGE': 'Dogecoin',
-            'ADA': 'Cardano',
-            'XRP': 'Ripple',
-            'BNB': 'Binance'
-        }
-        
-        search_term = coin_names.get(coin, coin)
+        search_term = COIN_FULL_NAMES.get(coin, coin)
         
         # Use News API
-        url = f"https://newsapi.org/v2/everything?q={search_term} crypto&sortBy=publishedAt&pageSize={limit}&apiKey={config.NEWS_API_KEY}"
+        params = {
+            'q': f"{search_term} crypto",
+            'sortBy': 'publishedAt',
+            'pageSize': limit,
+            'apiKey': config.NEWS_API_KEY
+        }
         
-        response = requests.get(url, timeout=10)
+        response = _news_session.get(NEWS_API_URL, params=params, timeout=10)
         data = response.json()
         
         articles = []
@@ -252,12 +297,39 @@ def get_crypto_news(coin, limit=5):
         return []
 
 
-def collect_all_data_for_coin(coin):
+def fetch_news_for_coins(coins, limit=5, max_workers=20):
+    """
+    Obtém notícias para várias moedas de uma vez, com requisições simultâneas
+    sobre a mesma sessão HTTP.
+    
+    Args:
+        coins (list): Lista de símbolos das criptomoedas
+        limit (int): Número máximo de notícias por moeda
+        max_workers (int): Número máximo de requisições simultâneas
+        
+    Returns:
+        dict: Dicionário {moeda: lista de artigos}
+    """
+    if not coins:
+        return {}
+    
+    news_by_coin = {}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(coins))) as executor:
+        future_to_coin = {executor.submit(get_crypto_news, coin, limit): coin for coin in coins}
+        for future in as_completed(future_to_coin):
+            news_by_coin[future_to_coin[future]] = future.result()
+    
+    return news_by_coin
+
+
+def collect_all_data_for_coin(coin, news_data=None):
     """
     Coleta todos os dados disponíveis para uma moeda específica.
     
     Args:
         coin (str): Símbolo da criptomoeda
+        news_data (list, optional): Notícias já obtidas (ex: via fetch_news_for_coins).
+            Se None, as notícias são buscadas aqui.
         
     Returns:
         dict: Dicionário com todos os dados coletados
@@ -266,7 +338,8 @@ def collect_all_data_for_coin(coin):
     
     # Coleta dados de diferentes fontes
     reddit_data = get_reddit_data(coin)
-    news_data = get_crypto_news(coin)
+    if news_data is None:
+        news_data = get_crypto_news(coin)
     twitter_data = get_twitter_data(coin)  # Retornará lista vazia até configurar
     
     # Combina todos os dados
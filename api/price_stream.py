@@ -0,0 +1,102 @@
+"""
+Último preço dos pares com posição aberta, mantido pelo stream de trades da Binance
+(<par>@trade: um evento por negócio, sem a agregação de 1s do miniTicker)
+"""
+import threading
+import time
+
+from utils.helpers import log_info, log_error
+from api.binance_client import get_websocket_manager
+
+# Par -> (preço, recebido_em)
+PRICE_CACHE = {}
+_stream_names = {}
+_price_cache_lock = threading.Lock()
+
+# Callbacks (par, preço) chamados a cada preço recebido
+_tick_listeners = []
+
+
+def _handle_trade_message(msg):
+    """
+    Callback do stream: guarda o preço do último negócio do par.
+    """
+    if msg.get('e') != 'trade':
+        if msg.get('e') == 'error':
+            log_error(f"Erro no stream de preços: {msg.get('m')}")
+        return
+    
+    coin_pair = msg['s']
+    price = float(msg['p'])
+    with _price_cache_lock:
+        PRICE_CACHE[coin_pair] = (price, time.time())
+    
+    for callback in _tick_listeners:
+        try:
+            callback(coin_pair, price)
+        except Exception as e:
+            log_error(f"Erro no callback de preço para {coin_pair}: {e}")
+
+
+def add_tick_listener(callback):
+    """
+    Registra callback(par, preço) para cada preço recebido pelo stream.
+    Roda na thread do stream: deve ser rápido e não fazer chamadas de rede.
+    """
+    if callback not in _tick_listeners:
+        _tick_listeners.append(callback)
+
+
+def subscribe(coin_pair):
+    """
+    Inscreve o par no stream de trades (sem efeito se já estiver inscrito).
+    
+    Args:
+        coin_pair (str): Par de moedas (ex: 'BTCUSDT')
+    """
+    if coin_pair in _stream_names:
+        return
+    try:
+        twm = get_websocket_manager()
+        _stream_names[coin_pair] = twm.start_trade_socket(
+            callback=_handle_trade_message,
+            symbol=coin_pair
+        )
+        log_info(f"Stream de preços iniciado para {coin_pair}")
+    except Exception as e:
+        log_error(f"Erro ao iniciar stream de preços para {coin_pair}: {e}")
+
+
+def unsubscribe(coin_pair):
+    """
+    Cancela a inscrição do par e descarta o preço guardado.
+    """
+    stream_name = _stream_names.pop(coin_pair, None)
+    with _price_cache_lock:
+        PRICE_CACHE.pop(coin_pair, None)
+    if stream_name is None:
+        return
+    try:
+        get_websocket_manager().stop_socket(stream_name)
+    except Exception as e:
+        log_error(f"Erro ao encerrar stream de preços {stream_name}: {e}")
+
+
+def get_cached_price(coin_pair, max_age=2.0):
+    """
+    Retorna o último preço recebido pelo stream, sem nenhuma chamada de rede.
+    
+    Args:
+        coin_pair (str): Par de moedas
+        max_age (float): Idade máxima do preço em segundos
+        
+    Returns:
+        float: Preço ou None se o par não estiver inscrito ou o preço estiver velho
+    """
+    entry = PRICE_CACHE.get(coin_pair)
+    if entry is None:
+        return None
+    price, received_at = entry
+    if time.time() - received_at > max_age:
+        return None
+    return price
@@ -10,7 +10,7 @@ Versão: 1.0.0
 import os
 import sys
 import time
-from datetime import datetime
+import signal
 
 # Adiciona os diretórios ao path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -18,11 +18,11 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 # Importações dos módulos
 from config import config
 from utils.helpers import log_info, log_error, wait_with_progress
-from api.binance_client import initialize_client, get_portfolio_value, sell_all_coins
+from api.binance_client import initialize_client, get_portfolio_value, sell_all_coins, stop_websocket_manager
 from api.data_collectors import init_collectors
 from llm.client import diagnose_llm_server
-from analysis.sentiment import clear_sentiment_cache
-from strategy.trading import execute_strategy_enhanced, save_bot_state
+from analysis.sentiment import sweep_expired
+from strategy.trading import execute_strategy_enhanced, save_bot_state, TRIGGER_EVENT
 
 
 def initialize_bot():
@@ -94,6 +94,10 @@ def main(interval=None):
     if interval is None:
         interval = config.DEFAULT_INTERVAL
     
+    # SIGTERM (ex: systemd/docker stop) encerra pelo mesmo caminho do Ctrl+C:
+    # interrompe a espera na hora e salva o estado antes de sair
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    
     # Inicializa o bot
     if not initialize_bot():
         log_error("Falha na inicialização. Encerrando...")
@@ -103,11 +107,14 @@ def main(interval=None):
     # Contador para controle de análises completas de sentimento
     cycle_counter = 0
     
+    # Valores invariantes do loop calculados uma única vez
+    cycle_done_message = f"\nCiclo completado. Próxima execução em {interval} minutos."
+    
     # Loop principal
     try:
         while True:
             log_info(f"\n==== INICIANDO CICLO DE TRADING {cycle_counter + 1} ====")
-            log_info(f"Data/Hora: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+            log_info("Data/Hora: %s", time.strftime('%Y-%m-%d %H:%M:%S'))
             
             # Executa a estratégia
             try:
@@ -119,13 +126,12 @@ def main(interval=None):
             # Incrementa contador de ciclos
             cycle_counter += 1
             
-            # Limpa o cache periodicamente
-            if cycle_counter % 12 == 0:  # A cada 12 ciclos
-                clear_sentiment_cache()
+            # Remove do cache de sentimento apenas as entradas que já expiraram
+            sweep_expired()
             
-            # Aguarda até o próximo ciclo
-            log_info(f"\nCiclo completado. Próxima execução em {interval} minutos.")
-            wait_with_progress(interval)
+            # Aguarda até o próximo ciclo (ou até o stream de preços sinalizar SL/TP)
+            log_info(cycle_done_message)
+            wait_with_progress(interval, wake_event=TRIGGER_EVENT)
     
     except KeyboardInterrupt:
         log_info("\n==== BOT INTERROMPIDO PELO USUÁRIO ====")
@@ -138,6 +144,8 @@ def main(interval=None):
         log_info("Portfolio final:")
         save_bot_state() 
         get_portfolio_value()
+        # Encerra os streams (a thread do gerenciador impediria o processo de terminar)
+        stop_websocket_manager()
 
 
 if __name__ == "__main__":
@@ -4,14 +4,17 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-@dataclass
+# Retrato único do ambiente (já com o .env carregado); os campos abaixo leem daqui
+_ENV = dict(os.environ)
+
+@dataclass(frozen=True, slots=True)
 class Config:
     """Configurações gerais do bot"""
     # Chaves da Binance
-    BINANCEAPIKEY: str = os.getenv("BINANCE_API_KEY", "")
-    BINANCESECRETKEY: str = os.getenv("BINANCE_SECRET_KEY", "")
-    BINANCETESTSECRETKEY: str = os.getenv("BINANCE_TEST_SECRET_KEY", "")
-    BINANCETESTAPIKEY: str = os.getenv("BINANCE_TEST_API_KEY", "")
+    BINANCEAPIKEY: str = _ENV.get("BINANCE_API_KEY", "")
+    BINANCESECRETKEY: str = _ENV.get("BINANCE_SECRET_KEY", "")
+    BINANCETESTSECRETKEY: str = _ENV.get("BINANCE_TEST_SECRET_KEY", "")
+    BINANCETESTAPIKEY: str = _ENV.get("BINANCE_TEST_API_KEY", "")
     
 
 
@@ -29,6 +32,9 @@ class Config:
     # Perda máxima permitida por dia em USDT antes de pausar as operações
     MAX_DAILY_LOSS_USDT: float = 100
     MAX_COINS_TO_ANALYZE: int = 60
+    FILTER_WORKERS: int = 16  # threads para a filtragem técnica das moedas
+    KLINES_CACHE_TTL: int = 60  # segundos que um histórico de klines é reaproveitado
+    SLTP_CACHE_TTL: int = 300  # segundos que o SL/TP dinâmico (ATR) de um par é reaproveitado
     POSITION_MAX_HOLD_TIME = 42400  # 6 horas
     POSITION_FORCE_SELL_TIME = 172800  # 12 horas
     TRAILING_STOP_DISTANCE = 0.08   # 1.5%
@@ -44,32 +50,64 @@ class Config:
     LLM_SERVER_TIMEOUT: int = 10000
     LLM_RESPONSE_WAIT: int = 3000
     LLM_REQUEST_RETRIES: int = 3
+    LLM_RETRY_BASE_DELAY: float = 1.0  # segundos
+    LLM_RETRY_MAX_DELAY: float = 30.0  # teto da espera entre tentativas
+    LLM_TARGET_LATENCY: float = 60.0  # acima disso, reduz as consultas simultâneas ao LLM
     LLM_PROMPT_MAX_LENGTH: int = 16000
+    LLM_BATCH_SENTIMENT: bool = True  # analisa o sentimento de todos os candidatos em uma única consulta
+    LLM_STREAM_RESPONSES: bool = True  # lê a resposta em streaming e encerra ao fechar o JSON
+    LLM_HEALTH_CHECK_METHODS: tuple = ("ping", "models")  # ordem de tentativa: "ping", "models" ou "skip"
+    LLM_HEALTH_TIMEOUT: float = 5.0  # segundos; limitado a LLM_SERVER_TIMEOUT
+    LLM_HEALTH_CACHE_TTL: float = 5.0  # segundos que o resultado da verificação de saúde é reaproveitado
     USE_OPENAI_FALLBACK: bool = False
 
     # Chaves de serviços externos
-    OPENAI_KEY: str = os.getenv("OPENAI_KEY", "")
-    NEWS_API_KEY: str = os.getenv("NEWS_API_KEY", "")
-    REDDIT_CLIENT_ID: str = os.getenv("REDDIT_CLIENT_ID", "")
-    REDDIT_CLIENT_SECRET: str = os.getenv("REDDIT_CLIENT_SECRET", "")
-    REDDIT_USER_AGENT: str = os.getenv("REDDIT_USER_AGENT", "crypto-bot")
-    TWITTER_API_KEY: str = os.getenv("TWITTER_API_KEY", "")
-    TWITTER_API_SECRET: str = os.getenv("TWITTER_API_SECRET", "")
-    TWITTER_ACCESS_TOKEN: str = os.getenv("TWITTER_ACCESS_TOKEN", "")
-    TWITTER_ACCESS_SECRET: str = os.getenv("TWITTER_ACCESS_SECRET", "")
+    OPENAI_KEY: str = _ENV.get("OPENAI_KEY", "")
+    NEWS_API_KEY: str = _ENV.get("NEWS_API_KEY", "")
+    REDDIT_CLIENT_ID: str = _ENV.get("REDDIT_CLIENT_ID", "")
+    REDDIT_CLIENT_SECRET: str = _ENV.get("REDDIT_CLIENT_SECRET", "")
+    REDDIT_USER_AGENT: str = _ENV.get("REDDIT_USER_AGENT", "crypto-bot")
+    TWITTER_API_KEY: str = _ENV.get("TWITTER_API_KEY", "")
+    TWITTER_API_SECRET: str = _ENV.get("TWITTER_API_SECRET", "")
+    TWITTER_ACCESS_TOKEN: str = _ENV.get("TWITTER_ACCESS_TOKEN", "")
+    TWITTER_ACCESS_SECRET: str = _ENV.get("TWITTER_ACCESS_SECRET", "")
+
+    # RSI incremental (Wilder) via stream de klines. Desligado por padrão porque a
+    # suavização de Wilder gera valores diferentes do RSI por média simples.
+    USE_KLINE_STREAM_RSI: bool = False
+
+    # Preço da posição aberta via stream de trades; a REST só é usada se o
+    # último preço recebido tiver mais de PRICE_STREAM_MAX_AGE segundos
+    USE_PRICE_STREAM: bool = True
+    PRICE_STREAM_MAX_AGE: float = 2.0
+    PRICE_CACHE_TTL: float = 1.0  # segundos que um preço consultado via REST é reaproveitado
+    # Variação mínima (fração) desde a última avaliação para reavaliar trailing/timeout/SL/TP
+    # quando o preço está longe dos níveis de saída
+    MIN_REEVAL_DELTA: float = 0.001
+    # Segundos após uma venda disparada que falhou (ex: abaixo de minQty/MIN_NOTIONAL) sem que
+    # o stream de preços acorde o loop de novo; a nova tentativa fica para o próximo ciclo
+    SELL_RETRY_INTERVAL: float = 60.0
 
     # Configurações de análise de sentimento
-    SENTIMENT_CACHE_DURATION: int = 36000
+    # Segundos que uma análise de sentimento de uma moeda é reaproveitada (1 hora)
+    SENTIMENT_CACHE_DURATION: int = 3600
     
     MAX_TRADES_PER_DAY: int = 5  # Mais trades permitidos
     MIN_TIME_BETWEEN_TRADES: int = 1800  # 30 min entre trades
+    STATE_SAVE_MIN_INTERVAL: int = 300  # segundos sem regravar um estado idêntico
+    # Formato do arquivo de estado: 'json' (bot_state.json) ou 'msgpack' (bot_state.msgpack,
+    # mais compacto; exige o pacote msgpack, senão continua em JSON)
+    STATE_FORMAT: str = 'json'
+    # Nível mínimo dos logs: DEBUG, INFO, TRADE, WARNING ou ERROR
+    LOG_LEVEL: str = _ENV.get("LOG_LEVEL", "INFO")
     
-    # EXCLUIR forex mas permitir mais altcoins
-    EXCLUDED_SYMBOLS = ['EUR', 'GBP', 'AUD', 'USD', 'CAD']
-    EXCLUDED_SUFFIXES = ['UP', 'DOWN', 'BEAR', 'BULL']
+    # EXCLUIR forex mas permitir mais altcoins (constantes imutáveis; frozenset para busca O(1))
+    EXCLUDED_SYMBOLS = frozenset({'EUR', 'GBP', 'AUD', 'USD', 'CAD'})
+    EXCLUDED_SUFFIXES = ('UP', 'DOWN', 'BEAR', 'BULL')
     
     # MOEDAS VOLÁTEIS para agressividade (Top 30 + altcoins promissoras)
-    PREFERRED_COINS = [
+    # Tupla porque a ordem define a prioridade
+    PREFERRED_COINS = (
         # Top caps (base sólida)
         'BTC', 'ETH', 'BNB', 'SOL', 'XRP',
         # Alta volatilidade + liquidez
@@ -78,7 +116,7 @@ class Config:
         'AXS', 'APE', 'OP', 'ARB', 'DOGE',
         # Moonshots (menor alocação mas alto potencial)
         'INJ', 'SEI', 'TIA', 'SUI', 'APT'
-    ]
+    )
     
     MIN_SIGNALS_REQUIRED: int = 2
     ALLOW_NEUTRAL_TREND: bool = True
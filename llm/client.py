@@ -1,33 +1,318 @@
 """
 Cliente para comunicação com o servidor LLM local
 """
+import json
 import time
+import random
+import threading
 import requests
+from requests.adapters import HTTPAdapter
 from requests.exceptions import RequestException, Timeout, ConnectionError
 
 from config import config
 from utils.helpers import log_info, log_error
 
+try:
+    import orjson
+except ImportError:  # orjson é opcional; usa o json da biblioteca padrão
+    orjson = None
 
 
-def is_llm_server_online():
+def _loads(content):
+    """Decodifica um corpo JSON (bytes) com orjson quando disponível."""
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def _dumps(payload):
+    """Serializa o payload para bytes JSON com orjson quando disponível."""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
+
+# Sessão HTTP única para o servidor LLM: mantém as conexões abertas (keep-alive)
+# entre consultas, retries e verificações de saúde
+_SESSION = requests.Session()
+_SESSION.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=0))
+_SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=0))
+_SESSION.headers.update({"Connection": "keep-alive"})
+
+# Headers das consultas de chat, passados por requisição sem alterar o estado da sessão
+_CHAT_HEADERS = {
+    "Content-Type": "application/json",
+    "Accept": "application/json"
+}
+
+# Latência média (EWMA) das respostas do LLM, usada para dimensionar a concorrência
+_LATENCY_EWMA_ALPHA = 0.3
+_latency_ewma = None
+_latency_lock = threading.Lock()
+
+
+def _record_llm_latency(seconds):
+    """Atualiza a média móvel exponencial do tempo de resposta do LLM."""
+    global _latency_ewma
+    with _latency_lock:
+        if _latency_ewma is None:
+            _latency_ewma = seconds
+        else:
+            _latency_ewma = _LATENCY_EWMA_ALPHA * seconds + (1 - _LATENCY_EWMA_ALPHA) * _latency_ewma
+
+
+def recommended_llm_concurrency(max_workers):
+    """
+    Sugere quantas consultas simultâneas enviar ao LLM.
+    Reduz a concorrência proporcionalmente quando a latência média passa de LLM_TARGET_LATENCY.
+    
+    Args:
+        max_workers (int): Limite máximo de consultas simultâneas
+        
+    Returns:
+        int: Número de workers entre 1 e max_workers
+    """
+    with _latency_lock:
+        latency = _latency_ewma
+    if latency is None or latency <= config.LLM_TARGET_LATENCY:
+        return max_workers
+    return max(1, min(max_workers, int(max_workers * config.LLM_TARGET_LATENCY / latency)))
+
+
+# Último resultado da verificação de saúde do servidor LLM
+_HEALTH = {"t": 0.0, "ok": False}
+_health_lock = threading.Lock()
+
+
+def _health_ping(timeout):
+    """Envia uma consulta de chat mínima (1 token) ao servidor LLM."""
+    payload = {
+        "model": config.LLM_MODEL_NAME,
+        "messages": [{"role": "user", "content": "ping"}],
+        "max_tokens": 1,
+        "stream": False
+    }
+    response = _SESSION.post(f"{config.LLM_SERVER_URL}/v1/chat/completions", json=payload, timeout=timeout)
+    return response.status_code
+
+
+def _health_models(timeout):
+    """Consulta o endpoint de modelos com HEAD, sem baixar o catálogo."""
+    response = _SESSION.head(f"{config.LLM_SERVER_URL}/v1/models", timeout=timeout)
+    return response.status_code
+
+
+_HEALTH_CHECKS = {
+    "ping": _health_ping,
+    "models": _health_models
+}
+
+
+def _check_llm_health():
+    """
+    Percorre os métodos de LLM_HEALTH_CHECK_METHODS até um deles confirmar que o servidor responde.
+    
+    Returns:
+        bool: True se algum método confirmou o servidor online
+    """
+    timeout = min(config.LLM_HEALTH_TIMEOUT, config.LLM_SERVER_TIMEOUT)
+    
+    for method in config.LLM_HEALTH_CHECK_METHODS:
+        if method == "skip":
+            log_info("Verificação de saúde do servidor LLM ignorada (skip)")
+            return True
+        
+        check = _HEALTH_CHECKS.get(method)
+        if check is None:
+            log_error(f"Método de verificação de saúde desconhecido: {method}")
+            continue
+        
+        try:
+            status_code = check(timeout)
+        except (RequestException, Timeout, ConnectionError) as e:
+            log_error(f"Erro ao conectar ao servidor LLM local ({method}): {e}")
+            continue
+        
+        if status_code == 200:
+            return True
+        log_error(f"Servidor LLM local retornou código de status {status_code} ({method})")
+    
+    return False
+
+
+def is_llm_server_online(force=False):
     """
     Verifica se o servidor LLM local está online e respondendo.
+    O resultado é reaproveitado por LLM_HEALTH_CACHE_TTL segundos.
+    
+    Args:
+        force (bool): Ignora o resultado em cache e verifica novamente
     
     Returns:
         bool: True se o servidor estiver online, False caso contrário
     """
+    with _health_lock:
+        if not force and time.time() - _HEALTH["t"] < config.LLM_HEALTH_CACHE_TTL:
+            return _HEALTH["ok"]
+        
+        ok = _check_llm_health()
+        _HEALTH["t"] = time.time()
+        _HEALTH["ok"] = ok
+    
+    if ok:
+        log_info("Servidor LLM local está online e respondendo.")
+    return ok
+
+
+def _read_streamed_content(response):
+    """
+    Lê uma resposta em streaming (Server-Sent Events) acumulando o conteúdo gerado.
+    Retorna assim que o primeiro valor JSON do conteúdo (objeto ou lista) estiver completo
+    (chaves e colchetes balanceados, ignorando os que aparecem dentro de strings), sem
+    esperar o fim da geração. Um "[" só abre uma lista se o próximo caractere não branco
+    for "{", '"' ou "]", para que um preâmbulo como "Análise [BTC]:" não encerre a leitura.
+    
+    Returns:
+        str: Conteúdo acumulado da resposta
+    """
+    parts = []
+    depth = 0
+    started = False
+    pending_list = False
+    in_string = False
+    escaped = False
+    
     try:
-        response = requests.get(f"{config.LLM_SERVER_URL}/v1/models", timeout=config.LLM_SERVER_TIMEOUT)
-        if response.status_code == 200:
-            log_info("Servidor LLM local está online e respondendo.")
-            return True
+        for line in response.iter_lines():
+            if not line.startswith(b"data:"):
+                continue
+            data = line[5:].strip()
+            if data == b"[DONE]":
+                break
+            try:
+                chunk = _loads(data)
+            except ValueError:
+                continue
+            
+            choices = chunk.get("choices") or []
+            if not choices:
+                continue
+            text = (choices[0].get("delta") or {}).get("content")
+            if not text:
+                continue
+            parts.append(text)
+            
+            # Acompanha o nível de aninhamento do JSON para encerrar assim que ele fechar
+            for char in text:
+                if not started:
+                    if pending_list:
+                        if char.isspace():
+                            continue
+                        pending_list = False
+                        if char in '{"]':
+                            # O "[" anterior abriu a lista; o caractere atual é tratado abaixo
+                            started = True
+                            depth = 1
+                    if not started:
+                        if char == "{":
+                            started = True
+                            depth = 1
+                        elif char == "[":
+                            pending_list = True
+                        continue
+                
+                if in_string:
+                    if escaped:
+                        escaped = False
+                    elif char == "\\":
+                        escaped = True
+                    elif char == '"':
+                        in_string = False
+                elif char == "{" or char == "[":
+                    depth += 1
+                elif char == '"':
+                    in_string = True
+                elif char == "}" or char == "]":
+                    depth -= 1
+                    if depth == 0:
+                        return "".join(parts)
+    finally:
+        # Fecha a conexão para que o servidor pare de gerar tokens desnecessários
+        response.close()
+    
+    return "".join(parts)
+
+
+class RecoverableError(Exception):
+    """Falha transitória ao consultar o LLM (timeout, conexão, 5xx, 429); vale tentar de novo."""
+
+
+class UnrecoverableError(Exception):
+    """Falha definitiva ao consultar o LLM (requisição inválida, 4xx); não adianta repetir."""
+
+
+def _send_chat_request(messages, temperature=0.2, max_tokens=8192):
+    """
+    Envia a solicitação de chat ao servidor LLM local.
+    
+    Returns:
+        dict: Resposta do LLM com conteúdo válido
+        
+    Raises:
+        RecoverableError: Timeout, erro de conexão, status 5xx/429 ou resposta sem conteúdo
+        UnrecoverableError: Demais status 4xx (ex: 400, 401, 422)
+    """
+    stream = config.LLM_STREAM_RESPONSES
+    payload = {
+        "model": config.LLM_MODEL_NAME,
+        "reasoning": "High",
+        "messages": messages,
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+        "stream": stream
+    }
+    
+    # Aumenta o timeout significativamente para modelos grandes
+    timeout_value = config.LLM_RESPONSE_WAIT
+    
+    log_info(f"Enviando solicitação para LLM com timeout de {timeout_value}s")
+    
+    try:
+        start_time = time.time()
+        response = _SESSION.post(
+            f"{config.LLM_SERVER_URL}/v1/chat/completions", 
+            data=_dumps(payload),
+            headers=_CHAT_HEADERS,
+            timeout=timeout_value,
+            stream=stream
+        )
+        
+        if response.status_code != 200:
+            message = f"Erro ao consultar LLM local. Status: {response.status_code}, Resposta: {response.text}"
+            if 400 <= response.status_code < 500 and response.status_code != 429:
+                raise UnrecoverableError(message)
+            raise RecoverableError(message)
+        
+        if stream and "text/event-stream" in response.headers.get("Content-Type", ""):
+            # Monta uma resposta no mesmo formato da API sem streaming
+            content = _read_streamed_content(response)
+            result = {"choices": [{"index": 0, "message": {"role": "assistant", "content": content}}]}
         else:
-            log_error(f"Servidor LLM local retornou código de status {response.status_code}")
-            return False
-    except (RequestException, Timeout, ConnectionError) as e:
-        log_error(f"Erro ao conectar ao servidor LLM local: {e}")
-        return False
+            result = _loads(response.content)
+        _record_llm_latency(time.time() - start_time)
+    except requests.Timeout:
+        raise RecoverableError(f"Timeout ao consultar LLM local após {timeout_value}s")
+    except (requests.ConnectionError, requests.exceptions.ChunkedEncodingError):
+        raise RecoverableError("Erro de conexão com o servidor LLM local")
+    
+    log_info("Resposta recebida com sucesso do LLM")
+    # Verificação adicional para garantir que temos conteúdo válido
+    if (result and 'choices' in result and 
+        len(result['choices']) > 0 and 
+        'message' in result['choices'][0] and
+        'content' in result['choices'][0]['message']):
+        return result
+    raise RecoverableError("Resposta do LLM não contém conteúdo válido")
 
 
 def query_local_llm(messages, temperature=0.2, max_tokens=8192):
@@ -43,54 +328,9 @@ def query_local_llm(messages, temperature=0.2, max_tokens=8192):
         dict: Resposta do LLM ou None em caso de erro
     """
     try:
-        payload = {
-            "model": config.LLM_MODEL_NAME,
-            "reasoning": "High",
-            "messages": messages,
-            "temperature": temperature,
-            "max_tokens": max_tokens,
-            "stream": False  # Garante que não estamos usando streaming
-        }
-        
-        # Aumenta o timeout significativamente para modelos grandes
-        timeout_value = config.LLM_RESPONSE_WAIT
-        
-        log_info(f"Enviando solicitação para LLM com timeout de {timeout_value}s")
-        
-        # Define headers explícitos
-        headers = {
-            "Content-Type": "application/json",
-            "Accept": "application/json"
-        }
-        
-        session = requests.Session()
-        response = session.post(
-            f"{config.LLM_SERVER_URL}/v1/chat/completions", 
-            json=payload,
-            headers=headers,
-            timeout=timeout_value
-        )
-        
-        if response.status_code == 200:
-            result = response.json()
-            log_info("Resposta recebida com sucesso do LLM")
-            # Verificação adicional para garantir que temos conteúdo válido
-            if (result and 'choices' in result and 
-                len(result['choices']) > 0 and 
-                'message' in result['choices'][0] and
-                'content' in result['choices'][0]['message']):
-                return result
-            else:
-                log_error("Resposta do LLM não contém conteúdo válido")
-                return None
-        else:
-            log_error(f"Erro ao consultar LLM local. Status: {response.status_code}, Resposta: {response.text}")
-            return None
-    except requests.Timeout:
-        log_error(f"Timeout ao consultar LLM local após {timeout_value}s")
-        return None
-    except requests.ConnectionError:
-        log_error("Erro de conexão com o servidor LLM local")
+        return _send_chat_request(messages, temperature, max_tokens)
+    except (RecoverableError, UnrecoverableError) as e:
+        log_error(str(e))
         return None
     except Exception as e:
         log_error(f"Exceção ao consultar LLM local: {e}")
@@ -100,6 +340,8 @@ def query_local_llm(messages, temperature=0.2, max_tokens=8192):
 def query_local_llm_with_retry(messages, temperature=0.2, max_tokens=8192, max_retries=None):
     """
     Tenta consultar o LLM local com mecanismo de retry.
+    Usa backoff exponencial com jitter (limitado a LLM_RETRY_MAX_DELAY) e desiste
+    imediatamente em erros que não se resolvem com nova tentativa.
     
     Args:
         messages (list): Lista de mensagens para o LLM
@@ -115,15 +357,21 @@ def query_local_llm_with_retry(messages, temperature=0.2, max_tokens=8192, max_r
 
     for attempt in range(max_retries):
         log_info(f"Tentativa {attempt+1}/{max_retries} de consulta ao LLM local")
-        result = query_local_llm(messages, temperature, max_tokens)
-        
-        if result is not None:
-            return result
+        try:
+            return _send_chat_request(messages, temperature, max_tokens)
+        except UnrecoverableError as e:
+            log_error(f"{e}. Erro não recuperável, abortando novas tentativas")
+            return None
+        except RecoverableError as e:
+            log_error(str(e))
+        except Exception as e:
+            log_error(f"Exceção ao consultar LLM local: {e}")
         
-        # Espera progressiva entre tentativas (1s, 2s, 4s...)
+        # Full jitter: espera aleatória entre 0 e min(teto, base * 2^tentativa),
+        # evitando que threads paralelas repitam a consulta ao mesmo tempo
         if attempt < max_retries - 1:  # Não espera após a última tentativa
-            wait_time = 2 ** attempt
-            log_info(f"Aguardando {wait_time}s antes da próxima tentativa...")
+            wait_time = random.uniform(0, min(config.LLM_RETRY_MAX_DELAY, config.LLM_RETRY_BASE_DELAY * (2 ** attempt)))
+            log_info(f"Aguardando {wait_time:.1f}s antes da próxima tentativa...")
             time.sleep(wait_time)
     
     log_error(f"Todas as {max_retries} tentativas falharam")
@@ -138,13 +386,13 @@ def list_available_models():
         list: Lista de modelos disponíveis ou None em caso de erro
     """
     try:
-        response = requests.get(
+        response = _SESSION.get(
             f"{config.LLM_SERVER_URL}/v1/models", 
             timeout=config.LLM_SERVER_TIMEOUT
         )
         
         if response.status_code == 200:
-            models_data = response.json()
+            models_data = _loads(response.content)
             if 'data' in models_data:
                 log_info("Modelos disponíveis:")
                 for model in models_data['data']:
@@ -172,16 +420,8 @@ def diagnose_llm_server():
     try:
         # Verificar se o servidor está online
         log_info("Verificando disponibilidade do servidor...")
-        models_response = requests.get(
-            f"{config.LLM_SERVER_URL}/v1/models", 
-            timeout=config.LLM_SERVER_TIMEOUT
-        )
-        
-        if models_response.status_code == 200:
-            models_data = models_response.json()
-            log_info("Servidor online! Modelos disponíveis:")
-            for model in models_data.get('data', []):
-                log_info(f"- {model.get('id', 'Desconhecido')}")
+        if is_llm_server_online(force=True):
+            log_info("Servidor online!")
             
             # Testa o servidor com uma consulta simples
             log_info("\nTestando capacidade de resposta com prompt simples...")
@@ -202,8 +442,8 @@ def diagnose_llm_server():
                 log_error("Possível problema de capacidade ou configuração")
                 return False
         else:
-            log_error(f"Servidor retornou código de status {models_response.status_code}")
-            log_error(f"Resposta: {models_response.text}")
+            log_error(f"Servidor em {config.LLM_SERVER_URL} não respondeu à verificação de saúde")
+            log_error("Verifique se o servidor está rodando e se a URL está correta")
             return False
             
     except Timeout:
@@ -3,17 +3,81 @@ Templates de prompts para diferentes cenários de análise
 """
 from config import config
 
+# Partes fixas do prompt de sentimento, montadas uma única vez na importação
+_SENTIMENT_HEAD = """Analise o sentimento do mercado sobre a criptomoeda {coin} com base nos dados abaixo.
 
-def create_sentiment_analysis_prompt(coin, text_data):
+DADOS DISPONÍVEIS:
+
+"""
+
+_SENTIMENT_TAIL = """INSTRUÇÕES:
+Forneça sua análise no formato JSON, com os seguintes campos:
+- sentiment: "positivo", "negativo", "neutro", "muito positivo" ou "muito negativo"
+- score: um número de 0 a 100, onde 0 é extremamente negativo e 100 é extremamente positivo
+- buy_recommendation: "SIM", "NÃO" ou "NEUTRO"
+- key_factors: um array com 2-3 frases curtas sobre os fatores-chave que influenciam o sentimento
+- reddit_sentiment: "positivo", "negativo" ou "neutro"
+- news_sentiment: "positivo", "negativo" ou "neutro"
+- twitter_sentiment: "positivo", "negativo" ou "neutro"
+
+Responda APENAS com o JSON, sem explicações adicionais.
+"""
+
+_SENTIMENT_TEMPLATE = (
+    _SENTIMENT_HEAD
+    + "=== REDDIT ===\n{reddit}\n\n"
+    + "=== NOTÍCIAS ===\n{news}\n\n"
+    + "=== TWITTER ===\n{twitter}\n\n"
+    + _SENTIMENT_TAIL
+)
+
+# Tamanho fixo do prompt (instruções + cabeçalhos + símbolo de até 8 caracteres),
+# usado para calcular quanto sobra para as amostras de texto
+_COIN_PLACEHOLDER_LENGTH = 8
+_FIXED_OVERHEAD = len(_SENTIMENT_TEMPLATE.format(coin="X" * _COIN_PLACEHOLDER_LENGTH, reddit="", news="", twitter=""))
+_NO_DATA = "Sem dados disponíveis."
+
+# Prompt para analisar várias moedas em uma única consulta
+_BATCH_SENTIMENT_HEAD = """Analise o sentimento do mercado sobre cada uma das criptomoedas abaixo ({coins}), com base nos dados de cada uma.
+
+"""
+
+_BATCH_COIN_TEMPLATE = """##### {coin} #####
+=== REDDIT ===
+{reddit}
+
+=== NOTÍCIAS ===
+{news}
+
+=== TWITTER ===
+{twitter}
+
+"""
+
+_BATCH_SENTIMENT_TAIL = """INSTRUÇÕES:
+Forneça sua análise como UM objeto JSON cujas chaves são os símbolos das moedas
+(ex: {{"BTC": {{...}}, "ETH": {{...}}}}). Cada valor deve ter os seguintes campos:
+- sentiment: "positivo", "negativo", "neutro", "muito positivo" ou "muito negativo"
+- score: um número de 0 a 100, onde 0 é extremamente negativo e 100 é extremamente positivo
+- buy_recommendation: "SIM", "NÃO" ou "NEUTRO"
+- key_factors: um array com 2-3 frases curtas sobre os fatores-chave que influenciam o sentimento
+- reddit_sentiment: "positivo", "negativo" ou "neutro"
+- news_sentiment: "positivo", "negativo" ou "neutro"
+- twitter_sentiment: "positivo", "negativo" ou "neutro"
+
+Inclua todas as moedas: {coins}.
+Responda APENAS com o JSON, sem explicações adicionais.
+"""
+
+_BATCH_COIN_OVERHEAD = len(_BATCH_COIN_TEMPLATE.format(coin="X" * _COIN_PLACEHOLDER_LENGTH, reddit="", news="", twitter=""))
+
+
+def _build_text_samples(text_data):
     """
-    Cria um prompt simplificado para análise de sentimento.
+    Extrai amostras curtas de Reddit, notícias e Twitter dos dados coletados.
     
-    Args:
-        coin (str): Símbolo da criptomoeda
-        text_data (dict): Dados coletados de diferentes fontes
-        
     Returns:
-        str: Prompt formatado para o LLM
+        tuple: (reddit_sample, news_sample, twitter_sample)
     """
     # Limita o número de exemplos para reduzir o tamanho do prompt
     reddit_sample = ""
@@ -42,83 +106,67 @@ def create_sentiment_analysis_prompt(coin, text_data):
             for t in tweets
         ])
     
-    # Cria seções separadamente (corrigindo o problema de f-strings aninhadas)
-    reddit_section = "=== REDDIT ===\n"
-    reddit_section += reddit_sample if reddit_sample else "Sem dados disponíveis."
-    
-    news_section = "=== NOTÍCIAS ===\n"
-    news_section += news_sample if news_sample else "Sem dados disponíveis."
-    
-    twitter_section = "=== TWITTER ===\n"
-    twitter_section += twitter_sample if twitter_sample else "Sem dados disponíveis."
-    
-    # Template de prompt principal
-    prompt = f"""
-    Analise o sentimento do mercado sobre a criptomoeda {coin} com base nos dados abaixo.
-    
-    DADOS DISPONÍVEIS:
-    
-    {reddit_section}
-    
-    {news_section}
-    
-    {twitter_section}
-    
-    INSTRUÇÕES:
-    Forneça sua análise no formato JSON, com os seguintes campos:
-    - sentiment: "positivo", "negativo", "neutro", "muito positivo" ou "muito negativo"
-    - score: um número de 0 a 100, onde 0 é extremamente negativo e 100 é extremamente positivo
-    - buy_recommendation: "SIM", "NÃO" ou "NEUTRO"
-    - key_factors: um array com 2-3 frases curtas sobre os fatores-chave que influenciam o sentimento
-    - reddit_sentiment: "positivo", "negativo" ou "neutro"
-    - news_sentiment: "positivo", "negativo" ou "neutro"
-    - twitter_sentiment: "positivo", "negativo" ou "neutro"
-    
-    Responda APENAS com o JSON, sem explicações adicionais.
+    return reddit_sample, news_sample, twitter_sample
+
+
+def create_sentiment_analysis_prompt(coin, text_data):
     """
+    Cria um prompt simplificado para análise de sentimento.
     
-    # Limita o tamanho do prompt se necessário
-    if len(prompt) > config.LLM_PROMPT_MAX_LENGTH:
-        excess = len(prompt) - config.LLM_PROMPT_MAX_LENGTH
-        # Reduzir o tamanho de cada amostra
-        if excess > 0 and reddit_sample:
-            reddit_sample = reddit_sample[:len(reddit_sample)-excess//3]
-            reddit_section = "=== REDDIT ===\n" + reddit_sample
-        
-        if excess > 0 and news_sample:
-            news_sample = news_sample[:len(news_sample)-excess//3]
-            news_section = "=== NOTÍCIAS ===\n" + news_sample
-        
-        if excess > 0 and twitter_sample:
-            twitter_sample = twitter_sample[:len(twitter_sample)-excess//3]
-            twitter_section = "=== TWITTER ===\n" + twitter_sample
-        
-        # Recompõe o prompt com as amostras reduzidas
-        prompt = f"""
-        Analise o sentimento do mercado sobre a criptomoeda {coin} com base nos dados abaixo.
-        
-        DADOS DISPONÍVEIS:
-        
-        {reddit_section}
-        
-        {news_section}
-        
-        {twitter_section}
-        
-        INSTRUÇÕES:
-        Forneça sua análise no formato JSON, com os seguintes campos:
-        - sentiment: "positivo", "negativo", "neutro", "muito positivo" ou "muito negativo"
-        - score: um número de 0 a 100, onde 0 é extremamente negativo e 100 é extremamente positivo
-        - buy_recommendation: "SIM", "NÃO" ou "NEUTRO"
-        - key_factors: um array com 2-3 frases curtas sobre os fatores-chave que influenciam o sentimento
-        - reddit_sentiment: "positivo", "negativo" ou "neutro"
-        - news_sentiment: "positivo", "negativo" ou "neutro"
-        - twitter_sentiment: "positivo", "negativo" ou "neutro"
+    Args:
+        coin (str): Símbolo da criptomoeda
+        text_data (dict): Dados coletados de diferentes fontes
         
-        Responda APENAS com o JSON, sem explicações adicionais.
-        """
+    Returns:
+        str: Prompt formatado para o LLM
+    """
+    reddit_sample, news_sample, twitter_sample = _build_text_samples(text_data)
+    
+    # Divide o espaço livre do prompt igualmente entre as três fontes e corta
+    # as amostras antes de montar o texto, que é formatado uma única vez
+    budget = config.LLM_PROMPT_MAX_LENGTH - _FIXED_OVERHEAD - max(0, len(coin) - _COIN_PLACEHOLDER_LENGTH)
+    per_section = max(0, budget) // 3
+    
+    return _SENTIMENT_TEMPLATE.format(
+        coin=coin,
+        reddit=reddit_sample[:per_section] or _NO_DATA,
+        news=news_sample[:per_section] or _NO_DATA,
+        twitter=twitter_sample[:per_section] or _NO_DATA
+    )
+
+
+def create_batch_sentiment_analysis_prompt(coin_text_map):
+    """
+    Cria um único prompt para analisar o sentimento de várias moedas de uma vez.
+    As instruções são enviadas uma só vez e a resposta esperada é um objeto JSON
+    com uma análise por símbolo.
     
-    return prompt
+    Args:
+        coin_text_map (dict): Mapa símbolo -> dados coletados (mesmo formato de create_sentiment_analysis_prompt)
+        
+    Returns:
+        str: Prompt formatado para o LLM
+    """
+    coins_list = ", ".join(coin_text_map)
+    head = _BATCH_SENTIMENT_HEAD.format(coins=coins_list)
+    tail = _BATCH_SENTIMENT_TAIL.format(coins=coins_list)
+    
+    # Espaço livre dividido igualmente entre as moedas e, em cada uma, entre as três fontes
+    budget = config.LLM_PROMPT_MAX_LENGTH - len(head) - len(tail) - _BATCH_COIN_OVERHEAD * len(coin_text_map)
+    per_section = max(0, budget) // (3 * max(1, len(coin_text_map)))
+    
+    parts = [head]
+    for coin, text_data in coin_text_map.items():
+        reddit_sample, news_sample, twitter_sample = _build_text_samples(text_data)
+        parts.append(_BATCH_COIN_TEMPLATE.format(
+            coin=coin,
+            reddit=reddit_sample[:per_section] or _NO_DATA,
+            news=news_sample[:per_section] or _NO_DATA,
+            twitter=twitter_sample[:per_section] or _NO_DATA
+        ))
+    parts.append(tail)
+    
+    return "".join(parts)
 
 
 def create_market_analysis_prompt(coin, price_data, technical_indicators):
@@ -0,0 +1,92 @@
+"""
+Laços numéricos da estratégia, compilados com numba quando disponível.
+Recebem arrays float64 (um elemento por moeda, NaN para indicador ausente).
+"""
+from utils._njit import njit, prange
+
+
+@njit(parallel=True, cache=True)
+def score_batch(rsi, vol, sma50, sma200, macd, macd_sig, macd_hist, vol_score, bb_pos,
+                rsi_buy_threshold, rsi_oversold, out):
+    """
+    Score técnico de filter_by_rsi_enhanced para todas as moedas de uma vez.
+    Sem fastmath: os testes de NaN precisam ser preservados.
+    """
+    for i in prange(rsi.shape[0]):
+        score = 0.0
+        
+        # Alta volatilidade (3%+) deixa o threshold de compra mais tolerante
+        threshold = rsi_buy_threshold
+        if vol[i] > 0.03:
+            threshold = min(40.0, rsi_buy_threshold + 2.0)
+        
+        # RSI: quanto menor, melhor para compra
+        if rsi[i] < rsi_oversold:
+            score += 100.0
+        elif rsi[i] < threshold:
+            score += 70.0
+        else:
+            score += 40.0
+        
+        # Volatilidade moderada (entre 1% e 5%) é a ideal
+        if 0.01 < vol[i] < 0.05:
+            score += vol[i] * 1500.0
+        elif vol[i] <= 0.01:
+            score += vol[i] * 500.0
+        else:
+            score += vol[i] * 800.0
+        
+        # Volume tem peso de 50% do seu score
+        score += vol_score[i] * 0.5
+        
+        # Tendência das médias (valores ausentes ou zero não contam)
+        if sma50[i] == sma50[i] and sma50[i] != 0.0 and sma200[i] == sma200[i] and sma200[i] != 0.0:
+            if sma50[i] > sma200[i]:
+                score += 15.0
+            else:
+                score -= 10.0
+        
+        if macd[i] == macd[i] and macd[i] != 0.0 and macd_sig[i] == macd_sig[i] and macd_sig[i] != 0.0:
+            if macd[i] > macd_sig[i] and macd_hist[i] > 0:
+                score += 10.0
+            elif macd_hist[i] < 0:
+                score -= 5.0
+        
+        # Próximo da banda inferior de Bollinger
+        if bb_pos[i] < 0.3:
+            score += 20.0
+        
+        out[i] = score
+
+
+# Códigos de retorno de eval_sl_tp
+SL_TP_NONE = 0
+SL_TP_STOP_LOSS = 1
+SL_TP_TAKE_PROFIT = 2
+
+
+@njit(cache=True, fastmath=True)
+def eval_sl_tp(price, sl_price, tp_price):
+    """
+    Compara o preço atual com os preços de stop loss e take profit da posição.
+    Retorna SL_TP_STOP_LOSS, SL_TP_TAKE_PROFIT ou SL_TP_NONE.
+    """
+    if price <= sl_price:
+        return 1
+    if price >= tp_price:
+        return 2
+    return 0
+
+
+@njit(cache=True, fastmath=True)
+def compute_pnl(net_received, total_cost, usdt_before, usdt_after):
+    """
+    Resultado de um trade encerrado.
+    Retorna (P&L da moeda: receita líquida - custo com taxas, P&L pela variação do saldo USDT).
+    """
+    return net_received - total_cost, usdt_after - usdt_before
+
+
+# Compila (ou carrega do cache em disco) na importação, fora do caminho de decisão
+eval_sl_tp(1.0, 0.0, 2.0)
+compute_pnl(0.0, 0.0, 0.0, 0.0)
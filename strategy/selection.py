@@ -2,127 +2,188 @@
 Estratégias para seleção de moedas para trading
 """
 import time
-from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from config import config
-from utils.helpers import log_info, log_error
-from api.data_collectors import collect_all_data_for_coin
+from utils.helpers import log_info, log_error, log_info_enabled, base_asset_from_pair
+from api.data_collectors import collect_all_data_for_coin, fetch_news_for_coins
 from analysis.technical import (
     calculate_rsi_for_coin,
-    calculate_volatility_for_coin,
-    calculate_ma_for_coin,
     calculate_macd_for_coin,
-    calculate_bollinger_bands,
-    check_higher_timeframe_trend
+    calculate_bollinger_position,
+    calculate_momentum,
+    detect_support_resistance,
+    check_higher_timeframe_trend,
+    compute_tech_bundle,
+    clear_indicator_caches
 )
-from analysis.sentiment import analyze_sentiment_with_llm, get_combined_sentiment_score
+from analysis.sentiment import analyze_sentiment_with_llm, analyze_sentiment_batch, get_combined_sentiment_score
+from analysis.rsi_stream import start_rsi_stream
+from strategy._kernels import score_batch
+from llm.client import recommended_llm_concurrency
 
+# Moedas populares analisadas primeiro quando há mais moedas que MAX_COINS_TO_ANALYZE
+_POPULAR_COINS = (
+    'BTC', 'ETH', 'BNB', 'SOL', 'XRP', 'ADA', 'DOGE', 'SHIB', 'DOT', 'AVAX',
+    'MATIC', 'LTC', 'LINK', 'UNI', 'ATOM', 'XLM', 'NEAR', 'ETC', 'ALGO', 'FTM'
+)
+
+# Faixas de pontuação do score multicritério: limites crescentes e o score de cada faixa.
+# RSI e Bollinger usam "valor < limite" (side='right'); volume usa "valor > limite" (side='left')
+_RSI_THRESH = np.array([30.0, 40.0, 50.0])
+_RSI_SCORES = np.array([100, 70, 40, 0])
+_VOLUME_THRESH = np.array([1.0, 1.5, 2.0])
+_VOLUME_SCORES = np.array([20, 40, 70, 100])
+_BB_THRESH = np.array([0.2, 0.4])
+_BB_SCORES = np.array([90, 60, 30])
+
+# Pesos de cada componente no score multicritério (componentes ausentes contam 0)
+_WEIGHTS = {
+    'rsi': 0.25,
+    'macd': 0.20,
+    'volume': 0.15,
+    'bollinger': 0.15,
+    'support': 0.15,
+    'momentum': 0.10
+}
+_WEIGHT_KEYS = tuple(_WEIGHTS)
+_WEIGHT_VALUES = np.array([_WEIGHTS[k] for k in _WEIGHT_KEYS])
+
+# Colunas numéricas dos candidatos técnicos, usadas no ranking vetorizado
+_CANDIDATE_DTYPE = np.dtype([
+    ('pair', 'U20'),
+    ('rsi', 'f8'),
+    ('volatility', 'f8'),
+    ('tech_score', 'f8')
+])
+
+from api import binance_client
 from api.binance_client import (
     get_all_binance_coins, 
-    last_sold_coin, 
-    last_trade_time,
     get_24h_volume,          
     get_average_volume,        
     get_volume_ratio,  
-    get_volume_analysis,      
-    get_historical_data        
+    get_volume_analysis,
+    get_historical_data,
+    get_closes_array
 )
 
 
-def filter_by_rsi_enhanced(coin_pair, rsi_buy_threshold=35, rsi_oversold=30):
+def _collect_tech_inputs(coin_pair):
     """
-    Versão melhorada do filtro RSI com zonas dinâmicas e análise de volume.
+    Etapa 1 do filtro: busca os indicadores e a análise de volume de uma moeda.
+    Descarta cedo as moedas com RSI alto, antes das consultas de volume.
+    
+    Returns:
+        dict: Entradas para o score técnico ou None se a moeda não passar no filtro
     """
+    # Todos os indicadores de fechamento vêm de uma única busca de histórico
+    indicators = compute_tech_bundle(coin_pair)
+    if indicators is None:
+        return None
+    
     # Calcula RSI
-    rsi = calculate_rsi_for_coin(coin_pair)
+    rsi = indicators['rsi']
     if rsi is None:
         return None
     
-    # Análise de volume usando as novas funções
-    volume_score = 0
-    volume_analysis = get_volume_analysis(coin_pair)  # Nova função que criamos
-    
-    if volume_analysis:
-        volume_score = volume_analysis.get('volume_score', 0)
-        volume_signal = volume_analysis.get('volume_signal', 'NEUTRO')
-        
-        # Log do sinal de volume
-        if volume_signal in ['FORTE_COMPRA', 'COMPRA']:
-            log_info(f"{coin_pair}: Sinal de volume positivo: {volume_signal}")
+    # Descarta logo as moedas com RSI alto, antes das consultas de volume
+    # (a comparação negada também descarta RSI NaN)
+    if not rsi < 50:
+        log_info("%s: RSI=%.2f (>50, não considerado)", coin_pair, rsi)
+        return None  # RSI muito alto, não considera
     
     # Calcula volatilidade
-    volatility = calculate_volatility_for_coin(coin_pair)
+    volatility = indicators['volatility']
     if volatility is None:
         return None
     
-    # Ajusta threshold baseado na volatilidade
-    if volatility > 0.03:  # Alta volatilidade (3%+)
-        rsi_buy_threshold = min(40, rsi_buy_threshold + 2)  # Mais tolerante
-        log_info(f"{coin_pair}: Alta volatilidade detectada, RSI threshold ajustado para {rsi_buy_threshold}")
-    
-    # Sistema de scoring melhorado
-    tech_score = 0
-    
-    # Score baseado em RSI (quanto menor, melhor para compra)
-    if rsi < rsi_oversold:
-        tech_score += 100  # Forte sinal de compra
-        log_info(f"{coin_pair}: RSI em zona de SOBREVENDA FORTE ({rsi:.2f})")
-    elif rsi < rsi_buy_threshold:
-        tech_score += 70
-    elif rsi < 50:
-        tech_score += 40
-    else:
-        log_info(f"{coin_pair}: RSI={rsi:.2f} (>{50}, não considerado)")
-        return None  # RSI muito alto, não considera
-    
-    # Adiciona score de volatilidade (volatilidade moderada é melhor)
-    if 0.01 < volatility < 0.05:  # Volatilidade ideal entre 1% e 5%
-        tech_score += volatility * 1500
-    elif volatility <= 0.01:  # Muito baixa
-        tech_score += volatility * 500
-    else:  # Muito alta (>5%)
-        tech_score += volatility * 800  # Penaliza um pouco
-    
-    # Adiciona score de volume
-    tech_score += volume_score * 0.5  # Volume tem peso de 50% do seu score
-    
-    # Médias móveis e MACD para complementar
-    sma_50 = calculate_ma_for_coin(coin_pair, period=50)
-    sma_200 = calculate_ma_for_coin(coin_pair, period=200)
-    macd_line, macd_signal, macd_histogram = calculate_macd_for_coin(coin_pair)
+    # Análise de volume usando as novas funções
+    volume_score = 0
+    volume_analysis = get_volume_analysis(coin_pair)  # Nova função que criamos
     
-    # Bônus por tendência
-    trend_bonus = 0
-    if sma_50 and sma_200:
-        if sma_50 > sma_200:
-            trend_bonus += 15  # Golden cross
-            log_info(f"{coin_pair}: Golden Cross detectado (SMA50 > SMA200)")
-        else:
-            trend_bonus -= 10
+    if volume_analysis:
+        volume_score = volume_analysis.get('volume_score', 0)
     
-    if macd_line and macd_signal:
-        if macd_line > macd_signal and macd_histogram > 0:
-            trend_bonus += 10
-            log_info(f"{coin_pair}: MACD positivo")
-        elif macd_histogram < 0:
-            trend_bonus -= 5
+    return {
+        'pair': coin_pair,
+        'rsi': rsi,
+        'volatility': volatility,
+        'sma_50': indicators['sma_50'],
+        'sma_200': indicators['sma_200'],
+        'macd': indicators['macd'],
+        'macd_signal': indicators['macd_signal'],
+        'macd_histogram': indicators['macd_histogram'],
+        'bb_position': indicators['bb_position'],
+        'volume_analysis': volume_analysis,
+        'volume_score': volume_score
+    }
+
+
+def _score_tech_inputs(inputs, rsi_buy_threshold=35, rsi_oversold=30):
+    """
+    Etapa 2 do filtro: calcula o score técnico de todas as moedas em uma única chamada
+    ao kernel score_batch (indicadores ausentes viram NaN).
     
-    tech_score += trend_bonus
+    Returns:
+        np.ndarray: Score técnico de cada entrada, na mesma ordem
+    """
+    def column(key):
+        return np.array([np.nan if item[key] is None else item[key] for item in inputs], dtype=np.float64)
+    
+    scores = np.empty(len(inputs), dtype=np.float64)
+    score_batch(
+        column('rsi'), column('volatility'), column('sma_50'), column('sma_200'),
+        column('macd'), column('macd_signal'), column('macd_histogram'),
+        column('volume_score'), column('bb_position'),
+        float(rsi_buy_threshold), float(rsi_oversold), scores
+    )
+    return scores
+
+
+def _finalize_tech_candidate(inputs, tech_score, rsi_buy_threshold=35, rsi_oversold=30):
+    """
+    Etapa 3 do filtro: registra os sinais encontrados, monta os dados técnicos e
+    aplica a verificação de múltiplos sinais e de tendência maior.
     
-    # Verificar Bollinger Bands se disponível
-    bb_data = calculate_bollinger_bands(get_historical_data(coin_pair))
-    bb_position_str = "n/a"
-    if bb_data:
-        bb_position = bb_data['position']
-        bb_position_str = f"{bb_position:.2f}"
-        if bb_position < 0.3:  # Próximo da banda inferior
-            tech_score += 20
-            log_info(f"{coin_pair}: Próximo da Bollinger Band inferior (posição: {bb_position:.2f})")
+    Returns:
+        dict: Dados técnicos ou None se a moeda não passar no filtro
+    """
+    coin_pair = inputs['pair']
+    rsi = inputs['rsi']
+    volatility = inputs['volatility']
+    sma_50 = inputs['sma_50']
+    sma_200 = inputs['sma_200']
+    macd_line = inputs['macd']
+    macd_signal = inputs['macd_signal']
+    macd_histogram = inputs['macd_histogram']
+    bb_position = inputs['bb_position']
+    volume_analysis = inputs['volume_analysis']
+    volume_score = inputs['volume_score']
+    tech_score = float(tech_score)
+    
+    # Sinais que contribuíram para o score (calculado em _score_tech_inputs)
+    if log_info_enabled():
+        if volume_analysis:
+            volume_signal = volume_analysis.get('volume_signal', 'NEUTRO')
+            if volume_signal in ['FORTE_COMPRA', 'COMPRA']:
+                log_info("%s: Sinal de volume positivo: %s", coin_pair, volume_signal)
+        if volatility > 0.03:  # Alta volatilidade (3%+)
+            log_info("%s: Alta volatilidade detectada, RSI threshold ajustado para %s", coin_pair, min(40, rsi_buy_threshold + 2))
+        if rsi < rsi_oversold:
+            log_info("%s: RSI em zona de SOBREVENDA FORTE (%.2f)", coin_pair, rsi)
+        if sma_50 and sma_200 and sma_50 > sma_200:
+            log_info("%s: Golden Cross detectado (SMA50 > SMA200)", coin_pair)
+        if macd_line and macd_signal and macd_line > macd_signal and macd_histogram > 0:
+            log_info("%s: MACD positivo", coin_pair)
+        if bb_position is not None and bb_position < 0.3:
+            log_info("%s: Próximo da Bollinger Band inferior (posição: %.2f)", coin_pair, bb_position)
     
     # Preparar dados para retorno
     tech_data = {
         'pair': coin_pair,
-        'coin': coin_pair.replace('USDT', ''),
+        'coin': base_asset_from_pair(coin_pair),
         'rsi': rsi,
         'volatility': volatility,
         'sma_50': sma_50,
@@ -131,44 +192,100 @@ def filter_by_rsi_enhanced(coin_pair, rsi_buy_threshold=35, rsi_oversold=30):
         'macd_signal': macd_signal,
         'volume_score': volume_score,
         'volume_signal': volume_analysis.get('volume_signal', 'DESCONHECIDO') if volume_analysis else 'ERRO',
-        'bb_position': bb_data['position'] if bb_data else None,
+        'bb_position': bb_position,
         'tech_score': tech_score
     }
     
-    # Log resumido
-    sma_50_str = f"{sma_50:.4f}" if sma_50 is not None else "n/a"
-    sma_200_str = f"{sma_200:.4f}" if sma_200 is not None else "n/a"
-    macd_str = f"{macd_line:.4f}" if macd_line is not None else "n/a"
-    
-    log_info(
-        f"{coin_pair}: RSI={rsi:.2f}, Vol={volatility*100:.2f}%, "
-        f"Volume Score={volume_score:.0f}, BB Pos={bb_position_str}, "
-        f"SMA50={sma_50_str}, SMA200={sma_200_str}, MACD={macd_str}, "
-        f"Score Final={tech_score:.2f}"
-    )
+    # Log resumido (só monta os textos se o INFO estiver ativo)
+    if log_info_enabled():
+        bb_position_str = f"{bb_position:.2f}" if bb_position is not None else "n/a"
+        sma_50_str = f"{sma_50:.4f}" if sma_50 is not None else "n/a"
+        sma_200_str = f"{sma_200:.4f}" if sma_200 is not None else "n/a"
+        macd_str = f"{macd_line:.4f}" if macd_line is not None else "n/a"
+        
+        log_info(
+            f"{coin_pair}: RSI={rsi:.2f}, Vol={volatility*100:.2f}%, "
+            f"Volume Score={volume_score:.0f}, BB Pos={bb_position_str}, "
+            f"SMA50={sma_50_str}, SMA200={sma_200_str}, MACD={macd_str}, "
+            f"Score Final={tech_score:.2f}"
+        )
     
     macd_histogram = tech_data.get('macd', 0) - tech_data.get('macd_signal', 0) if tech_data.get('macd') and tech_data.get('macd_signal') else None
     bb_data_dict = {'position': tech_data.get('bb_position')} if tech_data.get('bb_position') else None
 
     if not require_multiple_signals(coin_pair, rsi, volume_analysis, macd_histogram, bb_data_dict):
-        log_info(f"{coin_pair}: Não passou na verificação de múltiplos sinais")
+        log_info("%s: Não passou na verificação de múltiplos sinais", coin_pair)
         return None
     higher_trend = check_higher_timeframe_trend(coin_pair, timeframe='4h')
     if higher_trend == 'bearish':
-        log_info(f"{coin_pair}: Tendência maior é BEARISH, pulando")
+        log_info("%s: Tendência maior é BEARISH, pulando", coin_pair)
         return None
     elif higher_trend == 'neutral':
-        log_info(f"{coin_pair}: Tendência maior NEUTRA - cuidado extra necessário")
+        log_info("%s: Tendência maior NEUTRA - cuidado extra necessário", coin_pair)
         # Não bloqueia, mas reduz score
         tech_score *= 0.8
     # Se passar, adiciona bonus para tendência bullish
     if higher_trend == 'bullish':
         tech_score += 15
-        log_info(f"{coin_pair}: ✓ Tendência maior BULLISH - bonus aplicado")
+        log_info("%s: ✓ Tendência maior BULLISH - bonus aplicado", coin_pair)
     return tech_data
-    
 
 
+def filter_by_rsi_enhanced(coin_pair, rsi_buy_threshold=35, rsi_oversold=30):
+    """
+    Versão melhorada do filtro RSI com zonas dinâmicas e análise de volume.
+    Para várias moedas, prefira filter_candidates_enhanced (score em lote).
+    """
+    inputs = _collect_tech_inputs(coin_pair)
+    if inputs is None:
+        return None
+    tech_score = _score_tech_inputs([inputs], rsi_buy_threshold, rsi_oversold)[0]
+    return _finalize_tech_candidate(inputs, tech_score, rsi_buy_threshold, rsi_oversold)
+
+
+def filter_candidates_enhanced(pairs, max_workers, rsi_buy_threshold=35, rsi_oversold=30):
+    """
+    Aplica filter_by_rsi_enhanced a vários pares em etapas: busca dos indicadores em
+    paralelo, score técnico de todos os pares em uma única chamada vetorizada e, por fim,
+    as verificações de sinais e de tendência maior (também em paralelo).
+    
+    Returns:
+        list: Dados técnicos dos pares aprovados
+    """
+    candidates = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        inputs = []
+        future_to_pair = {executor.submit(_collect_tech_inputs, pair): pair for pair in pairs}
+        for future in as_completed(future_to_pair):
+            try:
+                item = future.result()
+            except Exception as e:
+                log_error(f"Erro ao filtrar {future_to_pair[future]}: {e}")
+                continue
+            if item:
+                inputs.append(item)
+        
+        if not inputs:
+            return candidates
+        
+        scores = _score_tech_inputs(inputs, rsi_buy_threshold, rsi_oversold)
+        
+        future_to_pair = {
+            executor.submit(_finalize_tech_candidate, item, score, rsi_buy_threshold, rsi_oversold): item['pair']
+            for item, score in zip(inputs, scores)
+        }
+        for future in as_completed(future_to_pair):
+            try:
+                tech_data = future.result()
+            except Exception as e:
+                log_error(f"Erro ao filtrar {future_to_pair[future]}: {e}")
+                continue
+            if tech_data:
+                candidates.append(tech_data)
+    
+    return candidates
+    
+
 # === NOVO: Sistema de Scoring Multicritério ===
 
 def calculate_comprehensive_score(coin_pair):
@@ -176,23 +293,28 @@ def calculate_comprehensive_score(coin_pair):
     Sistema de scoring que combina múltiplos indicadores.
     """
     score_components = {}
-    total_score = 0
+    
+    # Busca todos os indicadores de uma vez; uma falha na API não deve distorcer o score
+    try:
+        # Um único histórico compartilhado por todos os indicadores de fechamento
+        closes = get_closes_array(coin_pair)
+        rsi = calculate_rsi_for_coin(coin_pair, closes=closes)
+        macd_line, signal_line, histogram = calculate_macd_for_coin(coin_pair, closes=closes)
+        volume_ratio = get_volume_ratio(coin_pair)  # Volume atual vs média
+        bb_position = calculate_bollinger_position(coin_pair, closes=closes)
+        historical_data = get_historical_data(coin_pair)
+        sr_score = detect_support_resistance(historical_data) if not historical_data.empty else None
+        momentum = calculate_momentum(coin_pair, period=10, closes=closes)
+    except Exception as e:
+        log_error(f"Erro ao obter indicadores para {coin_pair}: {e}")
+        return 0, {}
     
     # 1. RSI Score (peso: 25%)
-    rsi = calculate_rsi_for_coin(coin_pair)
-    if rsi:
-        if rsi < 30:
-            score_components['rsi'] = 100
-        elif rsi < 40:
-            score_components['rsi'] = 70
-        elif rsi < 50:
-            score_components['rsi'] = 40
-        else:
-            score_components['rsi'] = 0
+    if rsi is not None:
+        score_components['rsi'] = int(_RSI_SCORES[np.searchsorted(_RSI_THRESH, rsi, side='right')])
     
     # 2. MACD Score (peso: 20%)
-    macd_line, signal_line, histogram = calculate_macd_for_coin(coin_pair)
-    if macd_line and signal_line:
+    if macd_line is not None and signal_line is not None:
         if histogram > 0 and macd_line > signal_line:
             score_components['macd'] = 80
         elif macd_line > signal_line:
@@ -201,53 +323,28 @@ def calculate_comprehensive_score(coin_pair):
             score_components['macd'] = 20
     
     # 3. Volume Score (peso: 15%)
-    volume_ratio = get_volume_ratio(coin_pair)  # Volume atual vs média
-    if volume_ratio:
-        if volume_ratio > 2.0:
-            score_components['volume'] = 100
-        elif volume_ratio > 1.5:
-            score_components['volume'] = 70
-        elif volume_ratio > 1.0:
-            score_components['volume'] = 40
-        else:
-            score_components['volume'] = 20
+    if volume_ratio is not None:
+        score_components['volume'] = int(_VOLUME_SCORES[np.searchsorted(_VOLUME_THRESH, volume_ratio, side='left')])
     
     # 4. Bollinger Bands Score (peso: 15%)
-    bb_position = calculate_bollinger_position(coin_pair)
-    if bb_position:
-        if bb_position < 0.2:  # Próximo da banda inferior
-            score_components['bollinger'] = 90
-        elif bb_position < 0.4:
-            score_components['bollinger'] = 60
-        else:
-            score_components['bollinger'] = 30
+    if bb_position is not None:
+        # Quanto mais próximo da banda inferior, maior o score
+        score_components['bollinger'] = int(_BB_SCORES[np.searchsorted(_BB_THRESH, bb_position, side='right')])
     
     # 5. Support/Resistance Score (peso: 15%)
-    sr_score = analyze_support_resistance(coin_pair)
-    if sr_score:
+    if sr_score is not None:
         score_components['support'] = sr_score
     
     # 6. Momentum Score (peso: 10%)
-    momentum = calculate_momentum(coin_pair, period=10)
-    if momentum:
+    if momentum is not None:
         if momentum > 0:
             score_components['momentum'] = 70
         else:
             score_components['momentum'] = 30
     
     # Calcular score ponderado
-    weights = {
-        'rsi': 0.25,
-        'macd': 0.20,
-        'volume': 0.15,
-        'bollinger': 0.15,
-        'support': 0.15,
-        'momentum': 0.10
-    }
-    
-    for component, value in score_components.items():
-        if component in weights:
-            total_score += value * weights[component]
+    values = np.array([score_components.get(k, 0.0) for k in _WEIGHT_KEYS])
+    total_score = float(values @ _WEIGHT_VALUES)
     
     return total_score, score_components
 
@@ -262,25 +359,30 @@ def filter_by_rsi(coin_pair, max_rsi=50):
     Returns:
         dict: Dados técnicos ou None se a moeda não passar no filtro
     """
-    # Calcula RSI
-    rsi = calculate_rsi_for_coin(coin_pair)
+    # Calcula todos os indicadores com uma única busca de histórico
+    bundle = compute_tech_bundle(coin_pair)
+    if bundle is None:
+        return None
+    
+    rsi = bundle['rsi']
     if rsi is None:
         return None
         
     # Considera apenas moedas com RSI < max_rsi
     if rsi >= max_rsi:
-        log_info(f"{coin_pair}: RSI={rsi:.2f} (>{max_rsi}, não considerado)")
+        log_info("%s: RSI=%.2f (>%s, não considerado)", coin_pair, rsi, max_rsi)
         return None
         
-    # Calcula volatilidade
-    vol = calculate_volatility_for_coin(coin_pair)
+    # Volatilidade
+    vol = bundle['volatility']
     if vol is None:
         return None
 
     # Médias móveis e MACD para complementar o filtro
-    sma_50 = calculate_ma_for_coin(coin_pair, period=50)
-    sma_200 = calculate_ma_for_coin(coin_pair, period=200)
-    macd_line, macd_signal, _ = calculate_macd_for_coin(coin_pair)
+    sma_50 = bundle['sma_50']
+    sma_200 = bundle['sma_200']
+    macd_line = bundle['macd']
+    macd_signal = bundle['macd_signal']
 
     # Cálculo do score técnico preliminar
     tech_score = (max_rsi - rsi) + (vol * 1000)
@@ -298,7 +400,7 @@ def filter_by_rsi(coin_pair, max_rsi=50):
     tech_score += trend_bonus
     tech_data = {
         'pair': coin_pair,
-        'coin': coin_pair.replace('USDT', ''),
+        'coin': base_asset_from_pair(coin_pair),
         'rsi': rsi,
         'volatility': vol,
         'sma_50': sma_50,
@@ -307,17 +409,119 @@ def filter_by_rsi(coin_pair, max_rsi=50):
         'tech_score': tech_score
     }
     
-    sma_50_str = f"{sma_50:.4f}" if sma_50 is not None else "n/a"
-    sma_200_str = f"{sma_200:.4f}" if sma_200 is not None else "n/a"
-    macd_str = f"{macd_line:.4f}" if macd_line is not None else "n/a"
+    if log_info_enabled():
+        sma_50_str = f"{sma_50:.4f}" if sma_50 is not None else "n/a"
+        sma_200_str = f"{sma_200:.4f}" if sma_200 is not None else "n/a"
+        macd_str = f"{macd_line:.4f}" if macd_line is not None else "n/a"
+        
+        log_info(
+            f"{coin_pair}: RSI={rsi:.2f}, Vol={vol*100:.2f}%, "
+            f"SMA50={sma_50_str}, SMA200={sma_200_str}, MACD={macd_str}, "
+            f"Tech Score={tech_score:.2f}"
+        )
+    return tech_data
+
 
+def calculate_final_scores(tech_scores, sentiment_scores, buy_recommendations):
+    """
+    Calcula o score final de vários candidatos de uma vez (70% técnico + 30% sentimento,
+    com bônus/penalidade de 50 pontos para recomendações explícitas).
     
-    log_info(
-        f"{coin_pair}: RSI={rsi:.2f}, Vol={vol*100:.2f}%, "
-        f"SMA50={sma_50_str}, SMA200={sma_200_str}, MACD={macd_str}, "
-        f"Tech Score={tech_score:.2f}"
-    )
-    return tech_data
+    Args:
+        tech_scores (sequence): Scores técnicos
+        sentiment_scores (sequence): Scores de sentimento (0-100)
+        buy_recommendations (sequence): Recomendações ('SIM', 'NÃO' ou 'NEUTRO')
+        
+    Returns:
+        np.ndarray: Scores finais, na mesma ordem das entradas
+    """
+    tech = np.asarray(tech_scores, dtype=np.float64)
+    sentiment = np.asarray(sentiment_scores, dtype=np.float64)
+    recommendations = np.asarray(buy_recommendations, dtype=object)
+    
+    # Sentimento convertido para a escala do score técnico: (score - 50) * 2 * 5
+    normalized_sentiment = (sentiment - 50) * 10
+    bonus = np.where(recommendations == 'SIM', 50.0, np.where(recommendations == 'NÃO', -50.0, 0.0))
+    
+    return tech * 0.7 + normalized_sentiment * 0.3 + bonus
+
+
+def _combine_with_sentiment(candidate, sentiment_result):
+    """
+    Junta os dados técnicos do candidato com o resultado da análise de sentimento
+    (atualiza o próprio dicionário do candidato, que não é reutilizado depois).
+    O score final é calculado depois, para todos os candidatos de uma vez.
+    """
+    sentiment_score = sentiment_result.get('score', 50)
+    buy_recommendation = sentiment_result.get('buy_recommendation', 'NEUTRO')
+    
+    # Log detalhado
+    log_info(f"\n{candidate['pair']}:")
+    log_info(f"Score Técnico: {candidate['tech_score']:.2f}")
+    log_info(f"Score de Sentimento: {sentiment_score}/100 ({sentiment_result.get('sentiment', 'neutro')})")
+    log_info(f"Recomendação: {buy_recommendation}")
+    
+    candidate.update({
+        'sentiment_score': sentiment_score,
+        'sentiment': sentiment_result.get('sentiment', 'neutro'),
+        'buy_recommendation': buy_recommendation,
+        'key_factors': sentiment_result.get('key_factors', [])
+    })
+    return candidate
+
+
+def _analyze_candidate(candidate, news_data=None):
+    """
+    Coleta os dados de um candidato e executa a análise de sentimento no LLM.
+    Executada dentro do pool de threads, de modo que as consultas ao LLM de
+    candidatos diferentes se sobrepõem (limitadas pelo número de workers).
+    
+    Returns:
+        dict: Dados técnicos do candidato combinados com o sentimento, ou None em caso de erro
+    """
+    coin = candidate['coin']
+    try:
+        collected_data = collect_all_data_for_coin(coin, news_data)
+        sentiment_result = analyze_sentiment_with_llm(coin, collected_data)
+        return _combine_with_sentiment(candidate, sentiment_result)
+    except Exception as e:
+        log_error(f"Erro ao processar {candidate['pair']}: {e}")
+        return None
+
+
+def _analyze_candidates_batch(candidates, news_by_coin, max_workers):
+    """
+    Coleta os dados dos candidatos em paralelo e analisa o sentimento de todos
+    com uma única consulta ao LLM.
+    
+    Returns:
+        list: Candidatos combinados com o sentimento
+    """
+    # Pré-preenchido para manter no prompt a ordem dos candidatos
+    coin_text_map = {candidate['coin']: {} for candidate in candidates}
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        future_to_coin = {
+            executor.submit(collect_all_data_for_coin, candidate['coin'], news_by_coin.get(candidate['coin'])): candidate['coin']
+            for candidate in candidates
+        }
+        # Guarda cada coleta assim que termina, sem esperar pelas anteriores
+        for future in as_completed(future_to_coin):
+            coin = future_to_coin[future]
+            try:
+                coin_text_map[coin] = future.result()
+            except Exception as e:
+                log_error(f"Erro ao coletar dados para {coin}: {e}")
+    
+    sentiment_by_coin = analyze_sentiment_batch(coin_text_map)
+    
+    results = []
+    for candidate in candidates:
+        try:
+            results.append(_combine_with_sentiment(candidate, sentiment_by_coin[candidate['coin']]))
+        except Exception as e:
+            log_error(f"Erro ao processar {candidate['pair']}: {e}")
+    return results
 
 
 def analyze_sentiment_for_candidates(candidates, max_workers=5):
@@ -335,69 +539,40 @@ def analyze_sentiment_for_candidates(candidates, max_workers=5):
     
     log_info(f"\n=== ANALISANDO SENTIMENTO PARA {len(candidates)} CANDIDATOS ===")
     
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # Mapa de futuros para candidatos
-        future_to_candidate = {}
-        
-        # Inicia análise de sentimento para cada candidato
-        for candidate in candidates:
-            coin = candidate['coin']
+    # Busca as notícias de todos os candidatos de uma só vez
+    news_by_coin = fetch_news_for_coins([candidate['coin'] for candidate in candidates])
+    
+    # Reduz as consultas simultâneas se o LLM estiver respondendo devagar
+    workers = recommended_llm_concurrency(max_workers)
+    if workers < max_workers:
+        log_info(f"LLM lento: limitando a análise a {workers} consultas simultâneas")
+    
+    if config.LLM_BATCH_SENTIMENT and len(candidates) > 1:
+        # Uma única consulta ao LLM para todos os candidatos
+        results = _analyze_candidates_batch(candidates, news_by_coin, max_workers)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # Coleta dados e analisa o sentimento de cada candidato
+            futures = [
+                executor.submit(_analyze_candidate, candidate, news_by_coin.get(candidate['coin']))
+                for candidate in candidates
+            ]
             
-            # Coleta dados para a moeda
-            future = executor.submit(collect_all_data_for_coin, coin)
-            future_to_candidate[future] = candidate
-        
-        # Processa resultados
-        for future in future_to_candidate:
-            candidate = future_to_candidate[future]
-            try:
-                # Obtém dados coletados
-                collected_data = future.result()
-                
-                # Analisa sentimento com base nos dados coletados
-                sentiment_result = analyze_sentiment_with_llm(candidate['coin'], collected_data)
-                
-                # Calcula score de sentimento normalizado
-                sentiment_score = sentiment_result.get('score', 50)
-                buy_recommendation = sentiment_result.get('buy_recommendation', 'NEUTRO')
-                
-                # Ajusta o peso do sentimento no score final
-                # Quanto mais próximo de 100, melhor o sentimento
-                sentiment_weight = (sentiment_score - 50) * 2  # Converte a escala de 50-100 para 0-100
-                
-                # Normaliza o peso do sentimento para ser comparável com o score técnico
-                normalized_sentiment = sentiment_weight * 5
-                
-                # Cálculo do score final (70% técnico + 30% sentimento)
-                final_score = (candidate['tech_score'] * 0.7) + (normalized_sentiment * 0.3)
-                
-                # Bônus para recomendações explícitas de compra
-                if buy_recommendation == 'SIM':
-                    final_score += 50
-                elif buy_recommendation == 'NÃO':
-                    final_score -= 50
-                
-                # Armazena todos os dados
-                combined_data = {
-                    **candidate,
-                    'sentiment_score': sentiment_score,
-                    'sentiment': sentiment_result.get('sentiment', 'neutro'),
-                    'buy_recommendation': buy_recommendation,
-                    'key_factors': sentiment_result.get('key_factors', []),
-                    'final_score': final_score
-                }
-                
-                results.append(combined_data)
-                
-                # Log detalhado
-                log_info(f"\n{candidate['pair']}:")
-                log_info(f"Score Técnico: {candidate['tech_score']:.2f}")
-                log_info(f"Score de Sentimento: {sentiment_score}/100 ({sentiment_result.get('sentiment', 'neutro')})")
-                log_info(f"Recomendação: {buy_recommendation}")
-                log_info(f"Score Final: {final_score:.2f}")
-                
-            except Exception as e:
-                log_error(f"Erro ao processar {candidate['pair']}: {e}")
+            # Processa resultados na ordem em que ficam prontos
+            for future in as_completed(futures):
+                combined_data = future.result()
+                if combined_data is not None:
+                    results.append(combined_data)
+    
+    if results:
+        final_scores = calculate_final_scores(
+            [r['tech_score'] for r in results],
+            [r['sentiment_score'] for r in results],
+            [r['buy_recommendation'] for r in results]
+        )
+        for combined_data, final_score in zip(results, final_scores.tolist()):
+            combined_data['final_score'] = final_score
+            log_info(f"Score Final {combined_data['pair']}: {final_score:.2f}")
     
     return results
 
@@ -415,9 +590,9 @@ def require_multiple_signals(coin_pair, rsi, volume_analysis, macd_histogram, bb
         signals_checked += 1
         if rsi < 35:
             signals_positive += 1
-            log_info(f"{coin_pair}: ✓ RSI oversold ({rsi:.1f})")
+            log_info("%s: ✓ RSI oversold (%.1f)", coin_pair, rsi)
         else:
-            log_info(f"{coin_pair}: ✗ RSI não oversold ({rsi:.1f})")
+            log_info("%s: ✗ RSI não oversold (%.1f)", coin_pair, rsi)
     
     # Sinal 2: Volume acima da média
     if volume_analysis:
@@ -425,18 +600,18 @@ def require_multiple_signals(coin_pair, rsi, volume_analysis, macd_histogram, bb
         volume_signal = volume_analysis.get('volume_signal', 'NEUTRO')
         if volume_signal in ['FORTE_COMPRA', 'COMPRA']:
             signals_positive += 1
-            log_info(f"{coin_pair}: ✓ Volume forte")
+            log_info("%s: ✓ Volume forte", coin_pair)
         else:
-            log_info(f"{coin_pair}: ✗ Volume fraco")
+            log_info("%s: ✗ Volume fraco", coin_pair)
     
     # Sinal 3: MACD positivo ou virando
     if macd_histogram is not None:
         signals_checked += 1
         if macd_histogram > 0:
             signals_positive += 1
-            log_info(f"{coin_pair}: ✓ MACD positivo")
+            log_info("%s: ✓ MACD positivo", coin_pair)
         else:
-            log_info(f"{coin_pair}: ✗ MACD negativo")
+            log_info("%s: ✗ MACD negativo", coin_pair)
     
     # Sinal 4: Próximo da Bollinger Band inferior
     if bb_data:
@@ -444,9 +619,9 @@ def require_multiple_signals(coin_pair, rsi, volume_analysis, macd_histogram, bb
         bb_position = bb_data.get('position', 0.5)
         if bb_position < 0.3:
             signals_positive += 1
-            log_info(f"{coin_pair}: ✓ Próximo BB inferior")
+            log_info("%s: ✓ Próximo BB inferior", coin_pair)
         else:
-            log_info(f"{coin_pair}: ✗ Não próximo BB inferior")
+            log_info("%s: ✗ Não próximo BB inferior", coin_pair)
     
     # Sinal 5: Tendência de timeframe maior (adicionar depois)
     # Por enquanto, assume neutro
@@ -454,11 +629,46 @@ def require_multiple_signals(coin_pair, rsi, volume_analysis, macd_histogram, bb
     required_signals = config.MIN_SIGNALS_REQUIRED
     passed = signals_positive >= required_signals
     
-    log_info(f"{coin_pair}: {signals_positive}/{signals_checked} sinais positivos (mínimo {required_signals})")
+    log_info("%s: %d/%d sinais positivos (mínimo %d)", coin_pair, signals_positive, signals_checked, required_signals)
     
     return passed
 
 
+def _top_candidates(candidates, k=5):
+    """
+    Seleciona os k candidatos de maior score técnico.
+    Os campos usados no ranking ficam em um array estruturado (uma coluna por campo),
+    e a seleção é feita com argpartition, sem ordenar a lista inteira.
+    
+    Returns:
+        tuple: (array estruturado dos k melhores em ordem decrescente, lista dos dicts correspondentes)
+    """
+    table = np.empty(len(candidates), dtype=_CANDIDATE_DTYPE)
+    for i, candidate in enumerate(candidates):
+        table[i] = (candidate['pair'], candidate['rsi'], candidate['volatility'], candidate['tech_score'])
+    
+    scores = table['tech_score']
+    if len(table) > k:
+        top = np.argpartition(-scores, k)[:k]
+    else:
+        top = np.arange(len(table))
+    top = top[np.argsort(-scores[top], kind='stable')]
+    
+    return table[top], [candidates[i] for i in top]
+
+
+def _in_cooldown(pair, current_time):
+    """
+    Indica se o par foi vendido há menos de COOLDOWN_TIME segundos.
+    Lê o estado atual do módulo binance_client (e não uma cópia feita na importação).
+    """
+    last_trade_time = binance_client.last_trade_time
+    if pair != binance_client.last_sold_coin or (current_time - last_trade_time) >= config.COOLDOWN_TIME:
+        return False
+    log_info(f"Pulando {pair} devido ao período de cooldown ({((current_time - last_trade_time)/3600):.1f}h de {(config.COOLDOWN_TIME/3600):.1f}h)")
+    return True
+
+
 def choose_best_coin():
     """
     Seleciona a melhor moeda para trading com base em análise técnica e de sentimento.
@@ -475,63 +685,57 @@ def choose_best_coin():
     # Limita a quantidade de moedas para análise
     if len(all_coins) > config.MAX_COINS_TO_ANALYZE:
         log_info(f"Limitando análise às {config.MAX_COINS_TO_ANALYZE} moedas mais populares entre {len(all_coins)} disponíveis")
-        popular_coins = ['BTC', 'ETH', 'BNB', 'SOL', 'XRP', 'ADA', 'DOGE', 'SHIB', 'DOT', 'AVAX',
-                         'MATIC', 'LTC', 'LINK', 'UNI', 'ATOM', 'XLM', 'NEAR', 'ETC', 'ALGO', 'FTM']
+        all_coins_set = set(all_coins)
         
         # Adiciona as moedas populares primeiro, se existirem na lista
-        prioritized_coins = []
-        for coin in popular_coins:
-            if coin in all_coins:
-                prioritized_coins.append(coin)
+        prioritized_coins = [coin for coin in _POPULAR_COINS if coin in all_coins_set]
+        prioritized_set = set(prioritized_coins)
                 
-        # Adiciona outras moedas até completar o máximo
-        other_coins = [c for c in all_coins if c not in prioritized_coins]
-        coins_to_analyze = prioritized_coins + other_coins[:config.MAX_COINS_TO_ANALYZE - len(prioritized_coins)]
+        # Adiciona outras moedas até completar o máximo (sem ultrapassá-lo mesmo
+        # que haja mais moedas populares que MAX_COINS_TO_ANALYZE)
+        other_coins = [c for c in all_coins if c not in prioritized_set]
+        coins_to_analyze = (prioritized_coins + other_coins)[:config.MAX_COINS_TO_ANALYZE]
     else:
         coins_to_analyze = all_coins
     
     log_info(f"\n=== ANÁLISE DE SELEÇÃO DE MOEDA ===")
     log_info(f"Analisando {len(coins_to_analyze)} moedas")
 
-    # Filtra moedas com base em RSI e volatilidade
-    rsi_candidates = []
-    
-    for coin in coins_to_analyze:
-        pair = f"{coin}USDT"
-        
-        # Respeita cooldown da última venda
-        if pair == last_sold_coin and (current_time - last_trade_time) < config.COOLDOWN_TIME:
-            log_info(f"Pulando {pair} devido ao período de cooldown ({((current_time - last_trade_time)/3600):.1f}h de {(config.COOLDOWN_TIME/3600):.1f}h)")
-            continue
+    # Mantém o RSI dos pares atualizado em memória pelo stream de klines
+    if config.USE_KLINE_STREAM_RSI:
+        start_rsi_stream([f"{coin}USDT" for coin in coins_to_analyze])
 
-        # Filtra por RSI
-        tech_data = filter_by_rsi_enhanced(pair)
-        if tech_data:
-            rsi_candidates.append(tech_data)
+    # Respeita cooldown da última venda
+    pairs_to_filter = [
+        pair for pair in (f"{coin}USDT" for coin in coins_to_analyze)
+        if not _in_cooldown(pair, current_time)
+    ]
+    
+    # Filtra moedas com base em RSI e volatilidade (requisições à Binance em paralelo)
+    rsi_candidates = filter_candidates_enhanced(pairs_to_filter, config.FILTER_WORKERS)
+    
+    # Os indicadores memoizados não são mais usados neste ciclo
+    clear_indicator_caches()
     
     # Se não houver candidatos, retorna None
     if not rsi_candidates:
         log_info("Nenhum candidato encontrado com base em RSI e volatilidade")
         return None
         
-    # Ordena candidatos por score técnico
-    rsi_candidates.sort(key=lambda x: x['tech_score'], reverse=True)
-    
-    # Seleciona os top 5 para análise de sentimento
-    sentiment_candidates = rsi_candidates[:5]
+    # Seleciona os top 5 por score técnico para análise de sentimento
+    top_table, sentiment_candidates = _top_candidates(rsi_candidates, 5)
     
     log_info("\n=== TOP 5 CANDIDATOS PARA ANÁLISE DE SENTIMENTO ===")
-    for i, candidate in enumerate(sentiment_candidates, 1):
-        log_info(f"{i}. {candidate['pair']}: RSI={candidate['rsi']:.2f}, Vol={candidate['volatility']*100:.2f}%, Score={candidate['tech_score']:.2f}")
+    for i, row in enumerate(top_table, 1):
+        log_info(f"{i}. {row['pair']}: RSI={row['rsi']:.2f}, Vol={row['volatility']*100:.2f}%, Score={row['tech_score']:.2f}")
     
     # Analisa sentimento para os candidatos
     final_candidates = analyze_sentiment_for_candidates(sentiment_candidates)
     
     # Se houver candidatos finais, seleciona o melhor
     if final_candidates:
-        # Ordena por score final
-        final_candidates.sort(key=lambda x: x['final_score'], reverse=True)
-        best_candidate = final_candidates[0]
+        # Seleciona o maior score final
+        best_candidate = max(final_candidates, key=lambda x: x['final_score'])
         best_coin = best_candidate['pair']
         
         log_info(f"\nMelhor moeda selecionada: {best_coin} com Score Final={best_candidate['final_score']:.2f}")
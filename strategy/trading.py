@@ -3,41 +3,130 @@ Implementação das estratégias e lógica de trading
 """
 from config import config
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
 from utils.helpers import (
     log_info,
+    log_info_enabled,
     log_error,
     log_trade,
     log_warning,
     log_performance,
 )
 from datetime import datetime
-from api.binance_client import get_current_price, get_balance, buy_coin, sell_all_coins, get_portfolio_value, sell_coin, get_all_balances
+from api.binance_client import get_current_price, get_balances_snapshot, estimate_portfolio_value, get_trade_rules, get_base_asset, buy_coin, sell_all_coins, get_portfolio_value, sell_coin, get_all_balances
+from api import price_stream
 from analysis.technical import dynamic_stop_loss_take_profit
 from strategy.selection import choose_best_coin
+from strategy._kernels import eval_sl_tp, compute_pnl, SL_TP_NONE, SL_TP_STOP_LOSS, SL_TP_TAKE_PROFIT
 import json
+import hashlib
+import math
 import time
+import numpy as np
+
+try:
+    import msgpack
+except ImportError:  # msgpack é opcional; o estado é salvo em JSON
+    msgpack = None
+
+if config.STATE_FORMAT == 'msgpack' and msgpack is None:
+    log_warning("STATE_FORMAT='msgpack', mas o pacote msgpack não está instalado. O estado será salvo em JSON.")
+
+@dataclass(slots=True)
+class TradeState:
+    """Estado da negociação atual (uma posição por vez)"""
+    coin: str | None = None  # Par de moedas atual (ex: 'BTCUSDT')
+    base: str | None = None  # Ex: 'BTC'
+    purchase_price: float = 0.0  # Preço de compra REAL da moeda atual
+    qty: float = 0.0  # Quantidade REAL comprada
+    held_qty: float = 0.0  # Quantidade em carteira: comprada menos a comissão cobrada na moeda base
+    total_cost_usdt: float = 0.0  # Custo total em USDT incluindo taxas da compra
+    usdt_before: float = 0.0  # Saldo USDT antes da compra, para o P&L do ciclo de trade
+    sl_pct: float = config.DEFAULT_STOP_LOSS_PCT
+    tp_pct: float = config.DEFAULT_TAKE_PROFIT_PCT
+    open_time: float | None = None  # Abertura da posição (time.monotonic(): só para medir duração)
+    highest_price: float = 0.0
+    sl_price: float = 0.0  # Preço que ativa o stop loss (fixo entre compra e venda)
+    tp_price: float = 0.0  # Preço que ativa o take profit
+    last_eval_price: float = 0.0  # Preço da última avaliação completa da posição
+
+    def update_levels(self):
+        """Recalcula os preços de SL/TP a partir do preço de compra e dos percentuais"""
+        self.sl_price = self.purchase_price * (1 - self.sl_pct)
+        self.tp_price = self.purchase_price * (1 + self.tp_pct)
+
+    def clear_position(self):
+        """Reseta os dados da posição para a próxima trade (SL/TP atuais são mantidos)"""
+        self.coin = None
+        self.base = None
+        self.purchase_price = 0.0
+        self.qty = 0.0
+        self.held_qty = 0.0
+        self.total_cost_usdt = 0.0
+        self.usdt_before = 0.0
+        self.open_time = None
+        self.highest_price = 0.0
+        self.sl_price = 0.0
+        self.tp_price = 0.0
+        self.last_eval_price = 0.0
+
+
+# Estado da negociação do bot
+STATE = TradeState()
 
-# Variáveis globais para o estado da negociação
-current_coin = None  # Par de moedas atual (ex: 'BTCUSDT')
-current_coin_base_asset = None # Ex: 'BTC'
-current_coin_purchase_price = 0.0  # Preço de compra REAL da moeda atual
-current_coin_quantity_bought = 0.0 # Quantidade REAL comprada
-current_coin_total_cost_usdt = 0.0 # Custo total em USDT incluindo taxas da compra
-position_open_time = None          # Timestamp de quando a posição foi aberta
-highest_price_reached = 0.0 
 trades_today = 0
-last_trade_date = None
-last_trade_timestamp = 0
-
-stop_loss_pct = config.DEFAULT_STOP_LOSS_PCT
-take_profit_pct = config.DEFAULT_TAKE_PROFIT_PCT
-
-# Para rastreamento de P&L do ciclo de trade
-usdt_balance_before_trade = 0.0
+last_trade_date = None  # Dia UTC (ordinal, ver _utc_day) do contador de trades
+last_trade_timestamp = 0  # time.monotonic() do último trade (0 = nenhum)
 
 # Controle de performance diária
 daily_profit_loss = 0.0
-current_day = datetime.utcnow().date()
+
+
+def _utc_day():
+    """Dia UTC atual como inteiro (dias desde a época): barato de obter e comparar"""
+    return int(time.time() // 86400)
+
+
+current_day = _utc_day()
+
+# Preço em USDT dos ativos de comissão: ativo -> (preço, obtido_em monotônico)
+COMM_PRICE_TTL = 30
+_COMM_PRICE_CACHE = {}
+
+# Resultado de choose_best_coin reaproveitado por alguns segundos (o universo de candidatas
+# não muda entre ciclos próximos)
+CHOOSE_COIN_TTL = 60
+_CHOOSE_CACHE = {'ts': 0.0, 'val': None}
+
+# A partir de quantos fills os totais da ordem são calculados com numpy
+FILLS_NUMPY_THRESHOLD = 16
+_FILLS_DTYPE = np.dtype([('q', 'f8'), ('p', 'f8'), ('c', 'f8')])
+
+# Relatórios pós-trade (valor da carteira e gravação do estado) rodam em segundo plano,
+# fora do caminho da ordem; um único worker mantém a ordem dos relatórios
+_report_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="trade-report")
+_save_state_lock = threading.Lock()
+
+# Último estado gravado (hash do conteúdo, sem o horário) para não regravar o mesmo estado
+_last_saved_hash = None
+_last_saved_at = 0.0
+
+# Status repetitivos da posição (SL/TP, tempo aberta) são logados no máximo a cada N segundos
+STATUS_LOG_INTERVAL = 30
+_last_status_log = {}
+
+# Sinalizado pelo stream de preços quando o preço cruza o SL/TP da posição aberta;
+# o loop principal acorda na hora em vez de esperar o próximo ciclo
+TRIGGER_EVENT = threading.Event()
+
+# Momento (monotônico) da última venda disparada que falhou; até config.SELL_RETRY_INTERVAL
+# depois dela o stream não volta a sinalizar TRIGGER_EVENT, para o loop não girar sem pausa
+_last_sell_failure = 0.0
+
+# Calcula o SL/TP dinâmico (ATR) enquanto os saldos da compra são consultados
+_sl_tp_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sl-tp")
 
 def can_open_new_trade():
     """
@@ -47,10 +136,10 @@ def can_open_new_trade():
     """
     global trades_today, last_trade_date, last_trade_timestamp
     
-    current_time = time.time()
-    today = datetime.now().date()
+    current_time = time.monotonic()
+    today = _utc_day()
     
-    # Reset contador se mudou o dia
+    # Reset contador se mudou o dia (UTC, o mesmo dia do limite de perda diária)
     if last_trade_date != today:
         trades_today = 0
         last_trade_date = today
@@ -70,25 +159,32 @@ def can_open_new_trade():
     
     return True
 
-def save_bot_state():
+def save_bot_state(trade_state=STATE, total_usdt=None, balances=None):
     """
     Salva o estado atual do bot em um arquivo JSON.
     Chame esta função após cada ciclo de trading.
+    Um estado idêntico ao último gravado só é regravado após config.STATE_SAVE_MIN_INTERVAL.
+    
+    Args:
+        trade_state (TradeState): Estado da negociação
+        total_usdt (float, optional): Valor da carteira já calculado no ciclo
+        balances (dict, optional): Saldos já obtidos no ciclo
     """
+    global _last_saved_hash, _last_saved_at
+    
     try:
-        
-        # Obtém informações globais se disponíveis
-        global current_coin, current_coin_purchase_price, stop_loss_pct, take_profit_pct
-        
+        if total_usdt is None:
+            total_usdt = get_portfolio_value()
+        if balances is None:
+            balances = get_all_balances()
         state = {
-            'total_usdt': get_portfolio_value(),
-            'balances': get_all_balances(),
-            'last_update': datetime.now().isoformat(),
+            'total_usdt': total_usdt,
+            'balances': balances,
             'trading_info': {
-                'current_coin': current_coin if 'current_coin' in globals() else None,
-                'purchase_price': current_coin_purchase_price if 'current_coin_purchase_price' in globals() else 0,
-                'stop_loss': stop_loss_pct if 'stop_loss_pct' in globals() else config.DEFAULT_STOP_LOSS_PCT,
-                'take_profit': take_profit_pct if 'take_profit_pct' in globals() else config.DEFAULT_TAKE_PROFIT_PCT
+                'current_coin': trade_state.coin,
+                'purchase_price': trade_state.purchase_price,
+                'stop_loss': trade_state.sl_pct,
+                'take_profit': trade_state.tp_pct
             },
             'bot_config': {
                 'interval_minutes': config.DEFAULT_INTERVAL,
@@ -101,10 +197,33 @@ def save_bot_state():
         if not os.path.exists(state_dir):
             os.makedirs(state_dir)
         
-        filepath = os.path.join(state_dir, 'bot_state.json')
+        use_msgpack = config.STATE_FORMAT == 'msgpack' and msgpack is not None
+        filepath = os.path.join(state_dir, 'bot_state.msgpack' if use_msgpack else 'bot_state.json')
         
-        with open(filepath, 'w') as f:
-            json.dump(state, f, indent=2)
+        tmp_path = filepath + '.tmp'
+        
+        # O estado pode ser salvo pelo loop principal e pelo relatório pós-trade ao mesmo tempo.
+        # Grava em um arquivo temporário e troca de uma vez: uma queda no meio da escrita
+        # nunca deixa o arquivo de estado truncado
+        with _save_state_lock:
+            state_hash = hashlib.blake2b(json.dumps(state, sort_keys=True).encode(), digest_size=16).digest()
+            now = time.monotonic()
+            if state_hash == _last_saved_hash and now - _last_saved_at < config.STATE_SAVE_MIN_INTERVAL:
+                return
+            state['last_update'] = datetime.now().isoformat()
+            
+            if use_msgpack:
+                payload = msgpack.packb(state, use_bin_type=True)
+            else:
+                payload = json.dumps(state, separators=(',', ':')).encode('utf-8')
+            
+            with open(tmp_path, 'wb') as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, filepath)
+            _last_saved_hash = state_hash
+            _last_saved_at = now
         
         log_info(f"Estado do bot salvo em {filepath}")
         
@@ -112,6 +231,76 @@ def save_bot_state():
         log_error(f"Erro ao salvar estado do bot: {e}")
 
 
+def _post_trade_report(message, trade_state):
+    """
+    Loga o valor da carteira e salva o estado após uma compra ou venda.
+    """
+    log_info(message)
+    save_bot_state(trade_state, total_usdt=get_portfolio_value())
+
+
+def _schedule_post_trade_report(message, state):
+    """
+    Agenda o relatório pós-trade em segundo plano com uma cópia do estado atual.
+    """
+    _report_executor.submit(_post_trade_report, message, replace(state))
+
+
+def _cached_comm_price(asset):
+    """
+    Preço em USDT do ativo de comissão, reaproveitado por COMM_PRICE_TTL segundos
+    (as taxas costumam vir sempre no mesmo ativo, ex: BNB).
+    """
+    now = time.monotonic()
+    hit = _COMM_PRICE_CACHE.get(asset)
+    if hit and now - hit[1] < COMM_PRICE_TTL:
+        return hit[0]
+    price = get_current_price(f"{asset}USDT")
+    if price:
+        _COMM_PRICE_CACHE[asset] = (price, now)
+    return price
+
+
+def _cached_choose_best_coin():
+    """
+    choose_best_coin com o resultado reaproveitado por CHOOSE_COIN_TTL segundos.
+    """
+    now = time.monotonic()
+    if _CHOOSE_CACHE['ts'] == 0.0 or now - _CHOOSE_CACHE['ts'] > CHOOSE_COIN_TTL:
+        _CHOOSE_CACHE['val'] = choose_best_coin()
+        _CHOOSE_CACHE['ts'] = now
+    return _CHOOSE_CACHE['val']
+
+
+def _invalidate_choose_cache():
+    """Descarta a escolha em cache (ex: depois de abrir uma posição com ela)."""
+    _CHOOSE_CACHE['ts'] = 0.0
+    _CHOOSE_CACHE['val'] = None
+
+
+def _mixed_commission_usdt(fills, total_quote_qty, default_fee_percent):
+    """
+    Taxas em USDT de uma ordem cujos fills cobraram comissão em ativos diferentes
+    (ex: parte em BNB, parte na moeda base): converte o total de cada ativo separadamente.
+    """
+    commission_by_asset = {}
+    for f in fills:
+        asset = f['commissionAsset']
+        commission_by_asset[asset] = commission_by_asset.get(asset, 0.0) + float(f['commission'])
+    
+    fees_paid_usdt = 0.0
+    for asset, commission in commission_by_asset.items():
+        if asset == 'USDT':
+            fees_paid_usdt += commission
+            continue
+        asset_price = _cached_comm_price(asset) if asset else None
+        if not asset_price or asset_price <= 0:
+            log_warning(f"Não foi possível converter a comissão em {asset or '?'} para USDT. Taxa estimada como {default_fee_percent*100}%.")
+            return total_quote_qty * default_fee_percent
+        fees_paid_usdt += commission * asset_price
+    return fees_paid_usdt
+
+
 def _calculate_order_details(order_response, default_fee_percent=config.BINANCE_FEE_PERCENT):
     """Calcula preço médio, quantidade total, custo/receita total e taxas dos fills de uma ordem."""
     total_quantity = 0
@@ -120,21 +309,38 @@ def _calculate_order_details(order_response, default_fee_percent=config.BINANCE_
     commission_asset = ""
 
     if order_response and 'fills' in order_response and order_response['fills']:
-        for fill in order_response['fills']:
-            total_quantity += float(fill['qty'])
-            total_quote_qty += float(fill['price']) * float(fill['qty']) # Custo bruto por fill
-            total_commission += float(fill['commission'])
-            commission_asset = fill['commissionAsset']
+        fills = order_response['fills']
+        if len(fills) > FILLS_NUMPY_THRESHOLD:
+            # Ordens com muitos fills: uma única passada para um array estruturado e somas em C
+            arr = np.fromiter(
+                ((float(f['qty']), float(f['price']), float(f['commission'])) for f in fills),
+                dtype=_FILLS_DTYPE, count=len(fills))
+            total_quantity = float(arr['q'].sum())
+            # Custo bruto = soma de preço * quantidade de cada fill
+            total_quote_qty = float(np.dot(arr['p'], arr['q']))
+            total_commission = float(arr['c'].sum())
+        else:
+            qtys = [float(f['qty']) for f in fills]
+            prices = [float(f['price']) for f in fills]
+            total_quantity = math.fsum(qtys)
+            # Custo bruto = soma de preço * quantidade de cada fill
+            total_quote_qty = math.fsum(p * q for p, q in zip(prices, qtys))
+            total_commission = math.fsum(float(f['commission']) for f in fills)
+        commission_asset = fills[-1]['commissionAsset']
+        # A soma das comissões só vale se todas estiverem no mesmo ativo
+        mixed_commission = any(f['commissionAsset'] != commission_asset for f in fills)
         
         if total_quantity > 0:
             avg_price = total_quote_qty / total_quantity
             
             # Converter comissão para USDT se necessário
             fees_paid_usdt = 0
-            if commission_asset == 'USDT':
+            if mixed_commission:
+                fees_paid_usdt = _mixed_commission_usdt(fills, total_quote_qty, default_fee_percent)
+            elif commission_asset == 'USDT':
                 fees_paid_usdt = total_commission
             elif commission_asset: # Se for na moeda base ou outra
-                comm_asset_price = get_current_price(f"{commission_asset}USDT")
+                comm_asset_price = _cached_comm_price(commission_asset)
                 if comm_asset_price and comm_asset_price > 0:
                     fees_paid_usdt = total_commission * comm_asset_price
                 else: # Estimativa se não conseguir preço da comissão
@@ -165,11 +371,11 @@ def _calculate_order_details(order_response, default_fee_percent=config.BINANCE_
     return 0, 0, 0, 0
 
 
-def reset_daily_performance():
-    """Reseta o acompanhamento de lucro/prejuízo diário"""
+def reset_daily_performance(today=None):
+    """Reseta o acompanhamento de lucro/prejuízo diário (today: dia UTC já calculado)"""
     global daily_profit_loss, current_day
     daily_profit_loss = 0.0
-    current_day = datetime.utcnow().date()
+    current_day = _utc_day() if today is None else today
     log_info("Performance diária reiniciada")
 
 
@@ -182,10 +388,9 @@ def update_daily_profit(amount):
 
 def check_daily_loss_limit():
     """Verifica se o limite de perda diária foi atingido"""
-    global current_day
-    today = datetime.utcnow().date()
+    today = _utc_day()
     if today != current_day:
-        reset_daily_performance()
+        reset_daily_performance(today)
     if daily_profit_loss <= -config.MAX_DAILY_LOSS_USDT:
         log_warning(
             f"Limite diário de perda atingido ({daily_profit_loss:.2f} USDT). Operações serão pausadas."
@@ -194,82 +399,136 @@ def check_daily_loss_limit():
     return False
 
 
-def check_stop_loss_and_take_profit(coin_pair_to_check):
+def get_market_price(coin_pair):
+    """
+    Preço atual do par: usa o stream de preços quando disponível e recente,
+    senão consulta a API REST.
+    """
+    if config.USE_PRICE_STREAM:
+        price = price_stream.get_cached_price(coin_pair, config.PRICE_STREAM_MAX_AGE)
+        if price is not None:
+            return price
+    return get_current_price(coin_pair)
+
+
+def _on_price_tick(coin_pair, price):
+    """
+    Callback do stream de preços: só compara com o SL/TP e sinaliza TRIGGER_EVENT.
+    A venda em si fica com o loop principal (o callback roda na thread do stream).
+    """
+    state = STATE
+    if coin_pair != state.coin or state.purchase_price == 0:
+        return
+    if time.monotonic() - _last_sell_failure < config.SELL_RETRY_INTERVAL:
+        return
+    if eval_sl_tp(price, state.sl_price, state.tp_price):
+        TRIGGER_EVENT.set()
+
+
+price_stream.add_tick_listener(_on_price_tick)
+
+
+def _record_sell_failure():
+    """
+    Registra uma venda disparada que não foi executada e desarma o gatilho do stream
+    até passar config.SELL_RETRY_INTERVAL.
+    """
+    global _last_sell_failure
+    _last_sell_failure = time.monotonic()
+    TRIGGER_EVENT.clear()
+
+
+def _status_log_due(kind):
+    """
+    Indica se o status `kind` pode ser logado agora: INFO ativo e nenhum log desse
+    status nos últimos STATUS_LOG_INTERVAL segundos.
+    """
+    if not log_info_enabled():
+        return False
+    now = time.monotonic()
+    if now - _last_status_log.get(kind, 0.0) < STATUS_LOG_INTERVAL:
+        return False
+    _last_status_log[kind] = now
+    return True
+
+
+def check_stop_loss_and_take_profit(state, coin_pair_to_check, price=None):
     """
     Verifica se o preço atual atingiu os níveis de stop loss ou take profit.
     
     Args:
+        state (TradeState): Estado da negociação
         coin_pair_to_check (str): Par de moedas atual
+        price (float, optional): Preço já conhecido (ex: do stream); se None, é consultado
         
     Returns:
         str or None: "STOP_LOSS", "TAKE_PROFIT" se acionado, ou None
     """
-    global current_coin_purchase_price # Usar o preço real de compra
-
-    if current_coin_purchase_price == 0: # Não comprou nada ainda ou erro
-        log_warning("Verificação de SL/TP chamada, mas current_coin_purchase_price é 0.")
+    if state.purchase_price == 0: # Não comprou nada ainda ou erro
+        log_warning("Verificação de SL/TP chamada, mas o preço de compra é 0.")
         return None
         
-    actual_market_price = get_current_price(coin_pair_to_check)
+    actual_market_price = price if price is not None else get_market_price(coin_pair_to_check)
     if actual_market_price is None:
         log_error(f"Não foi possível obter o preço de mercado atual para {coin_pair_to_check} ao verificar SL/TP.")
         return None
 
-    sl_price = current_coin_purchase_price * (1 - stop_loss_pct)
-    tp_price = current_coin_purchase_price * (1 + take_profit_pct)
+    trigger = eval_sl_tp(actual_market_price, state.sl_price, state.tp_price)
     
-    percentage_change = ((actual_market_price - current_coin_purchase_price) / current_coin_purchase_price * 100)
-
-    log_info(f"Status para {coin_pair_to_check}: Preço Compra: {current_coin_purchase_price:.6f}, Atual: {actual_market_price:.6f} (Variação: {percentage_change:.2f}%)")
-    log_info(f"SL: {stop_loss_pct*100:.2f}% (Ativará em <= {sl_price:.6f}), TP: {take_profit_pct*100:.2f}% (Ativará em >= {tp_price:.6f})")
+    if trigger == SL_TP_NONE:
+        # Caso comum: sem gatilho. O status detalhado é só diagnóstico e tem limite de frequência
+        if _status_log_due('sl_tp'):
+            percentage_change = ((actual_market_price - state.purchase_price) / state.purchase_price * 100)
+            log_info("Status para %s: Preço Compra: %.6f, Atual: %.6f (Variação: %.2f%%)",
+                     coin_pair_to_check, state.purchase_price, actual_market_price, percentage_change)
+            log_info("SL: %.2f%% (Ativará em <= %.6f), TP: %.2f%% (Ativará em >= %.6f)",
+                     state.sl_pct * 100, state.sl_price, state.tp_pct * 100, state.tp_price)
+        return None
+    
+    percentage_change = ((actual_market_price - state.purchase_price) / state.purchase_price * 100)
 
-    if actual_market_price <= sl_price:
-        log_info(f"!!! ATIVANDO STOP LOSS para {coin_pair_to_check} !!!")
-        log_info(f"Preço atual: {actual_market_price:.6f}, Preço de compra: {current_coin_purchase_price:.6f}")
-        log_info(f"Queda de {abs(percentage_change):.2f}%, Stop Loss em: -{stop_loss_pct*100:.2f}%")
+    if trigger == SL_TP_STOP_LOSS:
+        log_info("!!! ATIVANDO STOP LOSS para %s !!!", coin_pair_to_check)
+        log_info("Preço atual: %.6f, Preço de compra: %.6f", actual_market_price, state.purchase_price)
+        log_info("Queda de %.2f%%, Stop Loss em: -%.2f%%", abs(percentage_change), state.sl_pct * 100)
         return "STOP_LOSS"
     
-    elif actual_market_price >= tp_price:
-        log_info(f"!!! ATIVANDO TAKE PROFIT para {coin_pair_to_check} !!!")
-        log_info(f"Preço atual: {actual_market_price:.6f}, Preço de compra: {current_coin_purchase_price:.6f}")
-        log_info(f"Ganho de {percentage_change:.2f}%, Take Profit em: +{take_profit_pct*100:.2f}%")
-        return "TAKE_PROFIT"
-    
-    return None
+    log_info("!!! ATIVANDO TAKE PROFIT para %s !!!", coin_pair_to_check)
+    log_info("Preço atual: %.6f, Preço de compra: %.6f", actual_market_price, state.purchase_price)
+    log_info("Ganho de %.2f%%, Take Profit em: +%.2f%%", percentage_change, state.tp_pct * 100)
+    return "TAKE_PROFIT"
 
 
-def initialize_trade(coin_pair_to_buy):
+def initialize_trade(state, coin_pair_to_buy):
     """
     Inicializa uma nova operação de compra para o par de moedas.
     
     Args:
+        state (TradeState): Estado da negociação, atualizado com a nova posição
         coin_pair_to_buy (str): Par de moedas a ser comprado
         
     Returns:
         bool: True se a compra foi bem-sucedida, False caso contrário
     """
-    global current_coin, current_coin_base_asset, current_coin_purchase_price, current_coin_quantity_bought, current_coin_total_cost_usdt
-    global stop_loss_pct, take_profit_pct
-    global usdt_balance_before_trade
-
     log_info(f"\n--- INICIALIZANDO TRADE PARA {coin_pair_to_buy} ---")
     
-    # Configura stop loss e take profit dinâmicos
-    current_stop_loss_pct, current_take_profit_pct = dynamic_stop_loss_take_profit(
+    # Configura stop loss e take profit dinâmicos (em paralelo com as consultas de saldo)
+    sl_tp_future = _sl_tp_executor.submit(
+        dynamic_stop_loss_take_profit,
         coin_pair_to_buy, 
         config.DEFAULT_STOP_LOSS_PCT, 
         config.DEFAULT_TAKE_PROFIT_PCT
     )
-    stop_loss_pct = current_stop_loss_pct # Atualiza globais
-    take_profit_pct = current_take_profit_pct
     
     # Obtém saldo em USDT
-    usdt_balance = get_balance('USDT')
+    # Uma única leitura dos saldos serve para a verificação, o valor da carteira e o P&L do trade
+    balances = get_balances_snapshot()
+    usdt_balance = balances.get('USDT', 0.0)
     if usdt_balance < config.MIN_USDT_FOR_TRADE: # Usar um valor configurável
         log_error(f"Saldo USDT ({usdt_balance:.2f}) insuficiente. Mínimo necessário: {config.MIN_USDT_FOR_TRADE} USDT")
         return False
     
-    portfolio_value = get_portfolio_value()
+    portfolio_value = estimate_portfolio_value(balances)
     usdt_to_invest = portfolio_value * config.PERCENT_PORTFOLIO_PER_TRADE
     usdt_to_invest = min(usdt_to_invest, usdt_balance)
     if usdt_to_invest < config.MIN_USDT_FOR_TRADE:
@@ -277,9 +536,21 @@ def initialize_trade(coin_pair_to_buy):
             f"Valor a investir ({usdt_to_invest:.2f}) é menor que o mínimo de {config.MIN_USDT_FOR_TRADE} USDT."
         )
         return False
+    
+    current_stop_loss_pct, current_take_profit_pct = sl_tp_future.result()
+    state.sl_pct = current_stop_loss_pct # Atualiza o estado
+    state.tp_pct = current_take_profit_pct
+    
+    # Valida o mínimo nocional do par com os filtros em cache antes de ir à corretora
+    _, min_notional = get_trade_rules(coin_pair_to_buy)
+    if min_notional is not None and usdt_to_invest * (1 - config.BINANCE_FEE_PERCENT) < min_notional:
+        log_error(
+            f"Valor a investir ({usdt_to_invest:.2f}) não atinge o mínimo nocional de {min_notional:.2f} USDT para {coin_pair_to_buy}."
+        )
+        return False
 
-    usdt_balance_before_trade = get_balance('USDT') # Registra saldo USDT ANTES da compra
-    log_info(f"Saldo USDT antes da compra: {usdt_balance_before_trade:.2f} USDT.")
+    state.usdt_before = usdt_balance # Registra saldo USDT ANTES da compra
+    log_info(f"Saldo USDT antes da compra: {state.usdt_before:.2f} USDT.")
     log_info(f"Iniciando compra de {coin_pair_to_buy} com aproximadamente {usdt_to_invest:.2f} USDT...")
     
     buy_order_response = buy_coin(coin_pair_to_buy, usdt_to_invest)
@@ -288,19 +559,21 @@ def initialize_trade(coin_pair_to_buy):
         avg_price, total_qty, gross_cost_usdt, fees_paid_usdt_buy = _calculate_order_details(buy_order_response)
 
         if avg_price > 0 and total_qty > 0:
-            current_coin = coin_pair_to_buy
-            current_coin_base_asset = coin_pair_to_buy.replace('USDT','')
-            current_coin_purchase_price = avg_price
-            current_coin_quantity_bought = total_qty
-            current_coin_total_cost_usdt = gross_cost_usdt + fees_paid_usdt_buy # Custo real incluindo taxas
-
-            log_trade("BUY", current_coin, current_coin_quantity_bought, current_coin_purchase_price, 
-                      gross_cost_usdt, fees_paid_usdt_buy, current_coin_total_cost_usdt)
-            log_info(f"Stop Loss definido em: {stop_loss_pct*100:.2f}%, Take Profit em: {take_profit_pct*100:.2f}%")
+            state.coin = coin_pair_to_buy
+            state.base = get_base_asset(coin_pair_to_buy)
+            state.purchase_price = avg_price
+            state.qty = total_qty
+            state.held_qty = _held_quantity(buy_order_response, state.base, total_qty)
+            state.total_cost_usdt = gross_cost_usdt + fees_paid_usdt_buy # Custo real incluindo taxas
+            state.update_levels()
+
+            log_trade("BUY", state.coin, state.qty, state.purchase_price, 
+                      gross_cost_usdt, fees_paid_usdt_buy, state.total_cost_usdt)
+            if config.USE_PRICE_STREAM:
+                price_stream.subscribe(state.coin)
+            log_info(f"Stop Loss definido em: {state.sl_pct*100:.2f}%, Take Profit em: {state.tp_pct*100:.2f}%")
             
-            log_info("Valor da carteira APÓS a compra:")
-            get_portfolio_value() # Log do portfólio após a compra
-            save_bot_state() 
+            _schedule_post_trade_report("Valor da carteira APÓS a compra:", state)
             return True
         else:
             log_error(f"Falha ao processar detalhes da ordem de compra para {coin_pair_to_buy}. Resposta da ordem: {buy_order_response}")
@@ -309,206 +582,256 @@ def initialize_trade(coin_pair_to_buy):
         log_error(f"Falha na execução da ordem de compra para {coin_pair_to_buy}.")
         return False
     
-def check_position_timeout(coin_pair_to_check):
+def check_position_timeout(state, coin_pair_to_check, price=None):
     """
     Verifica se a posição excedeu o tempo máximo de holding.
     
     Args:
+        state (TradeState): Estado da negociação
         coin_pair_to_check (str): Par de moedas atual
+        price (float, optional): Preço já obtido no ciclo; se None, é consultado
         
     Returns:
         str or None: "TIMEOUT_SOFT", "TIMEOUT_HARD" se acionado, ou None
     """
-    global position_open_time, current_coin_purchase_price
-    
-    if position_open_time is None:
+    if state.open_time is None:
         return None
     
-    time_held = time.time() - position_open_time
+    time_held = time.monotonic() - state.open_time
     hours_held = time_held / 3600
     
     # Obter preço atual
-    current_price = get_current_price(coin_pair_to_check)
+    current_price = price if price is not None else get_market_price(coin_pair_to_check)
     if current_price is None:
         return None
     
     # Calcular P&L atual
-    pnl_percentage = ((current_price - current_coin_purchase_price) / current_coin_purchase_price) * 100
+    pnl_percentage = ((current_price - state.purchase_price) / state.purchase_price) * 100
     
-    log_info(f"Posição aberta há {hours_held:.1f} horas. P&L atual: {pnl_percentage:.2f}%")
+    if _status_log_due('hold'):
+        log_info("Posição aberta há %.1f horas. P&L atual: %.2f%%", hours_held, pnl_percentage)
     
     # Timeout suave - vende se estiver em lucro após X horas
     if time_held >= config.POSITION_MAX_HOLD_TIME:
         if pnl_percentage > 0:
-            log_info(f"!!! TIMEOUT SUAVE ATIVADO - Vendendo com lucro de {pnl_percentage:.2f}% após {hours_held:.1f}h !!!")
+            log_info("!!! TIMEOUT SUAVE ATIVADO - Vendendo com lucro de %.2f%% após %.1fh !!!", pnl_percentage, hours_held)
             return "TIMEOUT_SOFT"
-        else:
-            log_info(f"Timeout suave atingido mas posição em prejuízo ({pnl_percentage:.2f}%). Aguardando...")
+        elif _status_log_due('soft_timeout'):
+            log_info("Timeout suave atingido mas posição em prejuízo (%.2f%%). Aguardando...", pnl_percentage)
     
     # Timeout forçado - vende independentemente após Y horas
     if time_held >= config.POSITION_FORCE_SELL_TIME:
-        log_info(f"!!! TIMEOUT FORÇADO - Vendendo após {hours_held:.1f}h com P&L de {pnl_percentage:.2f}% !!!")
+        log_info("!!! TIMEOUT FORÇADO - Vendendo após %.1fh com P&L de %.2f%% !!!", hours_held, pnl_percentage)
         return "TIMEOUT_HARD"
     
     return None
 
 
 # Adicionar trailing stop
-def update_trailing_stop():
+def update_trailing_stop(state, price=None):
     """
     Atualiza o stop loss dinamicamente baseado no preço máximo atingido.
+    price é o preço já obtido no ciclo; se None, é consultado.
     """
-    global stop_loss_pct, current_coin, current_coin_purchase_price, highest_price_reached
-    
-    if not config.USE_TRAILING_STOP or current_coin is None:
+    if not config.USE_TRAILING_STOP or state.coin is None:
         return
     
-    current_price = get_current_price(current_coin)
+    current_price = price if price is not None else get_market_price(state.coin)
     if current_price is None:
         return
     
-    # Inicializa o preço máximo se ainda não existir
-    if 'highest_price_reached' not in globals():
-        globals()['highest_price_reached'] = current_coin_purchase_price
-    
     # Atualiza o preço máximo
-    if current_price > highest_price_reached:
-        old_highest = highest_price_reached
-        highest_price_reached = current_price
+    if current_price > state.highest_price:
+        old_highest = state.highest_price
+        state.highest_price = current_price
         
         # Calcula novo stop loss (X% abaixo do máximo)
-        new_stop_price = highest_price_reached * (1 - config.TRAILING_STOP_DISTANCE)
+        new_stop_price = state.highest_price * (1 - config.TRAILING_STOP_DISTANCE)
         
         # Só atualiza se o novo stop for maior que o anterior
-        if new_stop_price > current_coin_purchase_price * (1 - stop_loss_pct):
-            old_stop_pct = stop_loss_pct
-            stop_loss_pct = 1 - (new_stop_price / current_coin_purchase_price)
+        if new_stop_price > state.sl_price:
+            old_stop_pct = state.sl_pct
+            state.sl_pct = 1 - (new_stop_price / state.purchase_price)
+            state.update_levels()
             
-            log_info(f"📈 Trailing Stop Atualizado!")
-            log_info(f"   Novo máximo: {highest_price_reached:.6f} (anterior: {old_highest:.6f})")
-            log_info(f"   Stop Loss: {old_stop_pct*100:.2f}% → {stop_loss_pct*100:.2f}%")
-            log_info(f"   Stop ativará em: {new_stop_price:.6f}")
+            log_info("📈 Trailing Stop Atualizado!")
+            log_info("   Novo máximo: %.6f (anterior: %.6f)", state.highest_price, old_highest)
+            log_info("   Stop Loss: %.2f%% → %.2f%%", old_stop_pct * 100, state.sl_pct * 100)
+            log_info("   Stop ativará em: %.6f", new_stop_price)
 
 
 # Modificar a função initialize_trade para registrar o tempo
-def initialize_trade_with_timeout(coin_pair_to_buy):
+def initialize_trade_with_timeout(state, coin_pair_to_buy):
     """
     Versão modificada de initialize_trade que registra o tempo de abertura.
     """
-    global position_open_time, highest_price_reached
-    
     if not can_open_new_trade():
         log_info("Não é permitido abrir novo trade no momento")
         return False
     
     # Chama a função original (você pode integrar diretamente)
-    result = initialize_trade(coin_pair_to_buy)
+    result = initialize_trade(state, coin_pair_to_buy)
     
     if result:
-        position_open_time = time.time()
-        highest_price_reached = current_coin_purchase_price
+        state.open_time = time.monotonic()
+        state.highest_price = state.purchase_price
         log_info(f"⏰ Timer de posição iniciado. Timeout suave em {config.POSITION_MAX_HOLD_TIME/3600:.1f}h, forçado em {config.POSITION_FORCE_SELL_TIME/3600:.1f}h")
     
     return result
 
-def execute_strategy_enhanced():
+
+def _held_quantity(order_response, base_asset, total_qty):
     """
-    Versão aprimorada de execute_strategy com timeout e trailing stop.
+    Quantidade que fica em carteira após uma compra: sem desconto em BNB, a Binance
+    cobra a comissão na própria moeda comprada.
     """
-    global current_coin, current_coin_base_asset, current_coin_purchase_price, current_coin_quantity_bought, current_coin_total_cost_usdt
-    global usdt_balance_before_trade, position_open_time, highest_price_reached
+    fills = order_response.get('fills') if order_response else None
+    if not fills:
+        # Sem fills não se sabe o ativo da comissão; desconta a taxa padrão por segurança
+        return total_qty * (1 - config.BINANCE_FEE_PERCENT)
+    base_commission = math.fsum(float(f['commission']) for f in fills if f['commissionAsset'] == base_asset)
+    return total_qty - base_commission
+
 
+def _sell_position(state):
+    """
+    Vende a posição aberta com a quantidade conhecida desde a compra, sem consultar o saldo.
+    Só se essa ordem falhar consulta o saldo real da moeda base e tenta de novo com ele.
+    
+    Returns:
+        tuple: (resposta da ordem ou None, última quantidade tentada; 0 se não há saldo)
+    """
+    quantity = state.held_qty
+    if quantity > 0:
+        log_info(f"Quantidade de {state.base} para vender: {quantity:.8f}")
+        sell_order_response = sell_coin(state.coin, quantity)
+        if sell_order_response:
+            return sell_order_response, quantity
+    
+    balance = get_balances_snapshot().get(state.base, 0.0)
+    if balance <= 0 or balance == quantity:
+        return None, balance
+    log_warning(f"Venda de {quantity:.8f} {state.base} não executada. Tentando com o saldo atual: {balance:.8f}.")
+    return sell_coin(state.coin, balance), balance
+
+
+def _finalize_sell(state, sell_order_response):
+    """
+    Registra uma venda executada: loga o trade, calcula o P&L (pela moeda e pela variação
+    do saldo USDT), atualiza o resultado do dia e libera o estado para a próxima compra.
+    """
+    avg_sell_price, total_qty_sold, gross_usdt_received, fees_paid_usdt_sell = _calculate_order_details(sell_order_response)
+    net_usdt_received = gross_usdt_received - fees_paid_usdt_sell
+
+    log_trade("SELL", state.coin, total_qty_sold, avg_sell_price, 
+              gross_usdt_received, fees_paid_usdt_sell, net_usdt_received)
+
+    # Calcular P&L do Trade
+    # Custo da compra já inclui taxas (state.total_cost_usdt)
+    # Receita da venda já é líquida (net_usdt_received)
+    
+    # P&L baseado no custo da moeda comprada e receita da venda, e
+    # P&L baseado na variação do saldo total de USDT (mais abrangente)
+    usdt_balance_after_trade = get_balances_snapshot().get('USDT', 0.0)
+    profit_or_loss_coin_trade, profit_or_loss_usdt_balance = compute_pnl(
+        net_usdt_received, state.total_cost_usdt, state.usdt_before, usdt_balance_after_trade
+    )
+    
+    log_info(f"\n--- RESULTADO DO TRADE PARA {state.coin} ---")
+    log_info(f"Custo Total da Compra (c/ taxas): {state.total_cost_usdt:.2f} USDT")
+    log_info(f"Receita Líquida da Venda (c/ taxas): {net_usdt_received:.2f} USDT")
+    log_info(f"Lucro/Prejuízo (Moeda Específica): {profit_or_loss_coin_trade:.2f} USDT")
+    log_info(f"----------------------------------------------")
+    log_info(f"Saldo USDT (Antes da Compra): {state.usdt_before:.2f} USDT")
+    log_info(f"Saldo USDT (Após a Venda): {usdt_balance_after_trade:.2f} USDT")
+    log_info(f"Lucro/Prejuízo (Variação Saldo USDT): {profit_or_loss_usdt_balance:.2f} USDT")
+    update_daily_profit(profit_or_loss_usdt_balance)
+    log_info(f"--- FIM DO RESULTADO DO TRADE ---\n")
+
+    # Resetar estado para a próxima trade
+    price_stream.unsubscribe(state.coin)
+    state.clear_position()
+    log_info("Moeda vendida! Pronto para selecionar nova moeda na próxima execução.")
+    _schedule_post_trade_report("Valor da carteira APÓS a venda:", state)
+
+
+def _within_noise_floor(state, price):
+    """
+    Indica se a posição pode pular a avaliação do ciclo: o preço mal se moveu desde a
+    última avaliação, está longe do SL/TP, não é um novo máximo (trailing stop) e o
+    timeout ainda não está perto.
+    """
+    last = state.last_eval_price
+    if price is None or last <= 0 or state.open_time is None:
+        return False
+    if abs(price - last) / last >= config.MIN_REEVAL_DELTA:
+        return False
+    if not (state.sl_price * 1.005 < price < state.tp_price * 0.995):
+        return False
+    if config.USE_TRAILING_STOP and price > state.highest_price:
+        return False
+    return time.monotonic() - state.open_time < config.POSITION_MAX_HOLD_TIME - 60
+
+
+def execute_strategy_enhanced(state=STATE):
+    """
+    Versão aprimorada de execute_strategy com timeout e trailing stop.
+    """
+    # Este ciclo já vai reavaliar a posição
+    TRIGGER_EVENT.clear()
     
     if check_daily_loss_limit():
         return False
     
     action_taken = False
     
-    if not current_coin:
+    if not state.coin:
         log_info("Não há moeda atual. Buscando a melhor oportunidade...")
-        chosen_coin_pair = choose_best_coin()
+        chosen_coin_pair = _cached_choose_best_coin()
         
         if chosen_coin_pair:
-            if initialize_trade_with_timeout(chosen_coin_pair):
+            if initialize_trade_with_timeout(state, chosen_coin_pair):
+                _invalidate_choose_cache()
                 action_taken = True
         else:
             log_info("Nenhuma moeda adequada encontrada para compra neste momento.")
     else:
+        # Um único preço para todas as verificações do ciclo
+        current_price = get_market_price(state.coin)
+        if _within_noise_floor(state, current_price):
+            return False
+        if current_price is not None:
+            state.last_eval_price = current_price
+        
         # Atualiza trailing stop se ativado
-        update_trailing_stop()
+        update_trailing_stop(state, current_price)
         
         # Verifica timeout PRIMEIRO (tem prioridade sobre stop loss/take profit)
-        timeout_trigger = check_position_timeout(current_coin)
+        timeout_trigger = check_position_timeout(state, state.coin, current_price)
         
         if timeout_trigger:
             trigger_reason = timeout_trigger
         else:
             # Verifica stop loss e take profit normalmente
-            trigger_reason = check_stop_loss_and_take_profit(current_coin)
+            trigger_reason = check_stop_loss_and_take_profit(state, state.coin, current_price)
         
         if trigger_reason:
-            log_info(f"💰 Decisão de vender {current_coin} devido a: {trigger_reason}")
+            log_info(f"💰 Decisão de vender {state.coin} devido a: {trigger_reason}")
             
-            # Executa a venda (código existente)
-            quantity_to_sell = get_balance(current_coin_base_asset)
-            if quantity_to_sell == 0 and current_coin_quantity_bought > 0:
-                quantity_to_sell = current_coin_quantity_bought
+            sell_order_response, quantity_to_sell = _sell_position(state)
             
-            if quantity_to_sell > 0:
-                sell_order_response = sell_coin(current_coin, quantity_to_sell)
-                
-                if sell_order_response:
-                    avg_sell_price, total_qty_sold, gross_usdt_received, fees_paid_usdt_sell = _calculate_order_details(sell_order_response)
-                    net_usdt_received = gross_usdt_received - fees_paid_usdt_sell
-
-                    log_trade("SELL", current_coin, total_qty_sold, avg_sell_price, 
-                              gross_usdt_received, fees_paid_usdt_sell, net_usdt_received)
-
-                    # Calcular P&L do Trade
-                    # Custo da compra já inclui taxas (current_coin_total_cost_usdt)
-                    # Receita da venda já é líquida (net_usdt_received)
-                    
-                    # P&L baseado no custo da moeda comprada e receita da venda
-                    profit_or_loss_coin_trade = net_usdt_received - current_coin_total_cost_usdt
-                    
-                    # P&L baseado na variação do saldo total de USDT (mais abrangente)
-                    usdt_balance_after_trade = get_balance('USDT')
-                    profit_or_loss_usdt_balance = usdt_balance_after_trade - usdt_balance_before_trade
-                    
-                    log_info(f"\n--- RESULTADO DO TRADE PARA {current_coin} ---")
-                    log_info(f"Custo Total da Compra (c/ taxas): {current_coin_total_cost_usdt:.2f} USDT")
-                    log_info(f"Receita Líquida da Venda (c/ taxas): {net_usdt_received:.2f} USDT")
-                    log_info(f"Lucro/Prejuízo (Moeda Específica): {profit_or_loss_coin_trade:.2f} USDT")
-                    log_info(f"----------------------------------------------")
-                    log_info(f"Saldo USDT (Antes da Compra): {usdt_balance_before_trade:.2f} USDT")
-                    log_info(f"Saldo USDT (Após a Venda): {usdt_balance_after_trade:.2f} USDT")
-                    log_info(f"Lucro/Prejuízo (Variação Saldo USDT): {profit_or_loss_usdt_balance:.2f} USDT")
-                    update_daily_profit(profit_or_loss_usdt_balance)
-                    log_info(f"--- FIM DO RESULTADO DO TRADE ---\n")
-
-                    # Resetar estado para a próxima trade
-                    current_coin = None
-                    current_coin_base_asset = None
-                    current_coin_purchase_price = 0.0
-                    current_coin_quantity_bought = 0.0
-                    current_coin_total_cost_usdt = 0.0
-                    usdt_balance_before_trade = 0.0 # Reset
-                    action_taken = True
-                    position_open_time = None
-                    highest_price_reached = 0
-                    log_info("Moeda vendida! Pronto para selecionar nova moeda na próxima execução.")
-                    log_info("Valor da carteira APÓS a venda:")
-                    get_portfolio_value()
-                    save_bot_state()
-
-                else:
-                    log_error(f"Falha ao executar ordem de venda para {current_coin}. Mantendo posição.")
-               
+            if sell_order_response:
+                _finalize_sell(state, sell_order_response)
+                action_taken = True
+            else:
+                if quantity_to_sell > 0:
+                    log_error(f"Falha ao executar ordem de venda para {state.coin}. Mantendo posição.")
+                _record_sell_failure()
     
     return action_taken
 
 
-def execute_strategy():
+def execute_strategy(state=STATE):
     """
     Executa a estratégia de trading:
     1) Se não tivermos uma moeda, escolhe a melhor com base em análise técnica e sentimento
@@ -517,26 +840,24 @@ def execute_strategy():
     Returns:
         bool: True se alguma ação foi tomada, False caso contrário
     """
-    global current_coin, current_coin_base_asset, current_coin_purchase_price, current_coin_quantity_bought, current_coin_total_cost_usdt
-    global usdt_balance_before_trade
-
     if check_daily_loss_limit():
         return False
     
     action_taken = False
 
-    if not current_coin:
+    if not state.coin:
         log_info("Não há moeda atual. Buscando a melhor oportunidade...")
         
         # Garante que não há saldos significativos de outras moedas (exceto USDT) antes de uma nova compra.
         # Isso é opcional e depende da estratégia de querer limpar tudo ou permitir múltiplas posições (não implementado).
         # sell_all_coins() # Pode ser muito agressivo se houver poeira ou outras posições intencionais.
-        # Por ora, vamos focar em uma moeda por vez. Se `current_coin` é None, assume-se que a posição anterior foi fechada.
+        # Por ora, vamos focar em uma moeda por vez. Se `state.coin` é None, assume-se que a posição anterior foi fechada.
 
-        chosen_coin_pair = choose_best_coin() # Retorna par ex: 'BTCUSDT'
+        chosen_coin_pair = _cached_choose_best_coin() # Retorna par ex: 'BTCUSDT'
         
         if chosen_coin_pair:
-            if initialize_trade(chosen_coin_pair):
+            if initialize_trade(state, chosen_coin_pair):
+                _invalidate_choose_cache()
                 action_taken = True
             else:
                 log_warning(f"Falha ao inicializar trade para {chosen_coin_pair}. Tentando na próxima vez.")
@@ -544,70 +865,26 @@ def execute_strategy():
             log_info("Nenhuma moeda adequada encontrada para compra neste momento.")
     else:
         # Já temos uma moeda, verifica stop loss e take profit
-        log_info(f"Verificando condições para {current_coin} (Comprado a {current_coin_purchase_price:.6f}, Qtd: {current_coin_quantity_bought:.8f}):")
+        log_info(f"Verificando condições para {state.coin} (Comprado a {state.purchase_price:.6f}, Qtd: {state.qty:.8f}):")
         
-        trigger_reason = check_stop_loss_and_take_profit(current_coin)
+        trigger_reason = check_stop_loss_and_take_profit(state, state.coin)
         
         if trigger_reason:
-            log_info(f"Decisão de vender {current_coin} devido a: {trigger_reason}")
+            log_info(f"Decisão de vender {state.coin} devido a: {trigger_reason}")
             
             # Vender a quantidade específica que temos
-            quantity_to_sell = get_balance(current_coin_base_asset) # Pega o saldo atual da moeda base
-            if quantity_to_sell == 0 and current_coin_quantity_bought > 0:
-                 log_warning(f"Saldo de {current_coin_base_asset} é zero, mas esperava-se {current_coin_quantity_bought}. Usando quantidade registrada.")
-                 quantity_to_sell = current_coin_quantity_bought # Fallback para a quantidade comprada registrada
-            
-            if quantity_to_sell > 0:
-                log_info(f"Saldo atual de {current_coin_base_asset} para vender: {quantity_to_sell:.8f}")
-                sell_order_response = sell_coin(current_coin, quantity_to_sell)
-
-                if sell_order_response:
-                    avg_sell_price, total_qty_sold, gross_usdt_received, fees_paid_usdt_sell = _calculate_order_details(sell_order_response)
-                    net_usdt_received = gross_usdt_received - fees_paid_usdt_sell
-
-                    log_trade("SELL", current_coin, total_qty_sold, avg_sell_price, 
-                              gross_usdt_received, fees_paid_usdt_sell, net_usdt_received)
-
-                    # Calcular P&L do Trade
-                    # Custo da compra já inclui taxas (current_coin_total_cost_usdt)
-                    # Receita da venda já é líquida (net_usdt_received)
-                    
-                    # P&L baseado no custo da moeda comprada e receita da venda
-                    profit_or_loss_coin_trade = net_usdt_received - current_coin_total_cost_usdt
-                    
-                    # P&L baseado na variação do saldo total de USDT (mais abrangente)
-                    usdt_balance_after_trade = get_balance('USDT')
-                    profit_or_loss_usdt_balance = usdt_balance_after_trade - usdt_balance_before_trade
-                    
-                    log_info(f"\n--- RESULTADO DO TRADE PARA {current_coin} ---")
-                    log_info(f"Custo Total da Compra (c/ taxas): {current_coin_total_cost_usdt:.2f} USDT")
-                    log_info(f"Receita Líquida da Venda (c/ taxas): {net_usdt_received:.2f} USDT")
-                    log_info(f"Lucro/Prejuízo (Moeda Específica): {profit_or_loss_coin_trade:.2f} USDT")
-                    log_info(f"----------------------------------------------")
-                    log_info(f"Saldo USDT (Antes da Compra): {usdt_balance_before_trade:.2f} USDT")
-                    log_info(f"Saldo USDT (Após a Venda): {usdt_balance_after_trade:.2f} USDT")
-                    log_info(f"Lucro/Prejuízo (Variação Saldo USDT): {profit_or_loss_usdt_balance:.2f} USDT")
-                    update_daily_profit(profit_or_loss_usdt_balance)
-                    log_info(f"--- FIM DO RESULTADO DO TRADE ---\n")
-
-                    # Resetar estado para a próxima trade
-                    current_coin = None
-                    current_coin_base_asset = None
-                    current_coin_purchase_price = 0.0
-                    current_coin_quantity_bought = 0.0
-                    current_coin_total_cost_usdt = 0.0
-                    usdt_balance_before_trade = 0.0 # Reset
-                    action_taken = True
-                    
-                    log_info("Moeda vendida! Pronto para selecionar nova moeda na próxima execução.")
-                    log_info("Valor da carteira APÓS a venda:")
-                    get_portfolio_value()
-                    save_bot_state()
-                else:
-                    log_error(f"Falha ao executar ordem de venda para {current_coin}. Mantendo posição.")
+            sell_order_response, quantity_to_sell = _sell_position(state)
+
+            if sell_order_response:
+                _finalize_sell(state, sell_order_response)
+                action_taken = True
+            elif quantity_to_sell > 0:
+                log_error(f"Falha ao executar ordem de venda para {state.coin}. Mantendo posição.")
+                _record_sell_failure()
             else:
-                log_warning(f"Tentativa de venda de {current_coin}, mas saldo de {current_coin_base_asset} é zero ou inválido. Resetando estado.")
+                log_warning(f"Tentativa de venda de {state.coin}, mas saldo de {state.base} é zero ou inválido. Resetando estado.")
                 # Resetar estado mesmo se a venda falhar por saldo zero, para evitar loops
-                current_coin = None # Força a reavaliação no próximo ciclo
+                price_stream.unsubscribe(state.coin)
+                state.coin = None # Força a reavaliação no próximo ciclo
     
     return action_taken
\ No newline at end of file
@@ -0,0 +1,73 @@
+"""
+Leitura de respostas em streaming do LLM e normalização da consulta em lote.
+"""
+import json
+
+from llm.client import _read_streamed_content
+from analysis.sentiment import _batch_result_by_coin
+from utils.helpers import extract_json_from_text
+
+
+class FakeStreamResponse:
+    """Resposta SSE mínima: entrega o conteúdo em pedaços, como o servidor faz."""
+
+    def __init__(self, pieces):
+        self.lines = [
+            b"data: " + json.dumps({"choices": [{"delta": {"content": piece}}]}).encode()
+            for piece in pieces
+        ]
+        self.lines.append(b"data: [DONE]")
+        self.closed = False
+        self.consumed = 0
+
+    def iter_lines(self):
+        for line in self.lines:
+            self.consumed += 1
+            yield line
+
+    def close(self):
+        self.closed = True
+
+
+def _pieces(text, size=7):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def test_streamed_list_is_read_until_the_outer_array_closes():
+    content = '[{"coin": "BTC", "score": 70}, {"coin": "eth", "score": 40, "note": "a ] in {text}"}]'
+    response = FakeStreamResponse(_pieces(content + " texto extra que não deve ser esperado"))
+
+    text = _read_streamed_content(response)
+
+    assert text.startswith(content)
+    assert response.closed
+    assert response.consumed < len(response.lines)
+
+    by_coin = _batch_result_by_coin(extract_json_from_text(text))
+    assert set(by_coin) == {"BTC", "ETH"}
+    assert by_coin["BTC"]["score"] == 70
+    assert by_coin["ETH"]["score"] == 40
+
+
+def test_streamed_object_still_stops_when_it_closes():
+    content = 'Resposta: {"BTC": {"score": 55}}'
+    response = FakeStreamResponse(_pieces(content + " fim", size=5))
+
+    text = _read_streamed_content(response)
+
+    assert _batch_result_by_coin(extract_json_from_text(text)) == {"BTC": {"score": 55}}
+
+
+def test_bracketed_preamble_does_not_end_the_stream_early():
+    content = 'Análise [BTC]: {"sentiment_score": 0.5}'
+    response = FakeStreamResponse(_pieces(content + " fim", size=4))
+
+    text = _read_streamed_content(response)
+
+    assert text.startswith(content)
+    assert extract_json_from_text(text) == {"sentiment_score": 0.5}
+
+
+def test_extract_json_skips_a_bracketed_preamble():
+    assert extract_json_from_text('Análise [BTC]: {"sentiment_score": 0.5}') == {"sentiment_score": 0.5}
+    assert extract_json_from_text('Ranking [1]: [{"coin": "BTC"}]') == [{"coin": "BTC"}]
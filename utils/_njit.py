@@ -0,0 +1,21 @@
+"""
+Decorador njit e prange do numba, com alternativas sem efeito quando o numba não está instalado
+"""
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:  # numba é opcional; as funções rodam como Python puro
+    NUMBA_AVAILABLE = False
+    prange = range
+
+    def njit(*args, **kwargs):
+        """
+        Substituto do numba.njit que devolve a função sem compilar.
+        Aceita tanto @njit quanto @njit(cache=True, ...).
+        """
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+
+        def decorator(func):
+            return func
+        return decorator
@@ -1,85 +1,297 @@
 """
 Funções auxiliares e utilitárias para o bot
 """
+import re
+import sys
 import time
 import json
-from datetime import datetime
-import math # Adicionado
+import queue
+import atexit
+import threading
+from functools import lru_cache, wraps
+from config import config
 
+# Níveis de log (mesma escala do módulo logging, com TRADE e PERF entre INFO e WARNING,
+# para o resultado das operações continuar visível no nível padrão)
+DEBUG = 10
+INFO = 20
+TRADE = 25
+PERF = 25
+WARNING = 30
+ERROR = 40
 
-def log_info(message):
+_LEVEL_NAMES = {"DEBUG": DEBUG, "INFO": INFO, "TRADE": TRADE, "PERF": PERF, "WARNING": WARNING, "ERROR": ERROR}
+
+# Mensagens abaixo deste nível são descartadas antes de formatar o horário e o texto.
+# Vem de config.LOG_LEVEL; use DEBUG para logar diagnósticos detalhados (ex: o texto bruto recebido do LLM)
+LOG_LEVEL = _LEVEL_NAMES.get(str(config.LOG_LEVEL).upper(), INFO)
+
+# Decodificador reaproveitado para extrair JSON do meio de um texto
+_JSON_DECODER = json.JSONDecoder()
+
+# Início de uma lista JSON de objetos/strings (ou vazia); um "[BTC]" no texto não conta
+_JSON_LIST_START_RE = re.compile(r'\[\s*[{"\]]')
+
+# Caches criados por memoize_per_minute, para poderem ser limpos de uma vez
+_MINUTE_CACHES = []
+
+# Linhas de log prontas; uma thread própria as escreve no console, tirando o I/O
+# da thread que está negociando
+_LOG_QUEUE = queue.SimpleQueue()
+_LOG_STOP = object()
+
+
+def _log_writer():
+    """
+    Escreve no console as linhas enfileiradas pelos log_*, na ordem em que chegaram.
+    Todas as linhas já disponíveis na fila saem em uma única escrita.
+    """
+    while True:
+        lines = [_LOG_QUEUE.get()]
+        while True:
+            try:
+                lines.append(_LOG_QUEUE.get_nowait())
+            except queue.Empty:
+                break
+        
+        stop = any(line is _LOG_STOP for line in lines)
+        if stop:
+            lines = [line for line in lines if line is not _LOG_STOP]
+        if lines:
+            sys.stdout.write('\n'.join(lines) + '\n')
+            sys.stdout.flush()
+        if stop:
+            break
+
+
+_log_thread = threading.Thread(target=_log_writer, name="log-writer", daemon=True)
+_log_thread.start()
+
+
+def _flush_log_queue():
+    """
+    Escreve as linhas ainda pendentes antes de o processo terminar.
+    """
+    _LOG_QUEUE.put(_LOG_STOP)
+    _log_thread.join(timeout=5)
+
+
+atexit.register(_flush_log_queue)
+
+
+def _emit(line):
+    """
+    Enfileira uma linha de log já formatada (o horário é o da chamada, não o da escrita).
+    """
+    _LOG_QUEUE.put(line)
+
+
+# Horário já formatado do último segundo visto, por thread: [segundo, texto]
+_ts_local = threading.local()
+
+
+def _ts():
     """
-    Função para log padronizado de informações
+    Horário atual formatado para os logs ('%Y-%m-%d %H:%M:%S').
+    A formatação só é refeita quando o segundo muda.
     """
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S') # StringFormatTime.
-    print(f"[{timestamp}] [INFO] {message}")
+    now = int(time.time())
+    cache = getattr(_ts_local, 'cache', None)
+    if cache is None:
+        cache = _ts_local.cache = [0, ""]
+    if cache[0] != now:
+        cache[0] = now
+        cache[1] = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(now))
+    return cache[1]
 
 
-def log_warning(message):
+def log_info_enabled():
+    """
+    Indica se as mensagens de INFO estão ativas. Use para evitar montar logs caros à toa.
+    """
+    return LOG_LEVEL <= INFO
+
+
+def log_debug(message, *args):
+    """
+    Função para log de diagnósticos detalhados; só formata a mensagem se o nível DEBUG estiver ativo.
+    """
+    if LOG_LEVEL > DEBUG:
+        return
+    if args:
+        message = message % args
+    timestamp = _ts()
+    _emit(f"[{timestamp}] [DEBUG] {message}")
+
+
+def log_info(message, *args):
+    """
+    Função para log padronizado de informações.
+    Aceita formatação preguiçosa no estilo %: log_info("RSI=%.2f", rsi) só formata
+    a mensagem se o INFO estiver ativo.
+    """
+    if LOG_LEVEL > INFO:
+        return
+    if args:
+        message = message % args
+    timestamp = _ts()
+    _emit(f"[{timestamp}] [INFO] {message}")
+
+
+def log_warning(message, *args):
     """
     Função para log padronizado de avisos
     """
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    print(f"[{timestamp}] [WARNING] {message}")
+    if LOG_LEVEL > WARNING:
+        return
+    if args:
+        message = message % args
+    timestamp = _ts()
+    _emit(f"[{timestamp}] [WARNING] {message}")
 
 
-def log_error(message):
+def log_error(message, *args):
     """
     Função para log padronizado de erros
     """
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    print(f"[{timestamp}] [ERROR] {message}")
+    if LOG_LEVEL > ERROR:
+        return
+    if args:
+        message = message % args
+    timestamp = _ts()
+    _emit(f"[{timestamp}] [ERROR] {message}")
+
+
+# Linha de log de compra/venda; o rótulo do valor líquido depende da operação
+_TRADE_FMT = "[%s] [TRADE] %s %.8f %s @ %.8f = %.2f USDT. %s: %.2f USDT. Taxas: %.4f USDT"
+_TRADE_NET_LABELS = {"BUY": "Custo com taxas", "SELL": "Recebido líquido"}
 
 
 def log_trade(action, symbol, quantity, price, total_value, fees_paid=0.0, net_value=0.0):
     """
     Função para log padronizado de operações de trading
     """
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    if action.upper() == "BUY":
-        print(f"[{timestamp}] [TRADE] {action} {quantity:.8f} {symbol} @ {price:.8f} = {total_value:.2f} USDT. Custo com taxas: {net_value:.2f} USDT. Taxas: {fees_paid:.4f} USDT")
-    elif action.upper() == "SELL":
-        print(f"[{timestamp}] [TRADE] {action} {quantity:.8f} {symbol} @ {price:.8f} = {total_value:.2f} USDT. Recebido líquido: {net_value:.2f} USDT. Taxas: {fees_paid:.4f} USDT")
+    if LOG_LEVEL > TRADE:
+        return
+    timestamp = _ts()
+    net_label = _TRADE_NET_LABELS.get(action.upper())
+    if net_label is not None:
+        _emit(_TRADE_FMT % (timestamp, action, quantity, symbol, price, total_value, net_label, net_value, fees_paid))
     else:
-        print(f"[{timestamp}] [TRADE] {action} {quantity} {symbol} @ {price} = {total_value:.2f} USDT")
+        _emit(f"[{timestamp}] [TRADE] {action} {quantity} {symbol} @ {price} = {total_value:.2f} USDT")
 
 
 def log_performance(label, value):
     """Loga métricas de performance como lucro ou perda acumulada"""
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    print(f"[{timestamp}] [PERF] {label}: {value:.2f} USDT")
+    if LOG_LEVEL > PERF:
+        return
+    timestamp = _ts()
+    _emit(f"[{timestamp}] [PERF] {label}: {value:.2f} USDT")
+
+
+class _NoResult(Exception):
+    """Sinaliza ao memoize_per_minute que a função devolveu None (o lru_cache não guarda exceções)."""
+
+
+def memoize_per_minute(func):
+    """
+    Decorador que memoiza o resultado por (argumentos, minuto atual).
+    Chamadas repetidas no mesmo minuto reaproveitam o resultado; no minuto seguinte
+    o valor é recalculado. Use clear_minute_caches() para liberar a memória.
+    Chamadas com argumentos não hasheáveis (ex: arrays) ignoram o cache.
+    Resultados None (falha na consulta) não são guardados: a próxima chamada tenta de novo.
+    """
+    @lru_cache(maxsize=2048)
+    def cached(minute_bucket, *args, **kwargs):
+        result = func(*args, **kwargs)
+        if result is None:
+            raise _NoResult
+        return result
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            hash((args, tuple(kwargs.values())))
+        except TypeError:
+            return func(*args, **kwargs)
+        try:
+            return cached(int(time.time() // 60), *args, **kwargs)
+        except _NoResult:
+            return None
+
+    wrapper.cache_clear = cached.cache_clear
+    _MINUTE_CACHES.append(cached)
+    return wrapper
+
+
+def clear_minute_caches():
+    """
+    Limpa todos os caches criados com memoize_per_minute.
+    """
+    for cached in _MINUTE_CACHES:
+        cached.cache_clear()
+
+
+# Formatadores de percentagem já compilados, por número de casas decimais;
+# o caso padrão (2 casas) tem o seu fixo, sem consulta ao dicionário
+_PCT2 = "{:.2f}%".format
+_PCT_FMT = {}
 
 
 def format_percentage(value, precision=2):
     """
     Formata um valor como percentagem
     """
-    return f"{value * 100:.{precision}f}%" #Precision é referente a quantidade de casas decimais
+    if precision == 2:
+        return _PCT2(value * 100.0)
+    fmt = _PCT_FMT.get(precision) #Precision é referente a quantidade de casas decimais
+    if fmt is None:
+        fmt = _PCT_FMT[precision] = f"{{:.{precision}f}}%".format
+    return fmt(value * 100.0)
 
 
-def wait_with_progress(minutes):
+def _sleep_until(deadline, wake_event=None):
     """
-    Espera o número especificado de minutos, mostrando progresso a cada minuto
+    Dorme até deadline (em time.monotonic()).
+    Retorna True se wake_event for sinalizado antes disso.
+    """
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        return False
+    if wake_event is not None:
+        return wake_event.wait(remaining)
+    time.sleep(remaining)
+    return False
+
+
+def wait_with_progress(minutes, wake_event=None):
+    """
+    Espera o número especificado de minutos, mostrando progresso a cada minuto.
+    Se wake_event (threading.Event) for sinalizado, a espera termina antes do tempo.
+    
+    Returns:
+        bool: True se a espera foi interrompida por wake_event
     """
     log_info(f"Aguardando {minutes} minutos...")
-    start_time = time.time()
+    start_time = time.monotonic()
     end_time = start_time + (minutes * 60)
     
-    next_minute_log_time = start_time + 60
-    # Correção para logar o primeiro minuto corretamente e evitar log imediato se o intervalo for < 1 min
     if minutes >= 1:
         log_info(f"Progresso: 0/{minutes} minutos ({minutes} restantes)")
 
-    while time.time() < end_time:
-        time.sleep(1)
-        current_time = time.time()
-        if current_time >= next_minute_log_time and minutes >=1:
-            minutes_passed = int((current_time - start_time) / 60)
-            minutes_remaining = minutes - minutes_passed
-            log_info(f"Progresso: {minutes_passed}/{minutes} minutos ({minutes_remaining} restantes)")
-            next_minute_log_time = start_time + ( (minutes_passed + 1) * 60) # Garante que o próximo log seja no próximo minuto exato
+    # Dorme direto até cada marca de minuto e depois até o fim, sem acordar a cada segundo
+    for minutes_passed in range(1, int(minutes)):
+        if _sleep_until(start_time + minutes_passed * 60, wake_event):
+            log_info("Espera interrompida por um evento de preço.")
+            return True
+        log_info(f"Progresso: {minutes_passed}/{minutes} minutos ({minutes - minutes_passed} restantes)")
+    
+    if _sleep_until(end_time, wake_event):
+        log_info("Espera interrompida por um evento de preço.")
+        return True
     
     log_info(f"Espera de {minutes} minutos concluída.")
+    return False
 
 
 def extract_json_from_text(text):
@@ -87,27 +299,38 @@ def extract_json_from_text(text):
     Tenta extrair JSON de um texto, mesmo se houver texto adicional antes ou depois.
     Retorna None se não conseguir encontrar JSON válido.
     """
-    log_info(f"JSON Text {text}")
+    if LOG_LEVEL <= DEBUG:
+        log_debug("JSON Text %s", text)
     try:
         # Tenta analisar o texto diretamente como JSON
         return json.loads(text)
     except json.JSONDecodeError:
-        # Se falhar, tenta encontrar delimitadores JSON
-        json_start = text.find('{')
-        json_end = text.rfind('}') + 1
-        
-        if json_start >= 0 and json_end > json_start:
-            json_str = text[json_start:json_end]
+        # Se falhar, decodifica a partir do primeiro delimitador (objeto ou lista) e, se não
+        # der certo, a partir do outro. raw_decode para no fim do JSON: sem procurar o
+        # fechamento nem copiar o trecho
+        list_match = _JSON_LIST_START_RE.search(text)
+        starts = sorted(
+            start for start in (text.find('{'), list_match.start() if list_match else -1)
+            if start >= 0
+        )
+        for start in starts:
             try:
-                return json.loads(json_str)
+                return _JSON_DECODER.raw_decode(text, start)[0]
             except json.JSONDecodeError:
-                return None
+                continue
         return None
 
 
+# Moedas conhecidamente inválidas ou que devem ser evitadas: tokens alavancados
+# terminam nestes sufixos; os demais marcadores podem aparecer em qualquer posição
+_INVALID_SUFFIXES = ('UPUSDT', 'DOWNUSDT') # Aumentar a lista depois
+_INVALID_SUBSTRINGS = ('BEAR', 'BULL')
+
+
+@lru_cache(maxsize=4096)
 def is_valid_coin(coin_symbol):
     """
-    Verifica se um símbolo de moeda parece válido
+    Verifica se um símbolo de moeda parece válido (resultado memoizado por símbolo)
     """
     if not coin_symbol:
         return False
@@ -116,29 +339,56 @@ def is_valid_coin(coin_symbol):
     if not (2 <= len(coin_symbol) <= 10 and coin_symbol.isupper()):
         return False
     
-    # Lista de moedas conhecidamente inválidas ou que devem ser evitadas
-    invalid_coins = ['UPUSDT', 'DOWNUSDT', 'BEAR', 'BULL'] # Aumentar a lista depois
-    for invalid in invalid_coins:
-        if invalid in coin_symbol:
-            return False
-    
-    return True
+    if coin_symbol.endswith(_INVALID_SUFFIXES):
+        return False
+    return not any(marker in coin_symbol for marker in _INVALID_SUBSTRINGS)
 
 
+@lru_cache(maxsize=2048)
 def create_trading_pair(coin, quote_currency='USDT'):
     """
-    Cria um par de trading formatado corretamente
+    Cria um par de trading formatado corretamente.
+    Memoizado e internado: o mesmo par devolve sempre a mesma string.
+    """
+    return sys.intern(f"{coin}{quote_currency}") #Sempre finaliza com USDT, pelo menos para a Binance
+
+
+def base_asset_from_pair(coin_pair, quote_currency='USDT'):
+    """
+    Retorna o ativo base de um par (ex: 'BTCUSDT' -> 'BTC'), cortando a moeda de cotação do final
     """
-    return f"{coin}{quote_currency}" #Sempre finaliza com USDT, pelo menos para a Binance
+    if coin_pair.endswith(quote_currency):
+        return coin_pair[:-len(quote_currency)]
+    return coin_pair.replace(quote_currency, '')
 
 
+@lru_cache(maxsize=512)
 def _determine_precision_from_string(value_str):
     """
     Determina o número de casas decimais a partir de uma string representando um número.
     Ex: "0.001" -> 3, "1" -> 0, "0.100" -> 1 (considerando trailing zeros como não significativos para precisão mínima)
     """
-    if '.' in value_str:
-        # Remove zeros à direita após o ponto decimal para obter a precisão real
-        decimal_part = value_str.split('.')[1].rstrip('0')
-        return len(decimal_part)
-    return 0
+    dot = value_str.find('.')
+    if dot < 0:
+        return 0
+    # Ignora zeros à direita após o ponto decimal para obter a precisão real, sem criar substrings
+    end = len(value_str)
+    while end > dot + 1 and value_str[end - 1] == '0':
+        end -= 1
+    return end - dot - 1
+
+
+def precompute_precisions(filters):
+    """
+    Converte uma única vez o stepSize (string) de cada par em número de casas decimais.
+    Recebe {par: lista de filtros da exchangeInfo} e devolve {par: precisão}.
+    Quem arredonda quantidades deve receber esse inteiro, e não a string: assim
+    nenhuma rotina numérica (inclusive as compiladas com numba) precisa interpretar texto.
+    """
+    precisions = {}
+    for pair, pair_filters in filters.items():
+        for f in pair_filters:
+            if f.get('filterType') == 'LOT_SIZE':
+                precisions[pair] = _determine_precision_from_string(f.get('stepSize', '1'))
+                break
+    return precisions